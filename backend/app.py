@@ -1,18 +1,30 @@
-from flask import Flask, jsonify, send_from_directory
+import click
+from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from database import db, init_db
 from config import Config
+from utils.cache import register_invalidation_listeners
+from utils.file_upload import UploadRequest
+from utils.payment_reconciler import register_payment_reconciler
+from utils.responses import compress_response
+from utils.revocation import register_revocation_check
+from utils.static_files import build_manifest, serve_from_manifest
 import os
 
 # Initialize Flask app
-app = Flask(__name__, static_folder='../frontend/out', static_url_path='')
+app = Flask(__name__, static_folder=None)
 app.config.from_object(Config)
+app.request_class = UploadRequest  # file uploads are checked while they stream in
 
 # Initialize extensions
 CORS(app)
 jwt = JWTManager(app)
+register_revocation_check(jwt)
 db.init_app(app)
+register_invalidation_listeners()
+app.after_request(compress_response)
+register_payment_reconciler(app)
 
 # Import routes
 from routes.auth import auth_bp
@@ -20,6 +32,8 @@ from routes.booking import booking_bp
 from routes.driver import driver_bp
 from routes.admin import admin_bp
 from routes.payment import payment_bp
+from routes.meta import meta_bp
+from routes.uploads import uploads_bp
 
 # Register blueprints with /api prefix
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -27,15 +41,17 @@ app.register_blueprint(booking_bp, url_prefix='/api/booking')
 app.register_blueprint(driver_bp, url_prefix='/api/driver')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(payment_bp, url_prefix='/api/payment')
+app.register_blueprint(meta_bp, url_prefix='/api/meta')
+app.register_blueprint(uploads_bp)
+
+# Serve React App from a manifest of the static export, built once at startup
+FRONTEND_FOLDER = os.path.join(app.root_path, '..', 'frontend', 'out')
+static_manifest = build_manifest(FRONTEND_FOLDER)
 
-# Serve React App
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    if path != "" and os.path.exists(app.static_folder + '/' + path):
-        return send_from_directory(app.static_folder, path)
-    else:
-        return send_from_directory(app.static_folder, 'index.html')
+    return serve_from_manifest(static_manifest, path)
 
 # API root endpoint
 @app.route('/api')
@@ -56,10 +72,73 @@ def health():
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.errorhandler(413)
+@app.errorhandler(415)
+def upload_rejected(error):
+    return jsonify({'error': error.description}), error.code
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+# Maintenance commands
+@app.cli.command('backfill-driver-ratings')
+def backfill_driver_ratings_command():
+    """Populate driver rating totals from existing booking ratings"""
+    from maintenance import backfill_driver_ratings
+    count = backfill_driver_ratings()
+    print(f"Backfilled ratings for {count} drivers")
+
+@app.cli.command('archive-bookings')
+def archive_bookings_command():
+    """Move old completed/cancelled bookings to the archive table"""
+    from maintenance import archive_finished_bookings
+    count = archive_finished_bookings()
+    print(f"Archived {count} bookings")
+
+@app.cli.command('prune-revocations')
+def prune_revocations_command():
+    """Delete revocation log rows older than the access token lifetime"""
+    from maintenance import prune_revocations
+    count = prune_revocations()
+    print(f"Pruned {count} revocation log rows")
+
+@app.cli.command('reconcile-payments')
+def reconcile_payments_command():
+    """Apply received webhooks and confirm due payments with Razorpay now (the app also does this in the background)"""
+    from utils.payment_reconciler import process_webhook_events, reconcile_payments
+    print(f"Processed {process_webhook_events()} webhook events")
+    count = reconcile_payments()
+    print(f"Checked {count} payments")
+
+@app.cli.command('prune-webhook-events')
+def prune_webhook_events_command():
+    """Delete processed webhook events past the retention period"""
+    from maintenance import prune_webhook_events
+    count = prune_webhook_events()
+    print(f"Pruned {count} webhook events")
+
+@app.cli.command('prune-upload-grants')
+def prune_upload_grants_command():
+    """Delete expired upload grants"""
+    from maintenance import prune_upload_grants
+    count = prune_upload_grants()
+    print(f"Pruned {count} upload grants")
+
+@app.cli.command('mint-id-tokens')
+@click.option('--count', default=100, help='Number of tokens (one phone number each)')
+@click.option('--first-phone', default=9000000000, help='Phone number of the first token, without +91')
+def mint_id_tokens_command(count, first_phone):
+    """Print local-signer ID tokens for load-testing /api/auth/verify-otp"""
+    from utils.firebase_tokens import get_local_signer, get_project_id
+    signer = get_local_signer()
+    if signer is None:
+        print("Set FIREBASE_LOCAL_SIGNER_KEY (for the server too) to mint tokens")
+        return
+    project_id = get_project_id()
+    for i in range(count):
+        print(signer.sign(project_id, f'+91{first_phone + i}'))
+
 # Create database tables
 with app.app_context():
     init_db()
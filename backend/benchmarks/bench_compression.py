@@ -0,0 +1,69 @@
+# Pick gzip level / brotli quality and the minimum size for API compression.
+# Encodes realistic booking-list payloads and reports size and CPU time.
+# Run from the backend folder:
+#     python benchmarks/bench_compression.py
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.serializers import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CITIES = ['hyderabad', 'warangal', 'karimnagar', 'khammam', 'nizamabad', 'nalgonda']
+GOODS = ['cement', 'bricks', 'sand', 'furniture', 'electronics', 'agricultural']
+
+def booking(i):
+    now = datetime(2026, 10, 1) + timedelta(minutes=37 * i)
+    return {
+        'id': i,
+        'booking_id': f'SRTA-{now:%Y%m%d}-{i * 7919:010X}',
+        'customer_id': 1000 + i % 97,
+        'driver_id': 10 + i % 13 if i % 3 else None,
+        'pickup': {'address': f'{i % 400} Main Road, {CITIES[i % 6].title()}',
+                   'latitude': 17.3 + (i % 100) / 1000, 'longitude': 78.4 + (i % 70) / 1000,
+                   'city': CITIES[i % 6]},
+        'drop': {'address': f'Plot {i % 250}, Industrial Area, {CITIES[(i + 2) % 6].title()}',
+                 'latitude': 18.0 + (i % 90) / 1000, 'longitude': 79.5 + (i % 60) / 1000,
+                 'city': CITIES[(i + 2) % 6]},
+        'goods': {'type': GOODS[i % 6], 'weight_kg': 500 * (1 + i % 8), 'volume_cubic_ft': None,
+                  'image': None, 'special_instructions': 'Call before arrival' if i % 4 == 0 else None},
+        'distance_km': round(40 + (i * 13) % 200 + 0.37, 2),
+        'estimated_fare': 150 + 15 * (40 + (i * 13) % 200),
+        'final_fare': None, 'admin_commission': None, 'driver_earning': None,
+        'scheduled_date': now + timedelta(days=1), 'pickup_time': None, 'drop_time': None,
+        'status': ['pending', 'confirmed', 'completed', 'cancelled'][i % 4],
+        'payment_status': 'unpaid', 'payment_method': None,
+        'customer_rating': None, 'customer_feedback': None,
+        'created_at': now
+    }
+
+def measure(function, body, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = function(body)
+    return (time.perf_counter() - start) / repeat * 1000, len(output)
+
+def main():
+    encoders = [(f'gzip-{level}', lambda body, level=level: gzip.compress(body, compresslevel=level))
+                for level in (1, 4, 6, 9)]
+    if brotli is not None:
+        encoders += [(f'br-{quality}', lambda body, quality=quality: brotli.compress(body, quality=quality))
+                     for quality in (1, 4, 5, 6, 9, 11)]
+
+    for rows in (1, 5, 20, 200, 2000):
+        body = dumps({'bookings': [booking(i) for i in range(rows)], 'count': rows})
+        print(f'\n{rows} bookings: {len(body)} bytes')
+        for name, encode in encoders:
+            elapsed, size = measure(encode, body, repeat=3 if name == 'br-11' else 20)
+            print(f'  {name:8} {size:>9} bytes  {size / len(body):6.1%}  {elapsed:8.3f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Cost of verifying Firebase ID tokens during a login burst, using the local
+# signer (no network: the signing certificate is served from localhost).
+# Compares firebase_admin's path (certificates looked up through its
+# CacheControl HTTP session and parsed on every call) with
+# utils.firebase_tokens (parsed keys cached in memory) and its
+# verified-token cache for retried logins. Run from the backend folder:
+#     python benchmarks/bench_firebase_tokens.py
+import datetime
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.x509.oid import NameOID
+from firebase_admin._token_gen import CertificateFetchRequest
+from google.oauth2 import id_token
+from utils.firebase_tokens import KeyCache, LocalSigner, TokenVerifier
+
+TOKENS = int(os.environ.get('BENCH_TOKENS', 2000))
+PROJECT_ID = 'local-load-test'
+
+def certificate_pem(signer):
+    """Self-signed certificate for the signer's key, like Google's x509 endpoint serves"""
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, signer.kid)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name)
+        .public_key(signer.private_key.public_key()).serial_number(1)
+        .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(signer.private_key, hashes.SHA256())
+    )
+    return certificate.public_bytes(serialization.Encoding.PEM).decode('ascii')
+
+def serve_certificates(body):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Cache-Control', 'public, max-age=3600')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}/certs'
+
+def timed(name, fn, tokens):
+    start = time.perf_counter()
+    for token in tokens:
+        fn(token)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<36}{elapsed * 1e6 / len(tokens):>10.0f}{len(tokens) / elapsed:>12.0f}')
+
+def main():
+    signer = LocalSigner(os.path.join(tempfile.mkdtemp(), 'signer.pem'))
+    tokens = [signer.sign(PROJECT_ID, f'+91{9000000000 + i}') for i in range(TOKENS)]
+    certs_url = serve_certificates(json.dumps({signer.kid: certificate_pem(signer)}).encode('utf-8'))
+
+    # What firebase_admin.auth.verify_id_token does per call
+    request = CertificateFetchRequest(timeout_seconds=10)
+    def firebase_admin_verify(token):
+        return id_token.verify_token(token, request=request, audience=PROJECT_ID, certs_url=certs_url)
+
+    verifier = TokenVerifier(KeyCache(signer.fetch_keys), PROJECT_ID, cache_size=TOKENS)
+
+    print(f"{'verification':<36}{'us/token':>10}{'tokens/s':>12}")
+    timed('firebase_admin (HTTP cache)', firebase_admin_verify, tokens)
+    timed('cached keys (first attempt)', verifier.verify, tokens)
+    timed('verified-token cache (retry)', verifier.verify, tokens)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Peak memory (RSS) of the upload image pipeline on realistic phone photos.
+# Compares a plain decode (Image.open + exif_transpose + thumbnail) with
+# utils.images.open_image (header pixel cap, JPEG draft decode, one EXIF
+# transpose on the reduced image). Each case runs in a fresh interpreter so
+# peaks don't mix. Linux/macOS only.
+# Run from the backend folder:
+#     python benchmarks/bench_image_memory.py
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PIL import Image, ImageFilter, ImageOps
+
+# (name, size, format, EXIF orientation)
+PHOTOS = [
+    ('12MP portrait JPEG', (4032, 3024), 'JPEG', 6),  # Typical phone photo, stored sideways
+    ('48MP JPEG', (8000, 6000), 'JPEG', 1),
+    ('phone screenshot PNG', (1080, 2400), 'PNG', 1),
+    ('scanned RC book PNG', (3508, 2480), 'PNG', 1),  # A4 at 300 dpi
+]
+
+# Boxes used by the app: background optimization and the thumb derivative
+TARGETS = [('optimize 1920x1080', (1920, 1080)), ('thumb 300x300', (300, 300))]
+
+def make_photo(path, size, fmt, orientation):
+    """Noise blurred into photo-like texture, so the encoded size is realistic"""
+    small = Image.effect_noise((size[0] // 8, size[1] // 8), 80).convert('RGB')
+    image = small.resize(size, Image.Resampling.BICUBIC).filter(ImageFilter.GaussianBlur(2))
+    noise = Image.effect_noise(size, 20).convert('RGB')
+    image = Image.blend(image, noise, 0.15)
+    exif = Image.Exif()
+    if orientation != 1:
+        exif[0x0112] = orientation
+    if fmt == 'JPEG':
+        image.save(path, 'JPEG', quality=92, exif=exif)
+    else:
+        image.save(path, 'PNG', optimize=False)
+
+def peak_rss_mb():
+    """Peak RSS of this process; ru_maxrss survives exec on Linux, so read VmHWM there"""
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 / 1024  # bytes on macOS
+
+def run_child(pipeline, path, width, height):
+    """Entry point in the child interpreter: decode + resize once, print peak RSS and time"""
+    from utils.images import open_image
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if pipeline == 'plain':
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+    else:
+        with open_image(path, (width, height)) as image:
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f'{peak_rss_mb() - baseline:.1f} {elapsed:.0f}')
+
+def measure(pipeline, path, box):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', pipeline, path, str(box[0]), str(box[1])],
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+def main():
+    folder = tempfile.mkdtemp()
+    print(f"{'photo':<24}{'target':<22}{'file MB':>8}{'plain MB':>10}{'ms':>7}{'draft MB':>10}{'ms':>7}")
+    for name, size, fmt, orientation in PHOTOS:
+        path = os.path.join(folder, name.replace(' ', '_') + ('.jpg' if fmt == 'JPEG' else '.png'))
+        make_photo(path, size, fmt, orientation)
+        file_mb = os.path.getsize(path) / 1024 / 1024
+        for target_name, box in TARGETS:
+            plain_mb, plain_ms = measure('plain', path, box)
+            draft_mb, draft_ms = measure('draft', path, box)
+            print(f'{name:<24}{target_name:<22}{file_mb:>8.1f}{plain_mb:>10.1f}{plain_ms:>7.0f}'
+                  f'{draft_mb:>10.1f}{draft_ms:>7.0f}')
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))
+    else:
+        main()
@@ -0,0 +1,97 @@
+# Compare ORM to_dict() + jsonify against projected rows + compiled serializers
+# on 10k bookings. Run from the backend folder:
+#     python benchmarks/bench_serializers.py
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask, jsonify
+from database import db
+from models.user import User
+from models.driver import Driver
+from models.vehicle import Vehicle  # noqa: F401 (resolves Driver.vehicles)
+from models.booking import Booking
+from utils.serializers import BOOKING_SHAPE, dumps, get_serializer, model_columns, orjson, select_shape
+
+ROWS = int(os.environ.get('BENCH_ROWS', 10000))
+REPEAT = 5
+
+def seed():
+    db.session.add(User(id=1, phone='9000000001', name='Customer', role='customer'))
+    db.session.add(User(id=2, phone='9000000002', name='Driver', role='driver'))
+    db.session.add(Driver(id=1, user_id=2, license_number='TS-0001'))
+    now = datetime.utcnow()
+    db.session.execute(Booking.__table__.insert(), [{
+        'booking_id': f'SRTA-BENCH-{i:06d}',
+        'customer_id': 1,
+        'driver_id': 1 if i % 2 else None,
+        'pickup_address': 'Ameerpet, Hyderabad',
+        'pickup_latitude': 17.43,
+        'pickup_longitude': 78.44,
+        'pickup_city': 'hyderabad',
+        'drop_address': 'Hanamkonda, Warangal',
+        'drop_latitude': 18.0,
+        'drop_longitude': 79.56,
+        'drop_city': 'warangal',
+        'goods_type': 'cement',
+        'weight_kg': 2000,
+        'special_instructions': 'Handle with care',
+        'distance_km': 135.2,
+        'estimated_fare': 2180,
+        'scheduled_date': now + timedelta(days=1),
+        'pickup_time': now,
+        'status': 'pending',
+        'payment_status': 'unpaid',
+        'created_at': now - timedelta(minutes=i),
+        'updated_at': now
+    } for i in range(ROWS)])
+    db.session.commit()
+
+def orm_path():
+    bookings = Booking.query.order_by(Booking.created_at.desc()).all()
+    body = jsonify({'bookings': [b.to_dict() for b in bookings], 'count': len(bookings)}).get_data()
+    db.session.expunge_all()
+    return body
+
+def projected_path():
+    serialize = get_serializer('bench_booking', BOOKING_SHAPE)
+    query = select_shape(BOOKING_SHAPE, model_columns(Booking)).order_by(Booking.created_at.desc())
+    bookings = [serialize(row) for row in db.session.execute(query)]
+    return dumps({'bookings': bookings, 'count': len(bookings)})
+
+def best_of(function):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        body = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), body
+
+def main():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    
+    with app.app_context():
+        db.create_all()
+        seed()
+        
+        orm_time, orm_body = best_of(orm_path)
+        fast_time, fast_body = best_of(projected_path)
+        # jsonify sorts keys and orjson keeps insertion order, so compare the decoded payloads
+        same_payload = json.loads(orm_body) == json.loads(fast_body)
+        
+        print(f"{ROWS} bookings, best of {REPEAT} (encoder: {'orjson' if orjson else 'json'})")
+        print(f"  to_dict + jsonify:        {orm_time * 1000:8.1f} ms  {len(orm_body):>10} bytes")
+        print(f"  projected + serializer:   {fast_time * 1000:8.1f} ms  {len(fast_body):>10} bytes")
+        print(f"  speedup: {orm_time / fast_time:.1f}x")
+        print(f"  same payload: {'yes' if same_payload else 'NO'}")
+        if not same_payload:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
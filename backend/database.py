@@ -1,7 +1,96 @@
+from flask import g, has_app_context, current_app
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
 from datetime import datetime
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+from utils import metrics
 
-db = SQLAlchemy()
+# Last replica health check: (checked_at, usable)
+_replica_state = {'checked_at': 0.0, 'usable': False}
+_replica_lock = threading.Lock()
+
+def _check_replica_lag(engine):
+    """Return replica lag in seconds (0 for non-PostgreSQL test setups)"""
+    with engine.connect() as conn:
+        if engine.dialect.name != 'postgresql':
+            conn.execute(text('SELECT 1'))
+            return 0.0
+        lag = conn.execute(text(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )).scalar()
+        return float(lag or 0)
+
+def replica_usable(engines):
+    """
+    Check (at most every REPLICA_LAG_CHECK_INTERVAL seconds) whether the replica
+    is reachable and within REPLICA_MAX_LAG_SECONDS of the primary
+    """
+    if 'replica' not in engines:
+        return False
+    
+    interval = current_app.config.get('REPLICA_LAG_CHECK_INTERVAL', 2)
+    now = time.time()
+    if now - _replica_state['checked_at'] < interval:
+        return _replica_state['usable']
+    
+    with _replica_lock:
+        if now - _replica_state['checked_at'] < interval:
+            return _replica_state['usable']
+        try:
+            lag = _check_replica_lag(engines['replica'])
+            metrics.observe('db.replica.lag_seconds', lag)
+            usable = lag <= current_app.config.get('REPLICA_MAX_LAG_SECONDS', 5)
+        except Exception as e:
+            print(f"Replica health check failed: {e}")
+            usable = False
+        _replica_state['checked_at'] = now
+        _replica_state['usable'] = usable
+        return usable
+
+class RoutingSession(Session):
+    """Session that sends reads inside @replica_reads views to the replica bind"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_app_context()
+                and g.get('use_replica')):
+            if replica_usable(self._db.engines):
+                metrics.incr('db.replica.reads')
+                return self._db.engines['replica']
+            metrics.incr('db.replica.fallback')
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def replica_reads(fn):
+    """Decorator for read-only views: route their queries to the read replica"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get('READ_FROM_REPLICA', True):
+            return fn(*args, **kwargs)
+        g.use_replica = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            g.use_replica = False
+    return wrapper
+
+@contextmanager
+def primary_reads():
+    """Send queries in this block to the primary, even inside a @replica_reads view"""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('use_replica', False)
+    g.use_replica = False
+    try:
+        yield
+    finally:
+        g.use_replica = previous
 
 def init_db():
     """Initialize database tables"""
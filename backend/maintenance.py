@@ -0,0 +1,152 @@
+# One-time data maintenance tasks, exposed as Flask CLI commands in app.py
+# Run from the backend folder, e.g.: flask --app app backfill-driver-ratings
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, inspect, select, text
+from config import Config
+from database import db
+from models.booking import Booking, ArchivedBooking, FINISHED_STATUSES, archive_cutoff
+from models.driver import Driver
+from models.revocation import Revocation
+from models.upload_grant import UploadGrant
+from models.webhook_event import WebhookEvent
+
+def add_missing_columns(model):
+    """
+    Add columns that exist on the model but not yet in the database table.
+    db.create_all() only creates missing tables, never new columns.
+
+    Args:
+        model: SQLAlchemy model class
+
+    Returns:
+        List of added column names
+    """
+    table = model.__table__
+    existing = {c['name'] for c in inspect(db.engine).get_columns(table.name)}
+    added = []
+    
+    with db.engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+            if default is not None:
+                ddl += f' DEFAULT {default!r}'
+                if not column.nullable:
+                    ddl += ' NOT NULL'
+            conn.execute(text(ddl))
+            added.append(column.name)
+    
+    return added
+
+def backfill_driver_ratings():
+    """
+    Populate Driver.rating_sum / rating_count from existing booking ratings
+
+    Returns:
+        Number of drivers with at least one rating
+    """
+    add_missing_columns(Driver)
+    
+    totals = db.session.query(
+        Booking.driver_id,
+        func.sum(Booking.customer_rating),
+        func.count(Booking.customer_rating)
+    ).filter(
+        Booking.driver_id.isnot(None),
+        Booking.status == 'completed',
+        Booking.customer_rating.isnot(None)
+    ).group_by(Booking.driver_id).all()
+    
+    Driver.query.update({Driver.rating_sum: 0, Driver.rating_count: 0}, synchronize_session=False)
+    for driver_id, rating_sum, rating_count in totals:
+        Driver.query.filter_by(id=driver_id).update(
+            {Driver.rating_sum: rating_sum, Driver.rating_count: rating_count},
+            synchronize_session=False
+        )
+    
+    db.session.commit()
+    return len(totals)
+
+def archive_finished_bookings(batch_size=None):
+    """
+    Move completed and cancelled bookings older than ARCHIVE_AFTER_MONTHS
+    from bookings to bookings_archive, one transaction per batch
+
+    Args:
+        batch_size: Rows moved per transaction (default Config.ARCHIVE_BATCH_SIZE)
+
+    Returns:
+        Number of bookings archived
+    """
+    batch_size = batch_size or Config.ARCHIVE_BATCH_SIZE
+    cutoff = archive_cutoff()
+    columns = [column.name for column in Booking.__table__.columns]
+    archived = 0
+    
+    while True:
+        ids = [row[0] for row in db.session.query(Booking.id).filter(
+            Booking.status.in_(FINISHED_STATUSES),
+            Booking.created_at < cutoff
+        ).order_by(Booking.id).limit(batch_size).all()]
+        
+        if not ids:
+            break
+        
+        db.session.execute(
+            insert(ArchivedBooking.__table__).from_select(
+                columns,
+                select(*[Booking.__table__.c[name] for name in columns]).where(Booking.id.in_(ids))
+            )
+        )
+        db.session.execute(delete(Booking.__table__).where(Booking.id.in_(ids)))
+        db.session.commit()
+        archived += len(ids)
+    
+    return archived
+
+def prune_revocations():
+    """
+    Delete revocation log rows older than the access token lifetime. By then
+    revoked tokens have expired and every worker has applied user changes
+    (whose current state also lives in users.is_active).
+
+    Returns:
+        Number of rows deleted
+    """
+    cutoff = datetime.utcnow() - Config.JWT_ACCESS_TOKEN_EXPIRES
+    deleted = db.session.execute(delete(Revocation.__table__).where(Revocation.created_at < cutoff)).rowcount
+    db.session.commit()
+    return deleted
+
+def prune_webhook_events():
+    """
+    Delete processed webhook events older than WEBHOOK_EVENT_RETENTION_DAYS.
+    Razorpay stops retrying a delivery long before, so a late retry can no
+    longer be mistaken for a new event.
+
+    Returns:
+        Number of rows deleted
+    """
+    cutoff = datetime.utcnow() - timedelta(days=Config.WEBHOOK_EVENT_RETENTION_DAYS)
+    deleted = db.session.execute(
+        delete(WebhookEvent.__table__)
+        .where(WebhookEvent.processed_at.isnot(None), WebhookEvent.created_at < cutoff)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+def prune_upload_grants():
+    """
+    Delete expired upload grants (presigned uploads that were never recorded)
+
+    Returns:
+        Number of rows deleted
+    """
+    deleted = db.session.execute(
+        delete(UploadGrant.__table__).where(UploadGrant.expires_at < datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    return deleted
@@ -1,8 +1,12 @@
 from database import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from config import Config
 
-class Booking(db.Model):
-    __tablename__ = 'bookings'
+ACTIVE_STATUSES = ('pending', 'confirmed', 'driver_assigned', 'driver_reached', 'ongoing')
+FINISHED_STATUSES = ('completed', 'cancelled')
+
+class BookingFields:
+    """Columns shared by the live bookings table and the archive table"""
     
     id = db.Column(db.Integer, primary_key=True)
     booking_id = db.Column(db.String(50), unique=True, nullable=False)  # SRTA-XXXXXX
@@ -41,10 +45,10 @@ class Booking(db.Model):
     drop_time = db.Column(db.DateTime, nullable=True)
     
     # Status tracking
-    status = db.Column(db.String(20), default='pending')  
+    status = db.Column(db.String(20), default='pending', index=True)
     # pending, confirmed, driver_assigned, driver_reached, ongoing, completed, cancelled
     
-    payment_status = db.Column(db.String(20), default='unpaid')  # unpaid, paid, partial
+    payment_status = db.Column(db.String(20), default='unpaid')  # unpaid, pending_capture, paid, partial, failed, refunded
     payment_method = db.Column(db.String(20), nullable=True)  # online, cash, partial
     razorpay_order_id = db.Column(db.String(100), nullable=True)
     razorpay_payment_id = db.Column(db.String(100), nullable=True)
@@ -53,7 +57,7 @@ class Booking(db.Model):
     customer_rating = db.Column(db.Integer, nullable=True)  # 1-5
     customer_feedback = db.Column(db.Text, nullable=True)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
@@ -97,5 +101,49 @@ class Booking(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
     
+class Booking(BookingFields, db.Model):
+    """Live bookings: everything not yet archived"""
+    __tablename__ = 'bookings'
+    
     def __repr__(self):
         return f'<Booking {self.booking_id}>'
+
+class ArchivedBooking(BookingFields, db.Model):
+    """Completed and cancelled bookings older than ARCHIVE_AFTER_MONTHS (read-only)"""
+    __tablename__ = 'bookings_archive'
+    
+    def to_dict(self):
+        booking_dict = super().to_dict()
+        booking_dict['archived'] = True
+        return booking_dict
+    
+    def __repr__(self):
+        return f'<ArchivedBooking {self.booking_id}>'
+
+def archive_cutoff():
+    """Bookings created before this may have been moved to the archive"""
+    return datetime.utcnow() - timedelta(days=30 * Config.ARCHIVE_AFTER_MONTHS)
+
+def booking_models(status=None, created_from=None):
+    """
+    Tables a booking query has to read
+
+    Args:
+        status: Status filter, if any
+        created_from: Lower bound on created_at, if any
+
+    Returns:
+        List of models; the archive is skipped when the filters can only match live rows
+    """
+    if status and status not in FINISHED_STATUSES:
+        return [Booking]
+    if created_from and created_from >= archive_cutoff():
+        return [Booking]
+    return [Booking, ArchivedBooking]
+
+def find_booking(booking_id, include_archive=True):
+    """Get a booking by primary key, falling back to the archive"""
+    booking = db.session.get(Booking, booking_id)
+    if booking is None and include_archive:
+        booking = db.session.get(ArchivedBooking, booking_id)
+    return booking
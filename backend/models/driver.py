@@ -1,5 +1,7 @@
 from database import db
 from datetime import datetime
+from sqlalchemy import case, func
+from sqlalchemy.ext.hybrid import hybrid_property
 
 class Driver(db.Model):
     __tablename__ = 'drivers'
@@ -29,7 +31,10 @@ class Driver(db.Model):
     total_trips = db.Column(db.Integer, default=0)
     total_earnings = db.Column(db.Float, default=0.0)
     wallet_balance = db.Column(db.Float, default=0.0)
-    rating = db.Column(db.Float, default=0.0)  # Average rating
+    
+    # Running rating totals, updated with each customer rating
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    rating_count = db.Column(db.Integer, default=0, nullable=False)
     
     # Verification
     is_verified = db.Column(db.Boolean, default=False)
@@ -43,6 +48,25 @@ class Driver(db.Model):
     vehicles = db.relationship('Vehicle', backref='driver', lazy=True)
     bookings = db.relationship('Booking', backref='driver', lazy=True, foreign_keys='Booking.driver_id')
     
+    @staticmethod
+    def average_rating(rating_sum, rating_count):
+        """Average rating from running totals, rounded to one decimal"""
+        if not rating_count:
+            return 0.0
+        return round(rating_sum / rating_count, 1)
+    
+    @hybrid_property
+    def rating(self):
+        """Average rating derived from the running totals"""
+        return Driver.average_rating(self.rating_sum, self.rating_count)
+    
+    @rating.expression
+    def rating(cls):
+        return case(
+            (cls.rating_count > 0, func.round(cls.rating_sum * 1.0 / cls.rating_count, 1)),
+            else_=0.0
+        )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -61,7 +85,8 @@ class Driver(db.Model):
                 'total_trips': self.total_trips,
                 'total_earnings': self.total_earnings,
                 'wallet_balance': self.wallet_balance,
-                'rating': self.rating
+                'rating': self.rating,
+                'rating_count': self.rating_count
             },
             'is_verified': self.is_verified,
             'verified_at': self.verified_at.isoformat() if self.verified_at else None,
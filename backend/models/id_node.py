@@ -0,0 +1,13 @@
+from database import db
+from datetime import datetime
+
+class IdNode(db.Model):
+    """Lease of a booking/invoice ID node number by one process (see utils/helpers.py)"""
+    __tablename__ = 'id_nodes'
+
+    node = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0-1023
+    owner = db.Column(db.String(100), nullable=False)  # host:pid of the leasing process
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdNode {self.node} {self.owner}>'
@@ -0,0 +1,29 @@
+from database import db
+from datetime import datetime
+
+class ImageJob(db.Model):
+    """Background optimization of an uploaded image (see utils/image_jobs.py)"""
+    __tablename__ = 'image_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_path = db.Column(db.String(255), nullable=False, index=True)  # Relative to UPLOAD_FOLDER
+    status = db.Column(db.String(20), default='pending')  # pending, ready, failed, skipped
+    original_size = db.Column(db.Integer, nullable=True)  # bytes
+    optimized_size = db.Column(db.Integer, nullable=True)  # bytes
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'file_path': self.file_path,
+            'status': self.status,
+            'original_size': self.original_size,
+            'optimized_size': self.optimized_size,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+    def __repr__(self):
+        return f'<ImageJob {self.file_path} {self.status}>'
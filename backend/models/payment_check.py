@@ -0,0 +1,20 @@
+from database import db
+from datetime import datetime
+
+class PaymentCheck(db.Model):
+    """Pending confirmation of a payment with Razorpay (see utils/payment_reconciler.py)"""
+    __tablename__ = 'payment_checks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, nullable=False, index=True)
+    razorpay_payment_id = db.Column(db.String(100), unique=True, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    payment_state = db.Column(db.String(20), nullable=True)  # Razorpay status last seen (captured, failed, ...)
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<PaymentCheck {self.razorpay_payment_id} {self.status}>'
@@ -0,0 +1,16 @@
+from database import db
+from datetime import datetime
+
+class Revocation(db.Model):
+    """Append-only log of access changes, replayed by each worker (see utils/revocation.py)"""
+    __tablename__ = 'revocations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)  # Set for user deactivation/reactivation
+    jti = db.Column(db.String(36), nullable=True)  # Set for a single revoked access token
+    action = db.Column(db.String(10), default='revoke', nullable=False)  # revoke, restore (users only)
+    expires_at = db.Column(db.DateTime, nullable=True)  # When the revoked token expires anyway
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<Revocation {self.action} user={self.user_id} jti={self.jti}>'
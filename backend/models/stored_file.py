@@ -0,0 +1,16 @@
+from database import db
+from datetime import datetime
+
+class StoredFile(db.Model):
+    """Content-addressed upload and how many records reference it (see utils/file_upload.py)"""
+    __tablename__ = 'stored_files'
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_path = db.Column(db.String(255), unique=True, nullable=False)  # folder/ab/<sha256>.ext
+    sha256 = db.Column(db.String(64), nullable=False, index=True)  # Hash of the uploaded bytes
+    size = db.Column(db.Integer, nullable=False)  # Uploaded size in bytes
+    ref_count = db.Column(db.Integer, default=1, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StoredFile {self.file_path} refs={self.ref_count}>'
@@ -0,0 +1,16 @@
+from database import db
+from datetime import datetime
+
+class UploadGrant(db.Model):
+    """One user's permission to record one presigned direct upload (see utils/file_upload.py)"""
+    __tablename__ = 'upload_grants'
+
+    id = db.Column(db.Integer, primary_key=True)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of the token handed to the client
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    file_path = db.Column(db.String(255), nullable=False)  # Key the upload was presigned for
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UploadGrant user={self.user_id} {self.file_path}>'
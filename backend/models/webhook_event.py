@@ -0,0 +1,21 @@
+from database import db
+from datetime import datetime
+
+class WebhookEvent(db.Model):
+    """Inbox of verified Razorpay webhook deliveries, one row per event (see utils/payment_reconciler.py)"""
+    __tablename__ = 'webhook_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(64), unique=True, nullable=False)  # X-Razorpay-Event-Id; retries reuse it
+    event = db.Column(db.String(50), nullable=False)  # payment.captured, payment.failed, ...
+    razorpay_order_id = db.Column(db.String(100), nullable=True, index=True)
+    payload = db.Column(db.Text, nullable=False)  # Request body as received
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.String(255), nullable=True)  # Why the last attempt to apply it failed
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    processed_at = db.Column(db.DateTime, nullable=True, index=True)  # Set once done or failed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<WebhookEvent {self.event_id} {self.event}>'
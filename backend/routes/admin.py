@@ -1,119 +1,153 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, current_app, g, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required
 from models.user import User
 from models.driver import Driver
 from models.vehicle import Vehicle
-from models.booking import Booking
-from database import db
+from models.booking import Booking, ArchivedBooking, booking_models
+from models.payment_check import PaymentCheck
+from database import db, replica_reads
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from itertools import chain
+from config import Config
+from utils.auth import admin_required
+from utils.cache import get_or_compute
+from utils import metrics
+from utils.export import EXPORT_FORMATS, stream_rows
+from utils.file_upload import get_image_urls
+from utils.responses import conditional
+from utils.revocation import log_user_status, revocation_list
+from utils.serializers import (BOOKING_SHAPE, DRIVER_SHAPE, USER_SHAPE, get_fieldset, json_response,
+                               model_columns, parse_fields, prefix_shape, select_shape)
 
 admin_bp = Blueprint('admin', __name__)
 
-def admin_required():
-    """Decorator to check if user is admin"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
-    if not user or user.role != 'admin':
-        return jsonify({'error': 'Admin access required'}), 403
-    return None
+# Response shapes for the projected list endpoints
+ADMIN_DRIVER_SHAPE = dict(DRIVER_SHAPE, user=prefix_shape(USER_SHAPE, 'user_'))
+ADMIN_BOOKING_SHAPE = dict(BOOKING_SHAPE, customer_name='customer_name', driver_name='driver_name')
+
+def build_dashboard():
+    """Compute admin dashboard statistics"""
+    # Total counts
+    total_customers = User.query.filter_by(role='customer').count()
+    total_drivers = Driver.query.count()
+    total_verified_drivers = Driver.query.filter_by(is_verified=True).count()
+    total_bookings = Booking.query.count() + ArchivedBooking.query.count()
+    
+    # Status counts (active statuses never reach the archive)
+    pending_bookings = Booking.query.filter_by(status='pending').count()
+    ongoing_bookings = Booking.query.filter(
+        Booking.status.in_(['driver_assigned', 'driver_reached', 'ongoing'])
+    ).count()
+    completed_bookings = sum(
+        model.query.filter_by(status='completed').count()
+        for model in (Booking, ArchivedBooking)
+    )
+    
+    # Driver status
+    available_drivers = Driver.query.filter_by(status='available', is_verified=True).count()
+    busy_drivers = Driver.query.filter_by(status='busy').count()
+    
+    # Revenue calculations
+    total_revenue = 0
+    total_commission = 0
+    for model in (Booking, ArchivedBooking):
+        revenue, commission = db.session.query(
+            func.coalesce(func.sum(func.coalesce(model.final_fare, model.estimated_fare)), 0),
+            func.coalesce(func.sum(model.admin_commission), 0)
+        ).filter(model.status == 'completed').one()
+        total_revenue += revenue
+        total_commission += commission
+    
+    # Recent activity (last 7 days)
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    recent_bookings = Booking.query.filter(Booking.created_at >= week_ago).count()
+    recent_revenue = db.session.query(
+        func.coalesce(func.sum(func.coalesce(Booking.final_fare, Booking.estimated_fare)), 0)
+    ).filter(
+        Booking.created_at >= week_ago,
+        Booking.status == 'completed'
+    ).scalar()
+    
+    # Payments Razorpay never confirmed, still unpaid (for manual review). Giving up
+    # and settling both change Booking.payment_status, so the cache tags cover it.
+    unconfirmed_payments = db.session.query(func.count(PaymentCheck.id)).join(
+        Booking, Booking.id == PaymentCheck.booking_id
+    ).filter(PaymentCheck.status == 'failed', Booking.payment_status == 'unpaid').scalar()
+    
+    # Top drivers by trips
+    top_drivers = Driver.query.order_by(Driver.total_trips.desc()).limit(5).all()
+    top_drivers_list = []
+    for driver in top_drivers:
+        user = User.query.get(driver.user_id)
+        top_drivers_list.append({
+            'name': user.name,
+            'phone': user.phone,
+            'total_trips': driver.total_trips,
+            'rating': driver.rating,
+            'earnings': driver.total_earnings
+        })
+    
+    return {
+        'overview': {
+            'total_customers': total_customers,
+            'total_drivers': total_drivers,
+            'verified_drivers': total_verified_drivers,
+            'total_bookings': total_bookings
+        },
+        'bookings': {
+            'pending': pending_bookings,
+            'ongoing': ongoing_bookings,
+            'completed': completed_bookings
+        },
+        'drivers': {
+            'available': available_drivers,
+            'busy': busy_drivers,
+            'offline': total_verified_drivers - available_drivers - busy_drivers
+        },
+        'payments': {
+            'unconfirmed': unconfirmed_payments
+        },
+        'revenue': {
+            'total': round(total_revenue, 2),
+            'commission': round(total_commission, 2),
+            'driver_earnings': round(total_revenue - total_commission, 2)
+        },
+        'recent_activity': {
+            'bookings_last_7_days': recent_bookings,
+            'revenue_last_7_days': round(recent_revenue, 2)
+        },
+        'top_drivers': top_drivers_list,
+        'generated_at': datetime.utcnow().isoformat()
+    }
 
 @admin_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
+@admin_required
+@replica_reads
 def get_dashboard():
     """Get admin dashboard statistics"""
     try:
-        error = admin_required()
-        if error:
-            return error
-        
-        # Total counts
-        total_customers = User.query.filter_by(role='customer').count()
-        total_drivers = Driver.query.count()
-        total_verified_drivers = Driver.query.filter_by(is_verified=True).count()
-        total_bookings = Booking.query.count()
-        
-        # Status counts
-        pending_bookings = Booking.query.filter_by(status='pending').count()
-        ongoing_bookings = Booking.query.filter(
-            Booking.status.in_(['driver_assigned', 'driver_reached', 'ongoing'])
-        ).count()
-        completed_bookings = Booking.query.filter_by(status='completed').count()
-        
-        # Driver status
-        available_drivers = Driver.query.filter_by(status='available', is_verified=True).count()
-        busy_drivers = Driver.query.filter_by(status='busy').count()
-        
-        # Revenue calculations
-        completed = Booking.query.filter_by(status='completed').all()
-        total_revenue = sum(b.final_fare or b.estimated_fare for b in completed)
-        total_commission = sum(b.admin_commission or 0 for b in completed)
-        
-        # Recent activity (last 7 days)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_bookings = Booking.query.filter(Booking.created_at >= week_ago).count()
-        recent_revenue = sum(
-            b.final_fare or b.estimated_fare 
-            for b in Booking.query.filter(
-                Booking.created_at >= week_ago,
-                Booking.status == 'completed'
-            ).all()
+        dashboard = get_or_compute(
+            'dashboard', 'dashboard',
+            ttl=Config.DASHBOARD_CACHE_TTL,
+            compute=build_dashboard,
+            tags=('bookings', 'drivers', 'users')
         )
         
-        # Top drivers by trips
-        top_drivers = Driver.query.order_by(Driver.total_trips.desc()).limit(5).all()
-        top_drivers_list = []
-        for driver in top_drivers:
-            user = User.query.get(driver.user_id)
-            top_drivers_list.append({
-                'name': user.name,
-                'phone': user.phone,
-                'total_trips': driver.total_trips,
-                'rating': driver.rating,
-                'earnings': driver.total_earnings
-            })
-        
-        return jsonify({
-            'overview': {
-                'total_customers': total_customers,
-                'total_drivers': total_drivers,
-                'verified_drivers': total_verified_drivers,
-                'total_bookings': total_bookings
-            },
-            'bookings': {
-                'pending': pending_bookings,
-                'ongoing': ongoing_bookings,
-                'completed': completed_bookings
-            },
-            'drivers': {
-                'available': available_drivers,
-                'busy': busy_drivers,
-                'offline': total_verified_drivers - available_drivers - busy_drivers
-            },
-            'revenue': {
-                'total': round(total_revenue, 2),
-                'commission': round(total_commission, 2),
-                'driver_earnings': round(total_revenue - total_commission, 2)
-            },
-            'recent_activity': {
-                'bookings_last_7_days': recent_bookings,
-                'revenue_last_7_days': round(recent_revenue, 2)
-            },
-            'top_drivers': top_drivers_list
-        }), 200
+        return jsonify(dashboard), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/drivers/pending', methods=['GET'])
 @jwt_required()
+@admin_required
+@replica_reads
 def get_pending_drivers():
     """Get list of drivers pending verification"""
     try:
-        error = admin_required()
-        if error:
-            return error
-        
         pending_drivers = Driver.query.filter_by(is_verified=False).all()
         
         drivers_list = []
@@ -122,9 +156,23 @@ def get_pending_drivers():
             driver_dict = driver.to_dict()
             driver_dict['user'] = user.to_dict()
             
+            # Signed links (with thumbnails) to the documents under review
+            driver_dict['documents'] = {
+                'license_photo': get_image_urls(driver.license_photo),
+                'id_proof_photo': get_image_urls(driver.id_proof_photo)
+            }
+            
             # Include vehicles
             vehicles = Vehicle.query.filter_by(driver_id=driver.id).all()
-            driver_dict['vehicles'] = [v.to_dict() for v in vehicles]
+            driver_dict['vehicles'] = []
+            for vehicle in vehicles:
+                vehicle_dict = vehicle.to_dict()
+                vehicle_dict['documents'] = {
+                    'vehicle_photo': get_image_urls(vehicle.vehicle_photo),
+                    'rc_book_photo': get_image_urls(vehicle.rc_book_photo),
+                    'insurance_photo': get_image_urls(vehicle.insurance_photo)
+                }
+                driver_dict['vehicles'].append(vehicle_dict)
             
             drivers_list.append(driver_dict)
         
@@ -138,13 +186,10 @@ def get_pending_drivers():
 
 @admin_bp.route('/drivers/<int:driver_id>/verify', methods=['POST'])
 @jwt_required()
+@admin_required
 def verify_driver(driver_id):
     """Verify a driver"""
     try:
-        error = admin_required()
-        if error:
-            return error
-        
         driver = Driver.query.get(driver_id)
         if not driver:
             return jsonify({'error': 'Driver not found'}), 404
@@ -172,53 +217,59 @@ def verify_driver(driver_id):
 
 @admin_bp.route('/drivers', methods=['GET'])
 @jwt_required()
+@admin_required
+@replica_reads
 def list_all_drivers():
     """List all drivers with filters"""
     try:
-        error = admin_required()
-        if error:
-            return error
-        
         # Get query parameters
         status = request.args.get('status')
         is_verified = request.args.get('is_verified')
         service_area = request.args.get('service_area')
         
-        query = Driver.query
+        try:
+            shape, serialize, _ = get_fieldset(
+                'admin_driver', ADMIN_DRIVER_SHAPE, parse_fields(request.args.get('fields'))
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Project just the requested columns, joining the user only if needed
+        columns = dict(model_columns(Driver), **model_columns(User, prefix='user_'))
+        query = select_shape(shape, columns)
+        version_columns = [func.count(), func.max(Driver.updated_at)]
+        if 'user' in shape:
+            query = query.join(User, User.id == Driver.user_id)
+            version_columns.append(func.max(User.updated_at))
         
         if status:
-            query = query.filter_by(status=status)
+            query = query.where(Driver.status == status)
         if is_verified is not None:
-            query = query.filter_by(is_verified=is_verified == 'true')
+            query = query.where(Driver.is_verified == (is_verified == 'true'))
         if service_area:
-            query = query.filter_by(service_area=service_area)
+            query = query.where(Driver.service_area == service_area)
         
-        drivers = query.all()
+        def build():
+            drivers_list = [serialize(row) for row in db.session.execute(query)]
+            
+            return json_response({
+                'drivers': drivers_list,
+                'count': len(drivers_list)
+            })
         
-        drivers_list = []
-        for driver in drivers:
-            user = User.query.get(driver.user_id)
-            driver_dict = driver.to_dict()
-            driver_dict['user'] = user.to_dict()
-            drivers_list.append(driver_dict)
-        
-        return jsonify({
-            'drivers': drivers_list,
-            'count': len(drivers_list)
-        }), 200
+        version = tuple(db.session.execute(query.with_only_columns(*version_columns)).one())
+        return conditional(version, build)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/bookings', methods=['GET'])
 @jwt_required()
+@admin_required
+@replica_reads
 def list_all_bookings():
     """List all bookings with filters"""
     try:
-        error = admin_required()
-        if error:
-            return error
-        
         # Get query parameters
         status = request.args.get('status')
         customer_id = request.args.get('customer_id', type=int)
@@ -226,53 +277,88 @@ def list_all_bookings():
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
         
-        query = Booking.query
-        
-        if status:
-            query = query.filter_by(status=status)
-        if customer_id:
-            query = query.filter_by(customer_id=customer_id)
-        if driver_id:
-            query = query.filter_by(driver_id=driver_id)
-        if date_from:
-            query = query.filter(Booking.created_at >= datetime.fromisoformat(date_from))
-        if date_to:
-            query = query.filter(Booking.created_at <= datetime.fromisoformat(date_to))
-        
-        bookings = query.order_by(Booking.created_at.desc()).all()
-        
-        bookings_list = []
-        for booking in bookings:
-            booking_dict = booking.to_dict()
+        created_from = datetime.fromisoformat(date_from) if date_from else None
+        
+        try:
+            shape, serialize, strip = get_fieldset(
+                'admin_booking', ADMIN_BOOKING_SHAPE, parse_fields(request.args.get('fields')),
+                required=('created_at',)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        customer = aliased(User)
+        driver_user = aliased(User)
+        
+        # Historical ranges also read the archive table
+        queries = []
+        for model in booking_models(status=status, created_from=created_from):
+            columns = dict(model_columns(model), customer_name=customer.name, driver_name=driver_user.name)
+            query = select_shape(shape, columns)
+            version_columns = [func.count(), func.max(model.updated_at)]
+            
+            # Join for names only when they were requested
+            if 'customer_name' in shape:
+                query = query.join(customer, customer.id == model.customer_id)
+                version_columns.append(func.max(customer.updated_at))
+            if 'driver_name' in shape:
+                query = query.outerjoin(
+                    Driver, Driver.id == model.driver_id
+                ).outerjoin(
+                    driver_user, driver_user.id == Driver.user_id
+                )
+                version_columns.append(func.max(driver_user.updated_at))
             
-            # Add customer and driver names
-            customer = User.query.get(booking.customer_id)
-            booking_dict['customer_name'] = customer.name
+            if status:
+                query = query.where(model.status == status)
+            if customer_id:
+                query = query.where(model.customer_id == customer_id)
+            if driver_id:
+                query = query.where(model.driver_id == driver_id)
+            if created_from:
+                query = query.where(model.created_at >= created_from)
+            if date_to:
+                query = query.where(model.created_at <= datetime.fromisoformat(date_to))
             
-            if booking.driver_id:
-                driver = Driver.query.get(booking.driver_id)
-                driver_user = User.query.get(driver.user_id)
-                booking_dict['driver_name'] = driver_user.name
+            queries.append((model, query, version_columns))
+        
+        def build():
+            bookings_list = []
+            for model, query, _ in queries:
+                archived = model is ArchivedBooking
+                for row in db.session.execute(query.order_by(model.created_at.desc())):
+                    booking_dict = serialize(row)
+                    if 'driver_name' in booking_dict and booking_dict['driver_name'] is None:
+                        del booking_dict['driver_name']
+                    if archived:
+                        booking_dict['archived'] = True
+                    bookings_list.append(booking_dict)
             
-            bookings_list.append(booking_dict)
+            bookings_list.sort(key=lambda b: b['created_at'] or datetime.min, reverse=True)
+            for field in strip:
+                for booking_dict in bookings_list:
+                    del booking_dict[field]
+            
+            return json_response({
+                'bookings': bookings_list,
+                'count': len(bookings_list)
+            })
         
-        return jsonify({
-            'bookings': bookings_list,
-            'count': len(bookings_list)
-        }), 200
+        version = tuple(
+            tuple(db.session.execute(query.with_only_columns(*version_columns)).one())
+            for _, query, version_columns in queries
+        )
+        return conditional(version, build)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/bookings/<int:booking_id>/assign', methods=['POST'])
 @jwt_required()
+@admin_required
 def assign_driver_to_booking(booking_id):
     """Manually assign a driver to a booking"""
     try:
-        error = admin_required()
-        if error:
-            return error
-        
         data = request.get_json()
         
         if 'driver_id' not in data:
@@ -310,13 +396,10 @@ def assign_driver_to_booking(booking_id):
 
 @admin_bp.route('/bookings/<int:booking_id>/finalize', methods=['POST'])
 @jwt_required()
+@admin_required
 def finalize_booking(booking_id):
     """Finalize booking with final fare and calculate commission"""
     try:
-        error = admin_required()
-        if error:
-            return error
-        
         data = request.get_json()
         
         booking = Booking.query.get(booking_id)
@@ -361,22 +444,23 @@ def finalize_booking(booking_id):
 
 @admin_bp.route('/users/<int:user_id>/toggle-status', methods=['POST'])
 @jwt_required()
+@admin_required
 def toggle_user_status(user_id):
     """Activate or deactivate a user"""
     try:
-        error = admin_required()
-        if error:
-            return error
-        
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
         data = request.get_json()
         user.is_active = data.get('is_active', not user.is_active)
+        log_user_status(user.id, user.is_active)
         
         db.session.commit()
         
+        # Takes effect in this worker now, in the others within REVOCATION_REFRESH_SECONDS
+        revocation_list.refresh(force=True)
+        
         return jsonify({
             'message': f'User {"activated" if user.is_active else "deactivated"} successfully',
             'user': user.to_dict()
@@ -386,58 +470,153 @@ def toggle_user_status(user_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def build_revenue_report(date_from=None, date_to=None):
+    """Compute revenue summary and daily breakdown for completed bookings"""
+    bookings = []
+    for model in (Booking, ArchivedBooking):
+        query = model.query.filter_by(status='completed')
+        
+        if date_from:
+            query = query.filter(model.drop_time >= datetime.fromisoformat(date_from))
+        if date_to:
+            query = query.filter(model.drop_time <= datetime.fromisoformat(date_to))
+        
+        bookings.extend(query.all())
+    
+    total_bookings = len(bookings)
+    total_revenue = sum(b.final_fare or b.estimated_fare for b in bookings)
+    total_commission = sum(b.admin_commission or 0 for b in bookings)
+    total_driver_earnings = total_revenue - total_commission
+    
+    # Group by date
+    daily_revenue = {}
+    for booking in bookings:
+        if booking.drop_time:
+            date_key = booking.drop_time.date().isoformat()
+            if date_key not in daily_revenue:
+                daily_revenue[date_key] = {
+                    'bookings': 0,
+                    'revenue': 0,
+                    'commission': 0
+                }
+            daily_revenue[date_key]['bookings'] += 1
+            daily_revenue[date_key]['revenue'] += booking.final_fare or booking.estimated_fare
+            daily_revenue[date_key]['commission'] += booking.admin_commission or 0
+    
+    return {
+        'summary': {
+            'total_bookings': total_bookings,
+            'total_revenue': round(total_revenue, 2),
+            'total_commission': round(total_commission, 2),
+            'total_driver_earnings': round(total_driver_earnings, 2),
+            'average_fare': round(total_revenue / total_bookings, 2) if total_bookings > 0 else 0
+        },
+        'daily_breakdown': daily_revenue,
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
 @admin_bp.route('/reports/revenue', methods=['GET'])
 @jwt_required()
+@admin_required
+@replica_reads
 def revenue_report():
     """Generate revenue report"""
     try:
-        error = admin_required()
-        if error:
-            return error
-        
         # Get date range from query params
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
         
-        query = Booking.query.filter_by(status='completed')
+        report = get_or_compute(
+            'revenue_report', f'revenue_report:{date_from or ""}:{date_to or ""}',
+            ttl=Config.REPORT_CACHE_TTL,
+            compute=lambda: build_revenue_report(date_from, date_to),
+            tags=('bookings',)
+        )
         
-        if date_from:
-            query = query.filter(Booking.drop_time >= datetime.fromisoformat(date_from))
-        if date_to:
-            query = query.filter(Booking.drop_time <= datetime.fromisoformat(date_to))
-        
-        bookings = query.all()
-        
-        total_bookings = len(bookings)
-        total_revenue = sum(b.final_fare or b.estimated_fare for b in bookings)
-        total_commission = sum(b.admin_commission or 0 for b in bookings)
-        total_driver_earnings = total_revenue - total_commission
-        
-        # Group by date
-        daily_revenue = {}
-        for booking in bookings:
-            if booking.drop_time:
-                date_key = booking.drop_time.date().isoformat()
-                if date_key not in daily_revenue:
-                    daily_revenue[date_key] = {
-                        'bookings': 0,
-                        'revenue': 0,
-                        'commission': 0
-                    }
-                daily_revenue[date_key]['bookings'] += 1
-                daily_revenue[date_key]['revenue'] += booking.final_fare or booking.estimated_fare
-                daily_revenue[date_key]['commission'] += booking.admin_commission or 0
+        return jsonify(report), 200
         
-        return jsonify({
-            'summary': {
-                'total_bookings': total_bookings,
-                'total_revenue': round(total_revenue, 2),
-                'total_commission': round(total_commission, 2),
-                'total_driver_earnings': round(total_driver_earnings, 2),
-                'average_fare': round(total_revenue / total_bookings, 2) if total_bookings > 0 else 0
-            },
-            'daily_breakdown': daily_revenue
-        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_metrics():
+    """Get process-local metrics (cache hit/miss, staleness)"""
+    return jsonify(metrics.snapshot()), 200
+
+def _export_response(statements, columns, fmt, name):
+    """Stream the rows of one or more SELECT statements with server-side cursors"""
+    def generate():
+        # The view has returned by now, so re-enable replica routing for the stream
+        g.use_replica = current_app.config.get('READ_FROM_REPLICA', True)
+        rows = chain.from_iterable(
+            db.session.execute(statement.execution_options(yield_per=Config.EXPORT_BATCH_SIZE))
+            for statement in statements
+        )
+        yield from stream_rows(rows, columns, fmt)
+    
+    return Response(
+        stream_with_context(generate()),
+        content_type=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={name}.{fmt}'}
+    )
+
+@admin_bp.route('/export/bookings', methods=['GET'])
+@jwt_required()
+@admin_required
+def export_bookings():
+    """Export bookings (including archived) as streamed CSV or NDJSON"""
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': 'Invalid format. Use "csv" or "ndjson"'}), 400
+        
+        status = request.args.get('status')
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        created_from = datetime.fromisoformat(date_from) if date_from else None
+        created_to = datetime.fromisoformat(date_to) if date_to else None
+        
+        statements = []
+        for model in booking_models(status=status, created_from=created_from):
+            table = model.__table__
+            statement = select(*table.columns)
+            
+            if status:
+                statement = statement.where(table.c.status == status)
+            if created_from:
+                statement = statement.where(table.c.created_at >= created_from)
+            if created_to:
+                statement = statement.where(table.c.created_at <= created_to)
+            
+            statements.append(statement.order_by(table.c.id))
+        
+        columns = [column.name for column in Booking.__table__.columns]
+        return _export_response(statements, columns, fmt, 'bookings')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/export/drivers', methods=['GET'])
+@jwt_required()
+@admin_required
+def export_drivers():
+    """Export drivers with their user name and phone as streamed CSV or NDJSON"""
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': 'Invalid format. Use "csv" or "ndjson"'}), 400
+        
+        table = Driver.__table__
+        statement = select(
+            *table.columns,
+            User.name.label('user_name'),
+            User.phone.label('user_phone')
+        ).join(User.__table__, User.id == table.c.user_id).order_by(table.c.id)
+        
+        columns = [column.name for column in table.columns] + ['user_name', 'user_phone']
+        return _export_response([statement], columns, fmt, 'drivers')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
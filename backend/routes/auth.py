@@ -1,9 +1,14 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from models.user import User
 from database import db
+from utils.auth import create_user_token
+from utils.firebase_tokens import verify_firebase_token
+from utils.rate_limit import json_phone, rate_limited
+from utils.responses import conditional
+from utils.revocation import revocation_list, revoke_token
 import firebase_admin
-from firebase_admin import auth, credentials
+from firebase_admin import credentials
 import os
 
 auth_bp = Blueprint('auth', __name__)
@@ -16,6 +21,7 @@ except:
     print("Firebase credentials not found. OTP will not work.")
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limited('auth.register', phone=json_phone)
 def register():
     """Register new user (customer or driver)"""
     try:
@@ -49,11 +55,7 @@ def register():
         db.session.commit()
         
         # Generate JWT token
-        access_token = create_access_token(identity={
-            'id': user.id,
-            'phone': user.phone,
-            'role': user.role
-        })
+        access_token = create_user_token(user)
         
         return jsonify({
             'message': 'User registered successfully',
@@ -66,6 +68,7 @@ def register():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limited('auth.login', phone=json_phone)
 def login():
     """Login with phone (OTP verification handled by Firebase on frontend)"""
     try:
@@ -84,11 +87,7 @@ def login():
             return jsonify({'error': 'Account is deactivated'}), 403
         
         # Generate JWT token
-        access_token = create_access_token(identity={
-            'id': user.id,
-            'phone': user.phone,
-            'role': user.role
-        })
+        access_token = create_user_token(user)
         
         return jsonify({
             'message': 'Login successful',
@@ -100,6 +99,7 @@ def login():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/verify-otp', methods=['POST'])
+@rate_limited('auth.verify-otp')
 def verify_otp():
     """Verify Firebase OTP token"""
     try:
@@ -108,8 +108,8 @@ def verify_otp():
         if 'id_token' not in data:
             return jsonify({'error': 'ID token required'}), 400
         
-        # Verify the Firebase ID token
-        decoded_token = auth.verify_id_token(data['id_token'])
+        # Verify the Firebase ID token (cached signing keys; retries hit the verified-token cache)
+        decoded_token = verify_firebase_token(data['id_token'])
         phone = decoded_token.get('phone_number')
         firebase_uid = decoded_token.get('uid')
         
@@ -135,11 +135,7 @@ def verify_otp():
             db.session.commit()
         
         # Generate JWT token
-        access_token = create_access_token(identity={
-            'id': user.id,
-            'phone': user.phone,
-            'role': user.role
-        })
+        access_token = create_user_token(user)
         
         return jsonify({
             'message': 'OTP verified successfully',
@@ -161,7 +157,11 @@ def get_profile():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({'user': user.to_dict()}), 200
+        return conditional(
+            (user.id, user.updated_at),
+            lambda: (jsonify({'user': user.to_dict()}), 200),
+            last_modified=user.updated_at
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -225,3 +225,20 @@ def change_language():
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """Revoke the current access token"""
+    try:
+        token = get_jwt()
+        revoke_token(token['jti'], token['exp'])
+        db.session.commit()
+        
+        revocation_list.refresh(force=True)
+        
+        return jsonify({'message': 'Logged out successfully'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
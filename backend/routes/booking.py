@@ -1,19 +1,101 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.booking import Booking
+from models.booking import Booking, ArchivedBooking, booking_models, find_booking
 from models.driver import Driver
 from models.user import User
 from database import db
 from datetime import datetime
+from sqlalchemy import func, insert
+from sqlalchemy.orm import aliased
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from utils.auth import current_driver, current_driver_id
 from utils.helpers import generate_booking_id
-from utils.maps import calculate_distance, get_estimated_fare, get_nearby_drivers
-from utils.file_upload import save_file
+from utils.maps import (calculate_distance, calculate_distances, count_nearby_drivers,
+                        get_estimated_fare, get_nearby_drivers)
+from utils.file_upload import save_file, get_file_url
+from utils.image_jobs import get_image_status
+from utils.rate_limit import identity_phone, rate_limited
+from utils.responses import conditional
+from utils.serializers import (BOOKING_SHAPE, get_fieldset, json_response, model_columns,
+                               parse_fields, select_shape)
 from config import Config
 
 booking_bp = Blueprint('booking', __name__)
 
+BOOKING_REQUIRED_FIELDS = ['pickup_address', 'pickup_latitude', 'pickup_longitude',
+                           'drop_address', 'drop_latitude', 'drop_longitude',
+                           'goods_type', 'scheduled_date']
+
+# Free-text fields of a booking request: field -> required
+BOOKING_TEXT_FIELDS = {
+    'pickup_address': True, 'drop_address': True, 'goods_type': True,
+    'pickup_city': False, 'drop_city': False, 'special_instructions': False
+}
+BOOKING_WHOLE_NUMBER_FIELDS = ('weight_kg', 'volume_cubic_ft')
+
+def parse_booking_item(item):
+    """
+    Validate one booking request and convert its values to column types
+
+    Args:
+        item: One entry of the request's bookings list
+
+    Returns:
+        (values dict, None), or (None, error message) if the item is invalid
+    """
+    if not isinstance(item, dict) or not all(field in item for field in BOOKING_REQUIRED_FIELDS):
+        return None, 'Missing required fields'
+    
+    values = {}
+    for field, required in BOOKING_TEXT_FIELDS.items():
+        value = item.get(field)
+        if value is None:
+            if required:
+                return None, f'{field} is required'
+            values[field] = None
+            continue
+        if not isinstance(value, str):
+            return None, f'{field} must be a string'
+        max_length = Booking.__table__.c[field].type.length
+        if max_length and len(value) > max_length:
+            return None, f'{field} must be at most {max_length} characters'
+        values[field] = value
+    
+    for field in BOOKING_WHOLE_NUMBER_FIELDS:
+        value = item.get(field)
+        if value is None:
+            values[field] = None
+            continue
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            return None, f'{field} must be a non-negative whole number'
+        values[field] = value
+    
+    try:
+        for field, limit in (('pickup_latitude', 90), ('pickup_longitude', 180),
+                             ('drop_latitude', 90), ('drop_longitude', 180)):
+            if isinstance(item[field], bool):
+                raise TypeError(field)
+            values[field] = float(item[field])
+            if not -limit <= values[field] <= limit:
+                raise ValueError(field)
+        values['scheduled_date'] = datetime.fromisoformat(item['scheduled_date'])
+    except (TypeError, ValueError):
+        return None, 'Invalid coordinates or scheduled date'
+    
+    return values, None
+
+# Customer booking list: booking plus the assigned driver's contact and rating
+CUSTOMER_BOOKING_SHAPE = dict(BOOKING_SHAPE, driver={
+    'name': 'driver_name',
+    'phone': 'driver_phone',
+    'rating': (Driver.average_rating, ('driver_rating_sum', 'driver_rating_count'))
+})
+
 @booking_bp.route('/create', methods=['POST'])
 @jwt_required()
+@rate_limited('booking.create', phone=identity_phone)
 def create_booking():
     """Create a new booking"""
     try:
@@ -21,11 +103,7 @@ def create_booking():
         data = request.get_json()
         
         # Validate required fields
-        required_fields = ['pickup_address', 'pickup_latitude', 'pickup_longitude',
-                          'drop_address', 'drop_latitude', 'drop_longitude',
-                          'goods_type', 'scheduled_date']
-        
-        if not all(field in data for field in required_fields):
+        if not all(field in data for field in BOOKING_REQUIRED_FIELDS):
             return jsonify({'error': 'Missing required fields'}), 400
         
         # Calculate distance
@@ -81,6 +159,93 @@ def create_booking():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@booking_bp.route('/bulk-create', methods=['POST'])
+@jwt_required()
+@rate_limited('booking.bulk-create', phone=identity_phone)
+def bulk_create_bookings():
+    """Create many bookings in one transaction (business customers)"""
+    try:
+        current_user = get_jwt_identity()
+        data = request.get_json()
+        
+        items = data.get('bookings') if data else None
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'A non-empty bookings list is required'}), 400
+        
+        if len(items) > Config.MAX_BULK_BOOKINGS:
+            return jsonify({'error': f'At most {Config.MAX_BULK_BOOKINGS} bookings per request'}), 400
+        
+        # Validate every item, keeping per-item errors
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            values, error = parse_booking_item(item)
+            if error:
+                results[index] = {'index': index, 'error': error}
+                continue
+            
+            route = (values['pickup_latitude'], values['pickup_longitude'],
+                     values['drop_latitude'], values['drop_longitude'])
+            valid.append((index, values, route, values['scheduled_date']))
+        
+        if valid:
+            # Distances and fares for the whole batch
+            distances = calculate_distances([route for _, _, route, _ in valid])
+            
+            rows = []
+            for (index, item, route, scheduled_date), distance in zip(valid, distances):
+                rows.append({
+                    'booking_id': generate_booking_id(),
+                    'customer_id': current_user['id'],
+                    'pickup_address': item['pickup_address'],
+                    'pickup_latitude': route[0],
+                    'pickup_longitude': route[1],
+                    'pickup_city': item['pickup_city'],
+                    'drop_address': item['drop_address'],
+                    'drop_latitude': route[2],
+                    'drop_longitude': route[3],
+                    'drop_city': item['drop_city'],
+                    'goods_type': item['goods_type'],
+                    'weight_kg': item['weight_kg'],
+                    'volume_cubic_ft': item['volume_cubic_ft'],
+                    'special_instructions': item['special_instructions'],
+                    'distance_km': distance,
+                    'estimated_fare': get_estimated_fare(distance),
+                    'scheduled_date': scheduled_date
+                })
+            
+            # Multi-row INSERT ... RETURNING in a single transaction
+            bookings = db.session.scalars(
+                insert(Booking).returning(Booking, sort_by_parameter_order=True),
+                rows
+            ).all()
+            booking_dicts = [booking.to_dict() for booking in bookings]
+            db.session.commit()
+            
+            # Nearby-driver discovery in one pass for the whole batch
+            nearby_counts = count_nearby_drivers(
+                [(route[0], route[1]) for _, _, route, _ in valid],
+                radius_km=50
+            )
+            
+            for (index, _, _, _), booking_dict, nearby_count in zip(valid, booking_dicts, nearby_counts):
+                results[index] = {
+                    'index': index,
+                    'booking': booking_dict,
+                    'nearby_drivers_count': nearby_count
+                }
+        
+        return jsonify({
+            'message': f'{len(valid)} of {len(items)} bookings created',
+            'created': len(valid),
+            'failed': len(items) - len(valid),
+            'results': results
+        }), 201 if valid else 400
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @booking_bp.route('/my-bookings', methods=['GET'])
 @jwt_required()
 def get_my_bookings():
@@ -90,33 +255,74 @@ def get_my_bookings():
         
         status = request.args.get('status')
         
-        query = Booking.query.filter_by(customer_id=current_user['id'])
-        
-        if status:
-            query = query.filter_by(status=status)
-        
-        bookings = query.order_by(Booking.created_at.desc()).all()
-        
-        bookings_list = []
-        for booking in bookings:
-            booking_dict = booking.to_dict()
+        try:
+            shape, serialize, strip = get_fieldset(
+                'customer_booking', CUSTOMER_BOOKING_SHAPE, parse_fields(request.args.get('fields')),
+                required=('created_at', 'driver_id')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        driver_user = aliased(User)
+        
+        # Finished bookings may live in the archive table
+        queries = []
+        for model in booking_models(status=status):
+            columns = dict(
+                model_columns(model),
+                driver_name=driver_user.name,
+                driver_phone=driver_user.phone,
+                driver_rating_sum=Driver.rating_sum,
+                driver_rating_count=Driver.rating_count
+            )
+            query = select_shape(shape, columns).where(model.customer_id == current_user['id'])
+            version_columns = [func.count(), func.max(model.updated_at)]
             
-            # Add driver info if assigned
-            if booking.driver_id:
-                driver = Driver.query.get(booking.driver_id)
-                driver_user = User.query.get(driver.user_id)
-                booking_dict['driver'] = {
-                    'name': driver_user.name,
-                    'phone': driver_user.phone,
-                    'rating': driver.rating
-                }
+            # Join driver details only when requested
+            if 'driver' in shape:
+                query = query.outerjoin(
+                    Driver, Driver.id == model.driver_id
+                ).outerjoin(
+                    driver_user, driver_user.id == Driver.user_id
+                )
+                version_columns += [func.max(Driver.updated_at), func.max(driver_user.updated_at)]
             
-            bookings_list.append(booking_dict)
-        
-        return jsonify({
-            'bookings': bookings_list,
-            'count': len(bookings_list)
-        }), 200
+            if status:
+                query = query.where(model.status == status)
+            
+            queries.append((model, query, version_columns))
+        
+        def build():
+            bookings_list = []
+            for model, query, _ in queries:
+                archived = model is ArchivedBooking
+                for row in db.session.execute(query.order_by(model.created_at.desc())):
+                    booking_dict = serialize(row)
+                    
+                    # Driver info only if assigned
+                    if booking_dict['driver_id'] is None:
+                        booking_dict.pop('driver', None)
+                    if archived:
+                        booking_dict['archived'] = True
+                    
+                    bookings_list.append(booking_dict)
+            
+            bookings_list.sort(key=lambda b: b['created_at'] or datetime.min, reverse=True)
+            for field in strip:
+                for booking_dict in bookings_list:
+                    del booking_dict[field]
+            
+            return json_response({
+                'bookings': bookings_list,
+                'count': len(bookings_list)
+            })
+        
+        # Row counts and last-update times change whenever the list would
+        version = tuple(
+            tuple(db.session.execute(query.with_only_columns(*version_columns)).one())
+            for _, query, version_columns in queries
+        )
+        return conditional((current_user['id'], version), build)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -128,39 +334,48 @@ def get_booking(booking_id):
     try:
         current_user = get_jwt_identity()
         
-        booking = Booking.query.get(booking_id)
+        booking = find_booking(booking_id)
         if not booking:
             return jsonify({'error': 'Booking not found'}), 404
         
         # Check authorization
         if booking.customer_id != current_user['id'] and current_user['role'] != 'admin':
             if current_user['role'] == 'driver':
-                driver = Driver.query.filter_by(user_id=current_user['id']).first()
-                if not driver or booking.driver_id != driver.id:
+                driver_id = current_driver_id()
+                if not driver_id or booking.driver_id != driver_id:
                     return jsonify({'error': 'Unauthorized'}), 403
             else:
                 return jsonify({'error': 'Unauthorized'}), 403
         
-        booking_dict = booking.to_dict()
-        
-        # Add customer info
         customer = User.query.get(booking.customer_id)
-        booking_dict['customer'] = {
-            'name': customer.name,
-            'phone': customer.phone
-        }
+        driver = Driver.query.get(booking.driver_id) if booking.driver_id else None
+        driver_user = User.query.get(driver.user_id) if driver else None
         
-        # Add driver info if assigned
-        if booking.driver_id:
-            driver = Driver.query.get(booking.driver_id)
-            driver_user = User.query.get(driver.user_id)
-            booking_dict['driver'] = {
-                'name': driver_user.name,
-                'phone': driver_user.phone,
-                'rating': driver.rating
+        def build():
+            booking_dict = booking.to_dict()
+            
+            # Add customer info
+            booking_dict['customer'] = {
+                'name': customer.name,
+                'phone': customer.phone
             }
+            
+            # Add driver info if assigned
+            if driver:
+                booking_dict['driver'] = {
+                    'name': driver_user.name,
+                    'phone': driver_user.phone,
+                    'rating': driver.rating
+                }
+            
+            return jsonify({'booking': booking_dict}), 200
         
-        return jsonify({'booking': booking_dict}), 200
+        version = (
+            booking.__tablename__, booking.updated_at, customer.updated_at,
+            driver.updated_at if driver else None,
+            driver_user.updated_at if driver_user else None
+        )
+        return conditional(version, build, last_modified=booking.updated_at)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -227,25 +442,22 @@ def rate_booking(booking_id):
         if 'rating' not in data or not (1 <= data['rating'] <= 5):
             return jsonify({'error': 'Rating must be between 1 and 5'}), 400
         
+        previous_rating = booking.customer_rating
         booking.customer_rating = data['rating']
         booking.customer_feedback = data.get('feedback')
         
-        # Update driver rating
+        # Update driver rating totals in the same transaction
         if booking.driver_id:
-            driver = Driver.query.get(booking.driver_id)
-            
-            # Calculate new average rating
-            total_rated_trips = Booking.query.filter_by(
-                driver_id=driver.id,
-                status='completed'
-            ).filter(Booking.customer_rating.isnot(None)).count()
+            if previous_rating is None:
+                values = {
+                    Driver.rating_sum: Driver.rating_sum + data['rating'],
+                    Driver.rating_count: Driver.rating_count + 1
+                }
+            else:
+                # Re-rating replaces the earlier score
+                values = {Driver.rating_sum: Driver.rating_sum + data['rating'] - previous_rating}
             
-            if total_rated_trips > 0:
-                avg_rating = db.session.query(
-                    db.func.avg(Booking.customer_rating)
-                ).filter_by(driver_id=driver.id, status='completed').scalar()
-                
-                driver.rating = round(avg_rating, 1)
+            Driver.query.filter_by(id=booking.driver_id).update(values, synchronize_session=False)
         
         db.session.commit()
         
@@ -263,10 +475,8 @@ def rate_booking(booking_id):
 def get_available_bookings():
     """Get available bookings for drivers"""
     try:
-        current_user = get_jwt_identity()
-        
         # Check if user is driver
-        driver = Driver.query.filter_by(user_id=current_user['id']).first()
+        driver = current_driver()
         if not driver:
             return jsonify({'error': 'Driver profile not found'}), 404
         
@@ -311,9 +521,7 @@ def get_available_bookings():
 def accept_booking(booking_id):
     """Driver accepts a booking"""
     try:
-        current_user = get_jwt_identity()
-        
-        driver = Driver.query.filter_by(user_id=current_user['id']).first()
+        driver = current_driver()
         if not driver:
             return jsonify({'error': 'Driver profile not found'}), 404
         
@@ -363,8 +571,8 @@ def update_booking_status(booking_id):
         
         # Check authorization
         if current_user['role'] == 'driver':
-            driver = Driver.query.filter_by(user_id=current_user['id']).first()
-            if not driver or booking.driver_id != driver.id:
+            driver_id = current_driver_id()
+            if not driver_id or booking.driver_id != driver_id:
                 return jsonify({'error': 'Unauthorized'}), 403
         elif current_user['role'] != 'admin':
             return jsonify({'error': 'Unauthorized'}), 403
@@ -416,8 +624,13 @@ def upload_goods_image():
         
         return jsonify({
             'message': 'Image uploaded successfully',
-            'file_path': file_path
+            'file_path': file_path,
+            'url': get_file_url(file_path),
+            'optimization': get_image_status(file_path)
         }), 200
         
+    except (RequestEntityTooLarge, UnsupportedMediaType) as e:
+        # Raised while the upload streams in (see utils.file_upload.StagedUpload)
+        return jsonify({'error': e.description}), e.code
     except Exception as e:
         return jsonify({'error': str(e)}), 500
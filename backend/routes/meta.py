@@ -0,0 +1,74 @@
+from flask import Blueprint, Response, request
+import gzip
+import hashlib
+from config import Config
+from utils.helpers import GOODS_TYPES, VEHICLE_TYPES, TELANGANA_CITIES, TIME_SLOTS
+from utils.responses import brotli
+from utils.serializers import dumps
+
+meta_bp = Blueprint('meta', __name__)
+
+LANGUAGES = ('en', 'te')
+
+def _localize(items, language):
+    """Replace label_en/label_te with a single label in the given language"""
+    localized = []
+    for item in items:
+        entry = {key: value for key, value in item.items() if not key.startswith('label_')}
+        entry['label'] = item[f'label_{language}']
+        localized.append(entry)
+    return localized
+
+def _build_payloads():
+    """Serialize and precompress the reference data once per language"""
+    payloads = {}
+    for language in LANGUAGES:
+        body = dumps({
+            'language': language,
+            'goods_types': _localize(GOODS_TYPES, language),
+            'vehicle_types': _localize(VEHICLE_TYPES, language),
+            'cities': _localize(TELANGANA_CITIES, language),
+            'time_slots': list(TIME_SLOTS)
+        })
+        payloads[language] = {
+            'hash': hashlib.sha256(body).hexdigest()[:16],
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=9),
+            'br': brotli.compress(body, quality=11) if brotli is not None else None
+        }
+    return payloads
+
+# Built at startup; the data only changes with a deploy
+META_PAYLOADS = _build_payloads()
+
+@meta_bp.route('', methods=['GET'])
+def get_meta():
+    """
+    Reference data (goods types, vehicle types, cities, time slots) for one language.
+    Clients pass ?v=<hash> (the ETag) to cache it as immutable.
+    """
+    language = request.args.get('lang', 'en')
+    payload = META_PAYLOADS.get(language) or META_PAYLOADS['en']
+
+    if request.args.get('v') == payload['hash']:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = f'public, max-age={Config.META_MAX_AGE}'
+
+    if request.if_none_match.contains_weak(payload['hash']):
+        response = Response(status=304)
+    else:
+        encodings = request.accept_encodings
+        if payload['br'] is not None and encodings['br']:
+            response = Response(payload['br'], mimetype='application/json')
+            response.headers['Content-Encoding'] = 'br'
+        elif encodings['gzip']:
+            response = Response(payload['gzip'], mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(payload['identity'], mimetype='application/json')
+
+    response.set_etag(payload['hash'], weak=True)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
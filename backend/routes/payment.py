@@ -1,15 +1,16 @@
+import hashlib
+import json
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.booking import Booking
 from database import db
 import razorpay
 from config import Config
+from utils.auth import admin_required
+from utils.payment_reconciler import razorpay_client, record_webhook_event, schedule_payment_check
 
 payment_bp = Blueprint('payment', __name__)
 
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(auth=(Config.RAZORPAY_KEY_ID, Config.RAZORPAY_KEY_SECRET))
-
 @payment_bp.route('/create-order', methods=['POST'])
 @jwt_required()
 def create_payment_order():
@@ -30,7 +31,7 @@ def create_payment_order():
             return jsonify({'error': 'Unauthorized'}), 403
         
         # Check if already paid
-        if booking.payment_status == 'paid':
+        if booking.payment_status in ('paid', 'pending_capture'):
             return jsonify({'error': 'Booking already paid'}), 400
         
         # Determine amount (full or partial)
@@ -100,19 +101,21 @@ def verify_payment():
         if booking.customer_id != current_user['id']:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        # Update payment status
+        # Re-submitted after the payment was settled (paid, failed, refunded): nothing to redo
+        if (booking.razorpay_payment_id == data['razorpay_payment_id']
+                and booking.payment_status in ('paid', 'partial', 'failed', 'refunded')):
+            return jsonify({
+                'message': 'Payment already verified',
+                'booking': booking.to_dict(),
+                'payment_status': booking.payment_status
+            }), 200
+        
+        # Update payment status; the signature proves the checkout succeeded, and
+        # the captured amount (full or partial) is confirmed in the background
         booking.razorpay_payment_id = data['razorpay_payment_id']
-        
-        # Get payment details to determine if full or partial
-        payment = razorpay_client.payment.fetch(data['razorpay_payment_id'])
-        amount_paid = payment['amount'] / 100  # Convert paise to rupees
-        
-        if amount_paid >= booking.estimated_fare:
-            booking.payment_status = 'paid'
-            booking.payment_method = 'online'
-        else:
-            booking.payment_status = 'partial'
-            booking.payment_method = 'partial'
+        booking.payment_status = 'pending_capture'
+        booking.payment_method = 'online'
+        schedule_payment_check(booking.id, data['razorpay_payment_id'])
         
         # Confirm booking if it was pending
         if booking.status == 'pending':
@@ -132,62 +135,43 @@ def verify_payment():
 
 @payment_bp.route('/webhook', methods=['POST'])
 def payment_webhook():
-    """Handle Razorpay webhooks"""
+    """Handle Razorpay webhooks (stored once per event and applied in the background)"""
     try:
-        # Verify webhook signature
+        payload = request.get_data(as_text=True)
         webhook_signature = request.headers.get('X-Razorpay-Signature')
-        webhook_secret = Config.RAZORPAY_KEY_SECRET
+        if not webhook_signature:
+            return jsonify({'error': 'Missing webhook signature'}), 400
         
-        # Razorpay will verify this
-        razorpay_client.utility.verify_webhook_signature(
-            request.get_data().decode('utf-8'),
-            webhook_signature,
-            webhook_secret
-        )
+        # Verify webhook signature
+        try:
+            razorpay_client.utility.verify_webhook_signature(
+                payload,
+                webhook_signature,
+                Config.RAZORPAY_KEY_SECRET
+            )
+        except razorpay.errors.SignatureVerificationError:
+            return jsonify({'error': 'Invalid webhook signature'}), 400
         
-        data = request.get_json()
-        event = data['event']
-        
-        if event == 'payment.captured':
-            # Payment successful
-            payment_entity = data['payload']['payment']['entity']
-            order_id = payment_entity['order_id']
-            
-            booking = Booking.query.filter_by(razorpay_order_id=order_id).first()
-            if booking:
-                booking.razorpay_payment_id = payment_entity['id']
-                booking.payment_status = 'paid'
-                booking.status = 'confirmed'
-                db.session.commit()
-        
-        elif event == 'payment.failed':
-            # Payment failed
-            payment_entity = data['payload']['payment']['entity']
-            order_id = payment_entity['order_id']
-            
-            booking = Booking.query.filter_by(razorpay_order_id=order_id).first()
-            if booking:
-                # Keep booking as pending, customer can retry
-                pass
+        data = json.loads(payload)
+        payment_entity = data.get('payload', {}).get('payment', {}).get('entity', {})
+        # Retries of a delivery carry the same event ID
+        event_id = request.headers.get('X-Razorpay-Event-Id') or hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        
+        if not record_webhook_event(event_id, data['event'], payment_entity.get('order_id'), payload):
+            return jsonify({'status': 'duplicate'}), 200
         
         return jsonify({'status': 'success'}), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @payment_bp.route('/refund', methods=['POST'])
 @jwt_required()
+@admin_required
 def refund_payment():
     """Initiate refund for a cancelled booking (admin only)"""
     try:
-        current_user = get_jwt_identity()
-        
-        # Check if admin
-        from models.user import User
-        user = User.query.get(current_user['id'])
-        if user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-        
         data = request.get_json()
         
         if 'booking_id' not in data:
@@ -203,23 +187,18 @@ def refund_payment():
         if not booking.razorpay_payment_id:
             return jsonify({'error': 'No payment found for this booking'}), 400
         
-        # Get payment amount
-        payment = razorpay_client.payment.fetch(booking.razorpay_payment_id)
-        amount = payment['amount']
-        
-        # Create refund
-        refund_amount = data.get('amount', amount)  # Full or partial refund
-        
-        refund = razorpay_client.payment.refund(
-            booking.razorpay_payment_id,
-            {
-                'amount': refund_amount,
-                'speed': 'normal',
-                'notes': {
-                    'reason': data.get('reason', 'Booking cancelled')
-                }
+        # Create refund (Razorpay refunds the full payment unless an amount in paise is given)
+        refund_data = {
+            'speed': 'normal',
+            'notes': {
+                'reason': data.get('reason', 'Booking cancelled')
             }
-        )
+        }
+        if 'amount' in data:
+            refund_data['amount'] = data['amount']  # Partial refund
+        
+        refund = razorpay_client.payment.refund(booking.razorpay_payment_id, refund_data)
+        refund_amount = refund['amount']
         
         booking.payment_status = 'refunded'
         db.session.commit()
@@ -237,18 +216,12 @@ def refund_payment():
 
 @payment_bp.route('/cash-payment', methods=['POST'])
 @jwt_required()
+@admin_required
 def mark_cash_payment():
     """Mark booking as cash payment (admin confirms after delivery)"""
     try:
-        current_user = get_jwt_identity()
         data = request.get_json()
         
-        # Check if admin
-        from models.user import User
-        user = User.query.get(current_user['id'])
-        if user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-        
         if 'booking_id' not in data:
             return jsonify({'error': 'Booking ID required'}), 400
         
@@ -0,0 +1,197 @@
+from flask import Blueprint, Response, redirect, request, jsonify, send_file
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from PIL import UnidentifiedImageError
+from werkzeug.exceptions import Forbidden, UnsupportedMediaType
+from werkzeug.utils import secure_filename
+import mimetypes
+import os
+import re
+import time
+from config import Config
+from utils import metrics
+from utils.derivatives import DERIVATIVE_FORMATS, DERIVATIVE_SIZES, SOURCE_FORMATS, derivative_cache
+from utils.file_upload import (UPLOAD_KEY, allowed_file, get_file_url, grant_direct_upload,
+                               register_direct_upload, stream_to_staging, upload_key)
+from utils.image_jobs import get_image_status, served_key
+from utils.storage import storage, verify_file_signature
+
+uploads_bp = Blueprint('uploads', __name__)
+
+SHA256_HEX = re.compile(r'^[0-9a-f]{64}$')
+
+@uploads_bp.route('/uploads/<path:file_path>', methods=['GET'])
+def serve_upload(file_path):
+    """
+    Serve an uploaded file from a signed URL (see utils.file_upload.get_file_url).
+    The signature replaces a per-request JWT/database check, so image viewers can
+    issue Range and conditional requests cheaply.
+    """
+    expires = request.args.get('expires')
+    if not verify_file_signature(file_path, expires, request.args.get('sig')):
+        metrics.incr('uploads.rejected')
+        return jsonify({'error': 'Invalid or expired link'}), 403
+
+    # Resized/reformatted copy (?size=thumb&format=webp), rendered once and then cached
+    size = request.args.get('size')
+    fmt = request.args.get('format')
+    if size or fmt:
+        source_format = SOURCE_FORMATS.get(os.path.splitext(file_path)[1].lower())
+        if source_format is None:
+            return jsonify({'error': 'Derivatives are only available for images'}), 400
+        if size not in DERIVATIVE_SIZES or (fmt and fmt not in DERIVATIVE_FORMATS):
+            return jsonify({'error': f"size must be one of {', '.join(DERIVATIVE_SIZES)}; "
+                                     f"format one of {', '.join(DERIVATIVE_FORMATS)}"}), 400
+        try:
+            full_path = derivative_cache.get(file_path, size, fmt or source_format)
+        except (ValueError, UnidentifiedImageError) as e:
+            return jsonify({'error': str(e)}), 422
+        if full_path is None:
+            return jsonify({'error': 'File not found'}), 404
+        file_path = os.path.relpath(full_path, os.path.abspath(Config.UPLOAD_FOLDER)).replace(os.sep, '/')
+    elif not storage.is_local:
+        # Files live in object storage; send the client there (to the optimized copy once it exists)
+        return redirect(storage.download_url(served_key(file_path), int(expires)))
+    else:
+        # Serve the background-optimized copy of an image once it exists
+        file_path = served_key(file_path)
+        full_path = storage.path(file_path)
+        if full_path is None or not os.path.isfile(full_path):
+            return jsonify({'error': 'File not found'}), 404
+
+    # Browsers may reuse the file until the link expires (links are stable within an expiry window)
+    cache_control = f'private, max-age={max(int(expires) - int(time.time()), 0)}'
+    metrics.incr('uploads.served')
+
+    if Config.UPLOAD_ACCEL_REDIRECT:
+        # Let nginx stream the body (it handles Range itself) from an internal location
+        response = Response(mimetype=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = Config.UPLOAD_ACCEL_REDIRECT.rstrip('/') + '/' + file_path
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    # send_file streams through wsgi.file_wrapper (sendfile under gunicorn)
+    # and answers Range, If-None-Match and If-Modified-Since
+    response = send_file(full_path, conditional=True, etag=True, max_age=None)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+@uploads_bp.route('/uploads/<path:file_path>', methods=['PUT'])
+def receive_upload(file_path):
+    """
+    Direct-upload target for local storage, standing in for a presigned object
+    storage PUT. The body must hash to the SHA-256 in the key.
+    """
+    if not verify_file_signature(file_path, request.args.get('expires'), request.args.get('sig'), 'PUT'):
+        metrics.incr('uploads.rejected')
+        return jsonify({'error': 'Invalid or expired link'}), 403
+
+    match = UPLOAD_KEY.match(file_path)
+    if not match:
+        return jsonify({'error': 'Invalid upload key'}), 400
+
+    if request.content_length is not None and request.content_length > Config.MAX_FILE_SIZE:
+        return jsonify({'error': f'File must be at most {Config.MAX_FILE_SIZE // (1024 * 1024)}MB'}), 413
+
+    # Size and file type are checked as the body arrives (StagedUpload raises 413/415)
+    temp_path, sha256, _ = stream_to_staging(request.stream, file_path)
+    if sha256 != match.group(2):
+        os.remove(temp_path)
+        return jsonify({'error': 'Body does not match the presigned checksum'}), 400
+
+    storage.save(temp_path, file_path)
+    return '', 200
+
+@uploads_bp.route('/api/uploads/presign', methods=['POST'])
+@jwt_required()
+def presign_upload():
+    """
+    Start a direct upload to storage. The client sends the file's SHA-256, so
+    content that is already stored needs no upload at all.
+
+    Body: {folder, filename, content_type, size, sha256}
+    Then PUT the file as instructed and call /api/uploads/complete with the
+    returned file_path and upload_token.
+    """
+    try:
+        data = request.get_json() or {}
+        
+        folder = secure_filename(data.get('folder') or 'general')
+        filename = data.get('filename') or ''
+        content_type = data.get('content_type') or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        sha256 = (data.get('sha256') or '').lower()
+        
+        if not allowed_file(filename):
+            return jsonify({'error': 'File type not allowed'}), 400
+        if not SHA256_HEX.match(sha256):
+            return jsonify({'error': 'sha256 must be a hex SHA-256 digest'}), 400
+        try:
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'size is required'}), 400
+        if not 0 < size <= Config.MAX_FILE_SIZE:
+            return jsonify({'error': f'File must be at most {Config.MAX_FILE_SIZE // (1024 * 1024)}MB'}), 400
+        
+        file_path = upload_key(folder, sha256, os.path.splitext(secure_filename(filename))[1].lower())
+        
+        upload_token = grant_direct_upload(get_jwt_identity()['id'], file_path)
+        
+        if storage.size(file_path) == size:
+            metrics.incr('uploads.presign_skipped')
+            return jsonify({'file_path': file_path, 'upload_token': upload_token, 'exists': True}), 200
+        
+        expires = int(time.time()) + Config.UPLOAD_URL_EXPIRES
+        return jsonify({
+            'file_path': file_path,
+            'upload_token': upload_token,
+            'exists': False,
+            'upload': storage.presign_upload(file_path, content_type, size, sha256, expires)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@uploads_bp.route('/api/uploads/complete', methods=['POST'])
+@jwt_required()
+def complete_upload():
+    """Record a direct upload (body: {file_path, upload_token} from /api/uploads/presign)"""
+    try:
+        data = request.get_json() or {}
+        file_path = data.get('file_path')
+        
+        if not register_direct_upload(file_path, get_jwt_identity()['id'], data.get('upload_token'),
+                                      compress=data.get('compress', True)):
+            return jsonify({'error': 'Upload not found'}), 400
+        
+        return jsonify({
+            'message': 'Upload recorded',
+            'file_path': file_path,
+            'url': get_file_url(file_path),
+            'optimization': get_image_status(file_path)
+        }), 200
+        
+    except (Forbidden, UnsupportedMediaType) as e:
+        return jsonify({'error': e.description}), e.code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@uploads_bp.route('/api/uploads/status', methods=['GET'])
+@jwt_required()
+def upload_status():
+    """
+    Background optimization status of an uploaded image (?path=<file_path>).
+    Only the job state: uploads record no owner, so no signed URL is handed out
+    here (the upload response already gave the uploader one).
+    """
+    try:
+        file_path = request.args.get('path')
+        if not file_path:
+            return jsonify({'error': 'path is required'}), 400
+        
+        status = get_image_status(file_path)
+        if status is None:
+            return jsonify({'error': 'No optimization job for this file'}), 404
+        
+        return jsonify({'optimization': status}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,126 @@
+# Shared fixtures. Run from the backend folder: python -m pytest tests
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'AIza-test-key')  # googlemaps checks the format at import
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from config import Config
+from database import db
+from models.booking import Booking
+from models.user import User
+from models.vehicle import Vehicle  # noqa: F401 (resolves Driver.vehicles)
+from utils.auth import create_user_token
+from utils.cache import register_invalidation_listeners
+from utils.file_upload import UploadRequest
+from utils.storage import LocalStorage
+
+register_invalidation_listeners()
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits(monkeypatch):
+    """Every test starts with full rate limit buckets"""
+    from utils import rate_limit
+    monkeypatch.setattr(rate_limit, 'buckets', rate_limit.LocalBuckets())
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App with the API blueprints on an in-memory database; uploads go under tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    # Lease a booking ID node from this test's database, as a new process would
+    from utils import helpers
+    monkeypatch.setattr(helpers, '_id_state', dict(helpers._id_state, pid=None, engine=None))
+
+    from routes.admin import admin_bp
+    from routes.auth import auth_bp
+    from routes.booking import booking_bp
+    from routes.payment import payment_bp
+    from routes.uploads import uploads_bp
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.request_class = UploadRequest
+    JWTManager(app)
+    db.init_app(app)
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(booking_bp, url_prefix='/api/booking')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(payment_bp, url_prefix='/api/payment')
+    app.register_blueprint(uploads_bp)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+class ObjectStorage(LocalStorage):
+    """Stand-in for S3Storage backed by a folder: not served by the app, copied in and out"""
+
+    is_local = False
+
+    def staging_dir(self):
+        return tempfile.gettempdir()
+
+    def save(self, source_path, key):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(source_path, target)
+
+    @contextmanager
+    def local_copy(self, key):
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        os.close(fd)
+        try:
+            shutil.copyfile(self.path(key), path)
+            yield path
+        finally:
+            os.remove(path)
+
+    def download_url(self, key, expires):
+        return f"https://bucket.example/{key}?expires={expires}"
+
+@pytest.fixture
+def object_storage(tmp_path, monkeypatch):
+    """Swap the configured storage for ObjectStorage in every module that imported it"""
+    backend = ObjectStorage(str(tmp_path / 'bucket'))
+    for module in ('utils.storage', 'utils.file_upload', 'utils.image_jobs', 'utils.derivatives', 'routes.uploads'):
+        monkeypatch.setattr(f'{module}.storage', backend)
+    return backend
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def create_user(app):
+    """Factory: create_user(role, phone) -> (user, auth headers)"""
+    def create(role='customer', phone='9000000001'):
+        user = User(phone=phone, name=role.capitalize(), role=role)
+        db.session.add(user)
+        db.session.commit()
+        with app.test_request_context():
+            token = create_user_token(user)
+        return user, {'Authorization': f'Bearer {token}'}
+    return create
+
+def make_booking(customer_id, **overrides):
+    """Booking with every required column filled in"""
+    fields = dict(
+        booking_id=f"SRTA-TEST-{overrides.get('razorpay_order_id', 'x')}", customer_id=customer_id,
+        pickup_address='Ameerpet', pickup_latitude=17.43, pickup_longitude=78.44,
+        drop_address='Hanamkonda', drop_latitude=18.0, drop_longitude=79.56,
+        goods_type='cement', weight_kg=2000, distance_km=135.2, estimated_fare=500,
+        scheduled_date=datetime.utcnow()
+    )
+    fields.update(overrides)
+    return Booking(**fields)
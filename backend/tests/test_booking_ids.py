@@ -0,0 +1,77 @@
+import re
+from datetime import datetime, timedelta
+import pytest
+from config import Config
+from database import db
+from models.id_node import IdNode
+from utils import helpers
+from utils.helpers import generate_booking_id, generate_invoice_number
+
+ID_FORMAT = re.compile(r'^SRTA-\d{8}-[0-9A-HJKMNP-TV-Z]{10}$')
+
+@pytest.fixture(autouse=True)
+def use_app(app):
+    pass
+
+def as_process(monkeypatch, pid):
+    monkeypatch.setattr(helpers.os, 'getpid', lambda: pid)
+
+def node_of(booking_id):
+    value = 0
+    for char in booking_id.rsplit('-', 1)[1]:
+        value = value * 32 + helpers.ID_ALPHABET.index(char)
+    return (value >> helpers.ID_SEQUENCE_BITS) & ((1 << helpers.ID_NODE_BITS) - 1)
+
+def test_ids_are_unique_and_increasing():
+    ids = [generate_booking_id() for _ in range(10000)]
+    assert all(ID_FORMAT.match(booking_id) for booking_id in ids)
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+def test_invoice_numbers_share_the_generator():
+    first, second = generate_invoice_number(), generate_booking_id()
+    assert first.startswith('INV-')
+    assert first.rsplit('-', 1)[1] < second.rsplit('-', 1)[1]
+
+def test_each_process_leases_its_own_node(monkeypatch):
+    nodes = set()
+    for pid in (1001, 3003, 1001 + 1024):  # PIDs 1024 apart used to collide
+        as_process(monkeypatch, pid)
+        nodes.add(node_of(generate_booking_id()))
+    assert len(nodes) == 3
+    assert IdNode.query.count() == 3
+
+def test_expired_lease_is_reused(monkeypatch):
+    as_process(monkeypatch, 1001)
+    node = node_of(generate_booking_id())
+    IdNode.query.update({'heartbeat_at': datetime.utcnow() - timedelta(seconds=Config.ID_NODE_LEASE_SECONDS + 1)})
+    db.session.commit()
+
+    as_process(monkeypatch, 2002)
+    assert node_of(generate_booking_id()) == node
+    assert IdNode.query.count() == 1
+
+def test_live_lease_is_not_taken(monkeypatch):
+    as_process(monkeypatch, 1001)
+    first = node_of(generate_booking_id())
+    as_process(monkeypatch, 2002)
+    assert node_of(generate_booking_id()) != first
+
+def test_lost_lease_is_replaced_before_the_next_id(monkeypatch):
+    as_process(monkeypatch, 1001)
+    node = node_of(generate_booking_id())
+    # Another process took the node while this one was suspended past its lease
+    IdNode.query.filter_by(node=node).update({'owner': 'elsewhere:1'})
+    db.session.commit()
+    helpers._id_state['renewed_at'] -= timedelta(seconds=Config.ID_NODE_LEASE_SECONDS)
+
+    assert node_of(generate_booking_id()) != node
+
+def test_all_nodes_leased_is_an_error(monkeypatch):
+    now = datetime.utcnow()
+    db.session.execute(IdNode.__table__.insert(), [
+        {'node': node, 'owner': f'host:{node}', 'heartbeat_at': now} for node in range(1 << helpers.ID_NODE_BITS)
+    ])
+    db.session.commit()
+    with pytest.raises(RuntimeError):
+        generate_booking_id()
@@ -0,0 +1,55 @@
+import pytest
+from models.booking import Booking
+
+def booking_item(**overrides):
+    item = {
+        'pickup_address': 'Ameerpet, Hyderabad', 'pickup_latitude': 17.43, 'pickup_longitude': 78.44,
+        'drop_address': 'Hanamkonda, Warangal', 'drop_latitude': 18.0, 'drop_longitude': 79.56,
+        'goods_type': 'cement', 'weight_kg': 2000, 'scheduled_date': '2026-11-01T10:00:00'
+    }
+    item.update(overrides)
+    return item
+
+@pytest.mark.parametrize('overrides, error', [
+    ({'goods_type': {'name': 'cement'}}, 'goods_type must be a string'),
+    ({'pickup_address': 'x' * 256}, 'pickup_address must be at most 255 characters'),
+    ({'drop_city': ['warangal']}, 'drop_city must be a string'),
+    ({'weight_kg': 'heavy'}, 'weight_kg must be a non-negative whole number'),
+    ({'weight_kg': 12.5}, 'weight_kg must be a non-negative whole number'),
+    ({'volume_cubic_ft': True}, 'volume_cubic_ft must be a non-negative whole number'),
+    ({'pickup_latitude': 'north'}, 'Invalid coordinates or scheduled date'),
+    ({'drop_longitude': 200}, 'Invalid coordinates or scheduled date'),
+    ({'scheduled_date': 20261101}, 'Invalid coordinates or scheduled date'),
+    ({'goods_type': None}, 'goods_type is required'),
+])
+def test_invalid_item_fails_alone(client, create_user, overrides, error):
+    _, headers = create_user()
+    response = client.post('/api/booking/bulk-create', headers=headers, json={
+        'bookings': [booking_item(), booking_item(**overrides), 'not a booking']
+    })
+
+    assert response.status_code == 201
+    results = response.json['results']
+    assert response.json['created'] == 1
+    assert 'booking' in results[0]
+    assert results[1] == {'index': 1, 'error': error}
+    assert results[2] == {'index': 2, 'error': 'Missing required fields'}
+    assert Booking.query.count() == 1
+
+def test_whole_number_floats_are_accepted(client, create_user):
+    _, headers = create_user()
+    response = client.post('/api/booking/bulk-create', headers=headers, json={
+        'bookings': [booking_item(weight_kg=2000.0, volume_cubic_ft=None)]
+    })
+
+    assert response.status_code == 201
+    assert Booking.query.one().weight_kg == 2000
+
+def test_all_invalid_is_a_400(client, create_user):
+    _, headers = create_user()
+    response = client.post('/api/booking/bulk-create', headers=headers, json={
+        'bookings': [booking_item(goods_type=7)]
+    })
+
+    assert response.status_code == 400
+    assert response.json['failed'] == 1
@@ -0,0 +1,67 @@
+import pytest
+from database import db
+from models.driver import Driver
+from models.user import User
+from utils import cache
+from utils.cache import LocalCache, get_or_compute
+
+@pytest.fixture(autouse=True)
+def local_cache(monkeypatch):
+    backend = LocalCache()
+    monkeypatch.setattr(cache, 'response_cache', backend)
+    return backend
+
+def cached_value(name, tags, value):
+    return get_or_compute(name, name, ttl=300, compute=lambda: value, tags=tags)
+
+@pytest.fixture
+def driver(app):
+    user = User(phone='9000000002', name='Driver', role='driver')
+    db.session.add(user)
+    db.session.commit()
+    driver = Driver(user_id=user.id, license_number='TS-0001', status='offline')
+    db.session.add(driver)
+    db.session.commit()
+    return driver
+
+@pytest.mark.parametrize('column, value', [
+    ('status', 'available'),
+    ('total_trips', 7),
+    ('rating_sum', 5),
+    ('is_verified', True),
+])
+def test_watched_driver_column_invalidates(driver, column, value):
+    cached_value('dashboard', ('drivers',), 'old')
+    setattr(driver, column, value)
+    db.session.commit()
+    assert cached_value('dashboard', ('drivers',), 'new') == 'new'
+
+def test_unwatched_column_keeps_entry(driver):
+    cached_value('dashboard', ('drivers',), 'old')
+    driver.current_latitude = 17.4
+    db.session.commit()
+    assert cached_value('dashboard', ('drivers',), 'new') == 'old'
+
+def test_new_user_invalidates_user_counts(app):
+    cached_value('dashboard', ('users',), 'old')
+    db.session.add(User(phone='9000000003', name='New', role='customer'))
+    db.session.commit()
+    assert cached_value('dashboard', ('users',), 'new') == 'new'
+
+def test_rollback_keeps_entry(driver):
+    cached_value('dashboard', ('drivers',), 'old')
+    driver.status = 'busy'
+    db.session.flush()
+    db.session.rollback()
+    assert cached_value('dashboard', ('drivers',), 'new') == 'old'
+
+def test_redis_tag_set_outlives_longest_entry(monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    monkeypatch.setattr(cache.redis.Redis, 'from_url', classmethod(lambda cls, url: fakeredis.FakeRedis()))
+    backend = cache.RedisCache('redis://test')
+    backend.set('report', {'a': 1}, 300, ('bookings',))
+    backend.set('dashboard', {'b': 1}, 30, ('bookings',))
+    assert backend._client.ttl('srta:cache:tag:bookings') > 30
+    assert backend.invalidate('bookings') == 2
+    assert backend.get('report') is None
@@ -0,0 +1,42 @@
+import io
+import os
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from models.stored_file import StoredFile
+from utils.file_upload import delete_file, save_file
+from utils.image_jobs import optimized_key
+from utils.storage import storage
+
+def png_bytes(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def upload(body, filename='photo.png'):
+    return FileStorage(io.BytesIO(body), filename=filename)
+
+def staged_files():
+    return os.listdir(storage.staging_dir())
+
+def test_identical_uploads_share_one_blob(app):
+    first = save_file(upload(png_bytes()), folder='goods', compress=False)
+    second = save_file(upload(png_bytes()), folder='goods', compress=False)
+    other = save_file(upload(png_bytes('blue')), folder='goods', compress=False)
+
+    assert first == second != other
+    assert StoredFile.query.filter_by(file_path=first).one().ref_count == 2
+    assert staged_files() == []
+
+def test_blob_is_removed_with_its_last_reference(app):
+    file_path = save_file(upload(png_bytes()), folder='goods', compress=False)
+    save_file(upload(png_bytes()), folder='goods', compress=False)
+    with open(storage.path(optimized_key(file_path)), 'wb') as copy:
+        copy.write(png_bytes())
+
+    assert delete_file(file_path) is False
+    assert os.path.isfile(storage.path(file_path))
+
+    assert delete_file(file_path) is True
+    assert not os.path.exists(storage.path(file_path))
+    assert not os.path.exists(storage.path(optimized_key(file_path)))
+    assert StoredFile.query.filter_by(file_path=file_path).count() == 0
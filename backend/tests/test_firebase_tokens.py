@@ -0,0 +1,64 @@
+import jwt
+import pytest
+from utils.firebase_tokens import KeyCache, LocalSigner, TokenVerifier
+
+PROJECT = 'srta-test'
+PHONE = '+919000000001'
+
+@pytest.fixture(scope='module')
+def signer(tmp_path_factory):
+    return LocalSigner(str(tmp_path_factory.mktemp('keys') / 'signer.pem'))
+
+class CountingFetch:
+    """Key source that records how often it is asked"""
+
+    def __init__(self, signer):
+        self.signer = signer
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.signer.fetch_keys()
+
+@pytest.fixture
+def fetch(signer):
+    return CountingFetch(signer)
+
+@pytest.fixture
+def verifier(fetch):
+    return TokenVerifier(KeyCache(fetch), PROJECT, cache_size=2)
+
+def test_valid_token_is_verified_once(signer, fetch, verifier):
+    token = signer.sign(PROJECT, PHONE, uid='user-1')
+
+    claims = verifier.verify(token)
+    assert claims['uid'] == 'user-1' and claims['phone_number'] == PHONE
+    assert verifier.verify(token) is claims  # Retried login: served from the verified-token cache
+    assert fetch.calls == 1
+
+@pytest.mark.parametrize('token_for', [
+    lambda signer: signer.sign('other-project', PHONE),
+    lambda signer: signer.sign(PROJECT, PHONE, lifetime=-60),
+    lambda signer: signer.sign(PROJECT, PHONE)[:-4] + 'AAAA',
+])
+def test_invalid_tokens_are_rejected(signer, verifier, token_for):
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(token_for(signer))
+
+def test_unknown_key_refetches_at_most_once_a_minute(signer, fetch, verifier, tmp_path):
+    verifier.verify(signer.sign(PROJECT, PHONE))
+    stranger = LocalSigner(str(tmp_path / 'stranger.pem'))
+    stranger.kid = 'stranger'
+
+    for _ in range(3):
+        with pytest.raises(jwt.InvalidTokenError):
+            verifier.verify(stranger.sign(PROJECT, PHONE))
+    assert fetch.calls == 2
+
+def test_rotated_key_is_picked_up(signer, fetch, verifier, tmp_path):
+    verifier.verify(signer.sign(PROJECT, PHONE))
+    fetch.signer = LocalSigner(str(tmp_path / 'rotated.pem'))
+    fetch.signer.kid = 'rotated'
+
+    claims = verifier.verify(fetch.signer.sign(PROJECT, PHONE, uid='user-2'))
+    assert claims['uid'] == 'user-2'
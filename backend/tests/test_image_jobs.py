@@ -0,0 +1,55 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from PIL import Image
+from models.image_job import ImageJob
+from utils import image_jobs
+from utils.file_upload import get_file_url
+from utils.image_jobs import optimized_key, schedule_optimization, served_key
+
+KEY = 'documents/ab/ab' + '0' * 62 + '.jpg'
+
+@pytest.fixture
+def inline_pool(monkeypatch):
+    """Run optimization jobs on a thread so the test can wait for them"""
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(image_jobs, '_get_executor', lambda: pool)
+    monkeypatch.setattr(image_jobs, '_optimized_lookups', {})
+    yield pool
+    pool.shutdown(wait=True)
+
+def store_photo(backend, key=KEY):
+    path = backend.path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.effect_noise((3000, 2000), 64).convert('RGB').save(path, 'JPEG', quality=100)
+
+def test_object_storage_optimizes_and_redirects_to_copy(app, object_storage, inline_pool):
+    store_photo(object_storage)
+    assert served_key(KEY) == KEY
+
+    assert schedule_optimization(KEY) == 'pending'
+    inline_pool.shutdown(wait=True)
+
+    job = ImageJob.query.one()
+    assert job.status == 'ready' and job.optimized_size < job.original_size
+    assert object_storage.size(optimized_key(KEY)) == job.optimized_size
+
+    # The "no copy yet" answer is remembered for a while, then checked again
+    image_jobs._optimized_lookups[KEY] = (False, time.time() - app.config['OPTIMIZED_LOOKUP_SECONDS'] - 1)
+    url = get_file_url(KEY)
+    assert url.startswith('/uploads/')
+    response = app.test_client().get(url)
+    assert response.status_code == 302
+    assert response.location.startswith(f'https://bucket.example/{optimized_key(KEY)}?')
+
+def test_local_storage_serves_optimized_copy(app, inline_pool):
+    backend = image_jobs.storage
+    store_photo(backend)
+    schedule_optimization(KEY)
+    inline_pool.shutdown(wait=True)
+
+    assert served_key(KEY) == optimized_key(KEY)
+    response = app.test_client().get(get_file_url(KEY))
+    assert response.status_code == 200
+    assert len(response.data) == ImageJob.query.one().optimized_size
@@ -0,0 +1,129 @@
+# Run from the backend folder: python -m pytest tests
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from config import Config
+from database import db
+from models.booking import Booking
+from models.payment_check import PaymentCheck
+from models.user import User
+from models.vehicle import Vehicle  # noqa: F401 (resolves Driver.vehicles)
+from routes.admin import build_dashboard
+from routes.payment import payment_bp
+from utils import payment_reconciler
+from utils.auth import create_user_token
+
+class FakePayments:
+    def __init__(self):
+        self.state = {}
+
+    def all(self, data):
+        return {'items': list(self.state.values())}
+
+    def fetch(self, payment_id):
+        return self.state[payment_id]
+
+class FakeUtility:
+    def verify_payment_signature(self, data):
+        return True
+
+class FakeRazorpay:
+    def __init__(self):
+        self.payment = FakePayments()
+        self.utility = FakeUtility()
+
+@pytest.fixture
+def client(monkeypatch):
+    razorpay = FakeRazorpay()
+    monkeypatch.setattr(payment_reconciler, 'razorpay_client', razorpay)
+    monkeypatch.setattr('routes.payment.razorpay_client', razorpay)
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    JWTManager(app)
+    db.init_app(app)
+    app.register_blueprint(payment_bp, url_prefix='/api/payment')
+
+    with app.app_context():
+        db.create_all()
+        customer = User(phone='9000000001', name='Customer', role='customer')
+        db.session.add(customer)
+        db.session.commit()
+        db.session.add(Booking(
+            booking_id='SRTA-TEST-1', customer_id=customer.id, pickup_address='Ameerpet',
+            pickup_latitude=17.43, pickup_longitude=78.44, drop_address='Hanamkonda',
+            drop_latitude=18.0, drop_longitude=79.56, goods_type='cement', weight_kg=2000,
+            distance_km=135.2, estimated_fare=500, scheduled_date=datetime.utcnow(),
+            razorpay_order_id='order_1'
+        ))
+        db.session.commit()
+        with app.test_request_context():
+            token = create_user_token(customer)
+
+        test_client = app.test_client()
+        test_client.razorpay = razorpay
+        test_client.headers = {'Authorization': f'Bearer {token}'}
+        yield test_client
+        db.session.remove()
+        db.drop_all()
+
+def verify(client, payment_id='pay_1'):
+    return client.post('/api/payment/verify', headers=client.headers, json={
+        'razorpay_order_id': 'order_1',
+        'razorpay_payment_id': payment_id,
+        'razorpay_signature': 'signature'
+    })
+
+def booking():
+    return Booking.query.filter_by(razorpay_order_id='order_1').one()
+
+def test_resubmitted_verify_keeps_settled_payment(client):
+    client.razorpay.payment.state['pay_1'] = {'id': 'pay_1', 'status': 'captured', 'amount': 50000}
+    assert verify(client).json['payment_status'] == 'pending_capture'
+    assert payment_reconciler.reconcile_payments() == 1
+    assert booking().payment_status == 'paid'
+
+    response = verify(client)
+
+    assert response.status_code == 200
+    assert response.json['payment_status'] == 'paid'
+    assert booking().payment_status == 'paid'
+    assert PaymentCheck.query.one().status == 'done'
+
+def test_resubmitted_verify_reopens_abandoned_check(client, monkeypatch):
+    monkeypatch.setattr(Config, 'PAYMENT_CHECK_MAX_ATTEMPTS', 1)
+    client.razorpay.payment.state['pay_1'] = {'id': 'pay_1', 'status': 'authorized', 'amount': 50000}
+    verify(client)
+    payment_reconciler.reconcile_payments()
+    assert PaymentCheck.query.one().status == 'failed'
+    assert booking().payment_status == 'unpaid'
+
+    client.razorpay.payment.state['pay_1']['status'] = 'captured'
+    assert verify(client).json['payment_status'] == 'pending_capture'
+    assert payment_reconciler.reconcile_payments() == 1
+    assert booking().payment_status == 'paid'
+
+def test_abandoned_check_reopens_booking_and_shows_on_dashboard(client, monkeypatch):
+    monkeypatch.setattr(Config, 'PAYMENT_CHECK_MAX_ATTEMPTS', 1)
+    client.razorpay.payment.state['pay_1'] = {'id': 'pay_1', 'status': 'authorized', 'amount': 50000}
+    verify(client)
+    assert booking().status == 'confirmed'
+
+    payment_reconciler.reconcile_payments()
+
+    assert booking().status == 'pending'
+    assert build_dashboard()['payments']['unconfirmed'] == 1
+
+    client.razorpay.payment.state['pay_1']['status'] = 'captured'
+    verify(client)
+    payment_reconciler.reconcile_payments()
+    assert booking().status == 'confirmed'
+    assert build_dashboard()['payments']['unconfirmed'] == 0
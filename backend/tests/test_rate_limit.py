@@ -0,0 +1,31 @@
+from config import Config
+
+PHONE = '9000000001'
+
+def login(client, phone=PHONE, ip='203.0.113.1'):
+    return client.post('/api/auth/login', json={'phone': phone}, environ_base={'REMOTE_ADDR': ip})
+
+def test_phone_limit_counts_every_spelling(client):
+    spellings = [PHONE, f'+91{PHONE}', f'+91 {PHONE[:5]} {PHONE[5:]}', f'91-{PHONE}']
+    for i in range(Config.RATE_LIMIT_PER_PHONE):
+        assert login(client, spellings[i % len(spellings)]).status_code == 404
+
+    response = login(client, spellings[-1])
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_address_over_its_limit_does_not_drain_phone(client):
+    for _ in range(Config.RATE_LIMIT_PER_IP):
+        login(client, phone=f'90000{_:05d}', ip='198.51.100.7')
+    for _ in range(Config.RATE_LIMIT_PER_PHONE * 2):
+        assert login(client, ip='198.51.100.7').status_code == 429
+
+    # The owner of the phone, from their own address, still gets through
+    assert login(client).status_code == 404
+
+def test_endpoints_have_separate_buckets(client):
+    for _ in range(Config.RATE_LIMIT_PER_PHONE):
+        login(client)
+    assert login(client).status_code == 429
+    response = client.post('/api/auth/register', json={'phone': PHONE}, environ_base={'REMOTE_ADDR': '203.0.113.1'})
+    assert response.status_code != 429
@@ -0,0 +1,70 @@
+import time
+import pytest
+from flask import Flask
+from config import Config
+from database import _replica_state, db, replica_reads
+from models.user import User
+from utils import cache
+from utils.cache import LocalCache, get_or_compute, invalidate
+
+@pytest.fixture
+def replica_app(monkeypatch):
+    """Primary and replica as two separate in-memory databases"""
+    monkeypatch.setitem(_replica_state, 'checked_at', 0.0)
+    # init_app adds a 'replica' metadata to the shared db; keep it to this test
+    monkeypatch.setattr(db, 'metadatas', dict(db.metadatas))
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_BINDS'] = {'replica': 'sqlite://'}
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines['replica'])
+        # Only the primary has the row, as if the replica had not replayed it yet
+        db.session.add(User(phone='9000000001', name='Customer', role='customer'))
+        db.session.commit()
+        # A fresh cache, so that insert doesn't count as a recent invalidation
+        monkeypatch.setattr(cache, 'response_cache', LocalCache())
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def count_users():
+    return User.query.count()
+
+def test_reads_go_to_replica_inside_view(replica_app):
+    with replica_app.test_request_context():
+        assert count_users() == 1
+        assert replica_reads(count_users)() == 0
+
+def test_writes_flush_to_primary_inside_view(replica_app):
+    @replica_reads
+    def register():
+        db.session.add(User(phone='9000000002', name='Second', role='customer'))
+        db.session.commit()
+
+    with replica_app.test_request_context():
+        register()
+        assert count_users() == 2
+
+def test_cache_miss_recomputes_on_replica_when_nothing_changed(replica_app):
+    compute = replica_reads(lambda: get_or_compute('t', 'users', 30, lambda: count_users(), ('users',)))
+    with replica_app.test_request_context():
+        assert compute() == 0
+
+def test_cache_miss_after_invalidation_recomputes_on_primary(replica_app):
+    compute = replica_reads(lambda: get_or_compute('t', 'users', 30, lambda: count_users(), ('users',)))
+    with replica_app.test_request_context():
+        invalidate('users')
+        assert compute() == 1
+
+def test_invalidation_older_than_lag_window_uses_replica(replica_app, monkeypatch):
+    compute = replica_reads(lambda: get_or_compute('t', 'users', 30, lambda: count_users(), ('users',)))
+    with replica_app.test_request_context():
+        invalidate('users')
+        window = Config.REPLICA_MAX_LAG_SECONDS + Config.REPLICA_LAG_CHECK_INTERVAL
+        later = time.time() + window + 1
+        monkeypatch.setattr(cache.time, 'time', lambda: later)
+        assert compute() == 0
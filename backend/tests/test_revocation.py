@@ -0,0 +1,48 @@
+import pytest
+from database import db
+from models.revocation import Revocation
+from utils import revocation
+from utils.revocation import RevocationList, register_revocation_check
+
+@pytest.fixture
+def revocations(app, monkeypatch):
+    """A fresh revocation list, checked on every request of the test app"""
+    fresh = RevocationList(refresh_interval=3600)
+    for module in ('utils.revocation', 'routes.admin', 'routes.auth'):
+        monkeypatch.setattr(f'{module}.revocation_list', fresh)
+    register_revocation_check(app.extensions['flask-jwt-extended'])
+    return fresh
+
+def profile(client, headers):
+    return client.get('/api/auth/profile', headers=headers).status_code
+
+def test_logout_revokes_only_that_token(client, create_user, revocations):
+    _, headers = create_user()
+    _, second = create_user(phone='9000000002')
+
+    assert client.post('/api/auth/logout', headers=headers).status_code == 200
+
+    assert profile(client, headers) == 401
+    assert profile(client, second) == 200
+
+def test_deactivation_applies_to_existing_tokens(client, create_user, revocations):
+    user, headers = create_user()
+    _, admin = create_user(role='admin', phone='9000000009')
+
+    client.post(f'/api/admin/users/{user.id}/toggle-status', headers=admin, json={'is_active': False})
+    assert profile(client, headers) == 401
+
+    client.post(f'/api/admin/users/{user.id}/toggle-status', headers=admin, json={'is_active': True})
+    assert profile(client, headers) == 200
+
+def test_other_workers_changes_arrive_on_refresh(client, create_user, revocations):
+    user, headers = create_user()
+    assert profile(client, headers) == 200
+
+    # Logged by another worker; this one only sees it once its copy is stale
+    db.session.add(Revocation(user_id=user.id, action='revoke'))
+    db.session.commit()
+    assert profile(client, headers) == 200
+
+    revocations.checked_at = 0
+    assert profile(client, headers) == 401
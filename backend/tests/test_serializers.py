@@ -0,0 +1,40 @@
+import json
+from conftest import make_booking
+from database import db
+from models.booking import Booking
+from utils.serializers import BOOKING_SHAPE, dumps, get_fieldset, get_serializer, model_columns, select_shape
+
+def my_bookings(client, headers, fields):
+    return client.get(f'/api/booking/my-bookings?fields={fields}', headers=headers)
+
+def test_compiled_serializer_matches_to_dict(app, create_user):
+    customer, _ = create_user()
+    booking = make_booking(customer.id, pickup_city='Hyderabad', special_instructions='Fragile')
+    db.session.add(booking)
+    db.session.commit()
+
+    row = db.session.execute(select_shape(BOOKING_SHAPE, model_columns(Booking))).one()
+    serialized = get_serializer('booking', BOOKING_SHAPE)(row)
+
+    assert json.loads(dumps(serialized)) == booking.to_dict()
+
+def test_sparse_fieldset_returns_only_requested_fields(client, create_user):
+    customer, headers = create_user()
+    db.session.add(make_booking(customer.id, pickup_city='Hyderabad'))
+    db.session.commit()
+
+    response = my_bookings(client, headers, 'status,pickup.city')
+
+    assert response.status_code == 200
+    # created_at and driver_id are read for sorting and the driver block, then dropped
+    assert response.json['bookings'] == [{'status': 'pending', 'pickup': {'city': 'Hyderabad'}}]
+
+def test_whole_block_wins_over_its_members():
+    shape, _, _ = get_fieldset('test_booking', BOOKING_SHAPE, frozenset({'pickup', 'pickup.city'}))
+    assert shape == {'pickup': BOOKING_SHAPE['pickup']}
+
+def test_unknown_field_is_rejected(client, create_user):
+    _, headers = create_user()
+    response = my_bookings(client, headers, 'status,pickup.password')
+    assert response.status_code == 400
+    assert 'pickup.password' in response.json['error']
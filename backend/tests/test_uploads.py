@@ -0,0 +1,135 @@
+import hashlib
+import io
+import os
+import time
+from PIL import Image
+from models.stored_file import StoredFile
+from utils.file_upload import upload_key
+from utils.storage import sign_file_path, storage, verify_file_signature
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def presign(client, headers, body, filename='photo.png'):
+    return client.post('/api/uploads/presign', headers=headers, json={
+        'folder': 'goods', 'filename': filename, 'content_type': 'image/png',
+        'size': len(body), 'sha256': hashlib.sha256(body).hexdigest()
+    }).json
+
+def complete(client, headers, presigned, **overrides):
+    body = {'file_path': presigned['file_path'], 'upload_token': presigned['upload_token'], 'compress': False}
+    body.update(overrides)
+    return client.post('/api/uploads/complete', headers=headers, json=body)
+
+def refs(file_path):
+    row = StoredFile.query.filter_by(file_path=file_path).one_or_none()
+    return row.ref_count if row else 0
+
+def test_direct_upload_round_trip(client, create_user):
+    _, headers = create_user()
+    body = png_bytes()
+    presigned = presign(client, headers, body)
+    assert client.put(presigned['upload']['url'], data=body).status_code == 200
+
+    response = complete(client, headers, presigned)
+
+    assert response.status_code == 200
+    assert refs(presigned['file_path']) == 1
+    assert client.get(response.json['url']).data == body
+
+def test_complete_before_put_keeps_grant(client, create_user):
+    _, headers = create_user()
+    body = png_bytes()
+    presigned = presign(client, headers, body)
+
+    assert complete(client, headers, presigned).status_code == 400
+    client.put(presigned['upload']['url'], data=body)
+    assert complete(client, headers, presigned).status_code == 200
+
+def test_complete_requires_own_unused_grant(client, create_user):
+    _, owner = create_user()
+    _, other = create_user(phone='9000000002')
+    body = png_bytes()
+    presigned = presign(client, owner, body)
+    client.put(presigned['upload']['url'], data=body)
+
+    # Knowing the key (or even the token) is not enough for another user
+    for headers, token in ((other, None), (other, presigned['upload_token']), (owner, 'guessed')):
+        response = complete(client, headers, presigned, upload_token=token)
+        assert response.status_code == 403
+        assert 'url' not in response.json
+    assert refs(presigned['file_path']) == 0
+
+    assert complete(client, owner, presigned).status_code == 200
+    assert complete(client, owner, presigned).status_code == 403
+    assert refs(presigned['file_path']) == 1
+
+def test_known_content_needs_a_presign_per_reference(client, create_user):
+    _, owner = create_user()
+    _, other = create_user(phone='9000000002')
+    body = png_bytes()
+    first = presign(client, owner, body)
+    client.put(first['upload']['url'], data=body)
+    complete(client, owner, first)
+
+    second = presign(client, other, body)
+    assert second['exists'] is True
+    assert complete(client, other, second).status_code == 200
+    assert refs(first['file_path']) == 2
+
+def test_put_rejects_wrong_type_and_size(client, create_user, monkeypatch):
+    _, headers = create_user()
+    body = b'MZ' + b'\0' * 64  # an executable named .png
+    presigned = presign(client, headers, body)
+    assert client.put(presigned['upload']['url'], data=body).status_code == 415
+
+    monkeypatch.setattr('config.Config.MAX_FILE_SIZE', 16)
+    body = png_bytes()
+    file_path = upload_key('goods', hashlib.sha256(body).hexdigest(), '.png')
+    expires = int(time.time()) + 60
+    url = f"/uploads/{file_path}?expires={expires}&sig={sign_file_path(file_path, expires, 'PUT')}"
+    assert client.put(url, data=body).status_code == 413
+
+def test_streamed_upload_rejected_early(client, create_user, monkeypatch):
+    _, headers = create_user()
+
+    response = client.post('/api/booking/upload-image', headers=headers,
+                           data={'image': (io.BytesIO(b'GIF89a' + b'\0' * 64), 'photo.png')})
+    assert response.status_code == 415
+
+    monkeypatch.setattr('config.Config.MAX_FILE_SIZE', 32)
+    response = client.post('/api/booking/upload-image', headers=headers,
+                           data={'image': (io.BytesIO(png_bytes()), 'photo.png')})
+    assert response.status_code == 413
+
+    # Nothing is stored or left behind in staging
+    assert StoredFile.query.count() == 0
+    assert os.listdir(storage.staging_dir()) == []
+
+def test_object_storage_upload_is_sniffed(client, create_user, object_storage):
+    _, headers = create_user()
+    body = b'<svg onload=alert(1)>' + b' ' * 64
+    presigned = presign(client, headers, body)
+    # The client PUTs straight to the bucket, past the app's streaming checks
+    path = object_storage.path(presigned['file_path'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as target:
+        target.write(body)
+
+    response = complete(client, headers, presigned)
+
+    assert response.status_code == 415
+    assert refs(presigned['file_path']) == 0
+    assert object_storage.size(presigned['file_path']) is None
+
+def test_signed_url_checks():
+    expires = int(time.time()) + 60
+    signature = sign_file_path('goods/ab/file.png', expires)
+    assert verify_file_signature('goods/ab/file.png', expires, signature)
+    assert not verify_file_signature('goods/ab/other.png', expires, signature)
+    assert not verify_file_signature('goods/ab/file.png', expires + 1, signature)
+    assert not verify_file_signature('goods/ab/file.png', expires, signature, 'PUT')
+    past = int(time.time()) - 1
+    assert not verify_file_signature('goods/ab/file.png', past, sign_file_path('goods/ab/file.png', past))
@@ -0,0 +1,96 @@
+from functools import wraps
+from flask import g, jsonify
+from flask_jwt_extended import create_access_token, get_jwt_identity
+from sqlalchemy import select
+from database import db
+from models.driver import Driver
+from models.user import User
+
+# Authorization reads the signed token identity ({id, phone, role, driver_id})
+# instead of the database. Tokens stay valid until they expire, so blocking a
+# deactivated user is the revocation check's job, not these decorators'.
+
+def create_user_token(user):
+    """
+    Create an access token carrying the claims the decorators below check
+
+    Args:
+        user: User model instance
+
+    Returns:
+        Encoded JWT access token
+    """
+    identity = {
+        'id': user.id,
+        'phone': user.phone,
+        'role': user.role
+    }
+    if user.role == 'driver':
+        # None until the driver profile exists; current_driver() falls back to a lookup
+        identity['driver_id'] = db.session.execute(
+            select(Driver.id).where(Driver.user_id == user.id)
+        ).scalar_one_or_none()
+    return create_access_token(identity=identity)
+
+def role_required(*roles):
+    """
+    Decorator to allow only the given roles (place below @jwt_required())
+
+    Args:
+        roles: Allowed role names (e.g., 'admin')
+    """
+    message = f"{' or '.join(role.capitalize() for role in roles)} access required"
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if get_jwt_identity().get('role') not in roles:
+                return jsonify({'error': message}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+admin_required = role_required('admin')
+
+def current_user():
+    """
+    The requesting user, loaded at most once per request
+
+    Returns:
+        User, or None if the account no longer exists
+    """
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, get_jwt_identity()['id'])
+    return g.current_user
+
+def current_driver():
+    """
+    The requesting user's driver profile, loaded at most once per request
+
+    Returns:
+        Driver, or None if the user has no driver profile
+    """
+    if 'current_driver' not in g:
+        identity = get_jwt_identity()
+        if identity.get('driver_id'):
+            driver = db.session.get(Driver, identity['driver_id'])
+        elif identity.get('role') == 'driver':
+            # Token issued before the driver profile was created
+            driver = Driver.query.filter_by(user_id=identity['id']).first()
+        else:
+            driver = None
+        g.current_driver = driver
+    return g.current_driver
+
+def current_driver_id():
+    """
+    Driver ID of the requesting user, from the token when it carries one
+
+    Returns:
+        Driver ID, or None if the user has no driver profile
+    """
+    driver_id = get_jwt_identity().get('driver_id')
+    if driver_id:
+        return driver_id
+    driver = current_driver()
+    return driver.id if driver else None
@@ -0,0 +1,237 @@
+import json
+import threading
+import time
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from config import Config
+from database import primary_reads
+from utils import metrics
+
+# Optional shared cache server (Redis). Falls back to a per-process cache.
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Columns whose changes make cached dashboard/report payloads wrong.
+# Maps table name -> columns watched; the table name is used as the cache tag.
+# Inserts and deletes of these tables always invalidate (new bookings, new users).
+INVALIDATION_RULES = {
+    'bookings': ('status', 'payment_status', 'final_fare', 'admin_commission', 'driver_earning'),
+    'drivers': ('is_verified', 'status', 'total_trips', 'total_earnings', 'rating_sum', 'rating_count'),
+    'users': ('role', 'name', 'phone'),  # User counts; top drivers' name and phone
+}
+
+class LocalCache:
+    """Per-process TTL cache with tag-based invalidation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (stored_at, expires_at, value)
+        self._tags = {}  # tag -> set of keys
+        self._invalidated_at = {}  # tag -> time of its last invalidation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            return stored_at, value
+
+    def set(self, key, value, ttl, tags=()):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (now, now + ttl, value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+    def invalidate(self, tag):
+        with self._lock:
+            self._invalidated_at[tag] = time.time()
+            keys = self._tags.pop(tag, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            return len(keys)
+
+    def last_invalidated(self, tags):
+        """Time any of the tags was last invalidated (0 if never)"""
+        return max((self._invalidated_at.get(tag, 0) for tag in tags), default=0)
+
+# How long invalidation times are kept; must exceed the replica lag window below
+INVALIDATION_MEMORY_SECONDS = 300
+
+# Add a key to a tag set, extending (never shortening) the set's TTL, so the
+# set outlives every entry it lists whatever order they were written in
+TAG_SCRIPT = """
+redis.call('SADD', KEYS[1], ARGV[1])
+if redis.call('TTL', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+"""
+
+class RedisCache:
+    """Shared TTL cache on a Redis server, so invalidation reaches every worker"""
+
+    def __init__(self, url, prefix='srta:cache:'):
+        self._client = redis.Redis.from_url(url)
+        self._add_to_tag = self._client.register_script(TAG_SCRIPT)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry['stored_at'], entry['value']
+
+    def set(self, key, value, ttl, tags=()):
+        full_key = self._prefix + key
+        pipe = self._client.pipeline()
+        pipe.setex(full_key, ttl, json.dumps({'stored_at': time.time(), 'value': value}))
+        for tag in tags:
+            self._add_to_tag(keys=[self._prefix + 'tag:' + tag], args=[full_key, ttl], client=pipe)
+        pipe.execute()
+
+    def invalidate(self, tag):
+        tag_key = self._prefix + 'tag:' + tag
+        keys = self._client.smembers(tag_key)
+        pipe = self._client.pipeline()
+        if keys:
+            pipe.delete(*keys)
+        pipe.delete(tag_key)
+        pipe.setex(self._prefix + 'invalidated:' + tag, INVALIDATION_MEMORY_SECONDS, time.time())
+        pipe.execute()
+        return len(keys)
+
+    def last_invalidated(self, tags):
+        """Time any of the tags was last invalidated (0 if not within INVALIDATION_MEMORY_SECONDS)"""
+        if not tags:
+            return 0
+        stamps = self._client.mget([self._prefix + 'invalidated:' + tag for tag in tags])
+        return max((float(stamp) for stamp in stamps if stamp is not None), default=0)
+
+def _create_backend():
+    if Config.CACHE_REDIS_URL:
+        if redis is None:
+            print("redis package not installed. Using per-process cache.")
+        else:
+            return RedisCache(Config.CACHE_REDIS_URL)
+    return LocalCache()
+
+response_cache = _create_backend()
+
+def _replica_may_be_stale(tags):
+    """
+    True if a tag was invalidated within the replica lag the app tolerates
+    (plus one lag check interval, as the lag reading may be that old)
+    """
+    try:
+        last = response_cache.last_invalidated(tags)
+    except Exception as e:
+        print(f"Cache read failed: {e}")
+        return True
+    window = Config.REPLICA_MAX_LAG_SECONDS + Config.REPLICA_LAG_CHECK_INTERVAL
+    return time.time() - last < window
+
+def get_or_compute(name, key, ttl, compute, tags=()):
+    """
+    Return a cached payload or compute and store it
+
+    Args:
+        name: Metric name for this cache (e.g., 'dashboard')
+        key: Cache key (must include every parameter the payload depends on)
+        ttl: Time to live in seconds
+        compute: Zero-argument function building the JSON-serializable payload
+        tags: Tags that invalidate this entry (see INVALIDATION_RULES)
+
+    Returns:
+        Payload dict
+    """
+    try:
+        cached = response_cache.get(key)
+    except Exception as e:
+        print(f"Cache read failed: {e}")
+        cached = None
+
+    if cached is not None:
+        stored_at, value = cached
+        metrics.incr(f'cache.{name}.hit')
+        metrics.observe(f'cache.{name}.age_seconds', round(time.time() - stored_at, 3))
+        return value
+
+    metrics.incr(f'cache.{name}.miss')
+    if _replica_may_be_stale(tags):
+        # The replica may not have replayed the commit that invalidated this entry
+        # yet, and a stale payload would then be served for the whole TTL
+        metrics.incr(f'cache.{name}.primary_recompute')
+        with primary_reads():
+            value = compute()
+    else:
+        value = compute()
+
+    try:
+        response_cache.set(key, value, ttl, tags)
+    except Exception as e:
+        print(f"Cache write failed: {e}")
+
+    return value
+
+def invalidate(*tags):
+    """Drop all cached entries carrying any of the given tags"""
+    for tag in tags:
+        try:
+            dropped = response_cache.invalidate(tag)
+            metrics.incr(f'cache.invalidations.{tag}')
+            metrics.incr('cache.evicted', dropped)
+        except Exception as e:
+            print(f"Cache invalidation failed: {e}")
+
+def _collect_tags(session, flush_context, instances):
+    """Record which cache tags the pending flush touches"""
+    tags = session.info.setdefault('cache_tags', set())
+
+    for obj in session.new:
+        table = getattr(obj, '__tablename__', None)
+        if table in INVALIDATION_RULES:
+            tags.add(table)
+
+    for obj in session.dirty:
+        table = getattr(obj, '__tablename__', None)
+        columns = INVALIDATION_RULES.get(table)
+        if not columns or table in tags:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[column].history.has_changes() for column in columns):
+            tags.add(table)
+
+    for obj in session.deleted:
+        table = getattr(obj, '__tablename__', None)
+        if table in INVALIDATION_RULES:
+            tags.add(table)
+
+def _collect_statement_tags(orm_execute_state):
+    """Record tags for bulk INSERT/UPDATE/DELETE statements, which bypass flush"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is not None and table.name in INVALIDATION_RULES:
+        orm_execute_state.session.info.setdefault('cache_tags', set()).add(table.name)
+
+def _invalidate_committed(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        invalidate(*tags)
+
+def _discard_tags(session):
+    session.info.pop('cache_tags', None)
+
+def register_invalidation_listeners():
+    """Invalidate cached payloads after commits that change watched columns"""
+    event.listen(Session, 'before_flush', _collect_tags)
+    event.listen(Session, 'do_orm_execute', _collect_statement_tags)
+    event.listen(Session, 'after_commit', _invalidate_committed)
+    event.listen(Session, 'after_rollback', _discard_tags)
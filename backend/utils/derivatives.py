@@ -0,0 +1,217 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from PIL import Image
+from config import Config
+from utils import metrics
+from utils.images import open_image
+from utils.storage import UPLOAD_KEY, storage
+
+# Optional cross-process locking (POSIX). Elsewhere only requests in the same
+# process wait for each other.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Named sizes clients may request (bounding box, aspect ratio preserved)
+DERIVATIVE_SIZES = {
+    'thumb': (300, 300),
+    'medium': (1024, 1024),
+}
+
+# format -> (PIL format, file extension, save options)
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', '.webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', '.jpg', {'quality': 80, 'optimize': True}),
+    'png': ('PNG', '.png', {'optimize': True}),
+}
+
+# Source extensions derivatives can be made from, and the format kept by default
+SOURCE_FORMATS = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png'}
+
+TOUCH_INTERVAL = 3600  # seconds; refresh a hit's LRU position at most this often
+EVICT_TO = 0.9  # Evict down to this fraction of the size limit
+
+def render_derivative(source_path, target_path, size, fmt):
+    """
+    Resize an image into a new file, written atomically
+
+    Args:
+        source_path: Original image
+        target_path: Where to write the derivative
+        size: Bounding box (width, height)
+        fmt: Key of DERIVATIVE_FORMATS
+
+    Returns:
+        Size of the derivative in bytes
+    """
+    pil_format, _, options = DERIVATIVE_FORMATS[fmt]
+    temp_path = f"{target_path}.{os.getpid()}.tmp"
+
+    with open_image(source_path, size) as image:
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        if pil_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA')
+        image.save(temp_path, pil_format, **options)
+
+    os.replace(temp_path, target_path)
+    return os.path.getsize(target_path)
+
+class DerivativeCache:
+    """
+    Resized copies of uploads, generated on first request and kept on disk
+    with least-recently-used eviction by total bytes
+
+    Recency is the file's mtime, so every worker shares one LRU order. Each
+    worker tracks the total size approximately and rescans the folder when
+    it goes over the limit.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}  # target path -> [lock, users]
+        self._total_bytes = None
+
+    def path_for(self, file_path, version, size_name, fmt):
+        """Cache location; changes whenever the stored original is replaced"""
+        key = hashlib.sha1(f"{file_path}|{version}|{size_name}|{fmt}".encode('utf-8')).hexdigest()
+        return os.path.join(self.root, key[:2], key + DERIVATIVE_FORMATS[fmt][1])
+
+    def get(self, file_path, size_name, fmt):
+        """
+        Path of a derivative, rendering it if it is not cached yet
+
+        Args:
+            file_path: Storage key of the original
+            size_name: Key of DERIVATIVE_SIZES
+            fmt: Key of DERIVATIVE_FORMATS
+
+        Returns:
+            Full path of the derivative file, or None if the original does not exist
+        """
+        match = UPLOAD_KEY.match(file_path)
+        # Content-addressed originals never change, so the hash in the key is their
+        # version and a hit needs no storage lookup (an S3 HEAD in object storage)
+        version = match.group(2) if match else storage.version(file_path)
+        if version is None:
+            return None
+
+        target = self.path_for(file_path, version, size_name, fmt)
+        if self._hit(target):
+            return target
+
+        # One render per derivative: concurrent requests wait for it, then read the file
+        with self._key_lock(target):
+            if self._hit(target):
+                return target
+            if match and storage.size(file_path) is None:
+                return None
+            metrics.incr('derivatives.miss')
+            started = time.time()
+            with storage.local_copy(file_path) as source_path:
+                written = render_derivative(source_path, target, DERIVATIVE_SIZES[size_name], fmt)
+            metrics.observe('derivatives.render_ms', round((time.time() - started) * 1000, 1))
+
+        self._added(written, keep=target)
+        return target
+
+    def _hit(self, target):
+        try:
+            stat = os.stat(target)
+        except FileNotFoundError:
+            return False
+        if time.time() - stat.st_mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(target)
+            except FileNotFoundError:
+                return False  # Evicted meanwhile
+        metrics.incr('derivatives.hit')
+        return True
+
+    @contextmanager
+    def _key_lock(self, target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with self._lock:
+            entry = self._key_locks.setdefault(target, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if fcntl is None:
+                    yield
+                else:
+                    with open(target + '.lock', 'a') as lock_file:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+                        try:
+                            yield
+                        finally:
+                            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[target]
+
+    def _cached_files(self):
+        for folder, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(('.lock', '.tmp')):
+                    continue
+                path = os.path.join(folder, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _added(self, size, keep=None):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(entry[1] for entry in self._cached_files())
+            else:
+                self._total_bytes += size
+            over_limit = self._total_bytes > self.max_bytes
+        if over_limit:
+            self.evict(keep=keep)
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used derivatives until the cache is under its limit
+
+        Args:
+            keep: Path not to remove (the derivative about to be served)
+
+        Returns:
+            Number of files removed
+        """
+        files = sorted(self._cached_files())
+        total = sum(size for _, size, _ in files)
+        target_bytes = self.max_bytes * EVICT_TO
+        removed = 0
+
+        for _, size, path in files:
+            if total <= target_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                if os.path.exists(path + '.lock'):
+                    os.remove(path + '.lock')
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._total_bytes = total
+        metrics.incr('derivatives.evicted', removed)
+        return removed
+
+derivative_cache = DerivativeCache(Config.DERIVATIVE_CACHE_FOLDER, Config.DERIVATIVE_CACHE_MAX_BYTES)
@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson'
+}
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def stream_rows(rows, columns, fmt='csv', chunk_rows=500):
+    """
+    Encode rows as CSV or NDJSON, yielding text chunks
+
+    Args:
+        rows: Iterable of row tuples (e.g., a streamed SQLAlchemy result)
+        columns: Column names, in row order
+        fmt: 'csv' or 'ndjson'
+        chunk_rows: Rows encoded per yielded chunk
+
+    Yields:
+        Encoded text chunks; memory stays bounded by chunk_rows
+    """
+    buffer = io.StringIO()
+
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        write = lambda row: writer.writerow(
+            [value.isoformat() if isinstance(value, (datetime, date)) else value for value in row]
+        )
+    else:
+        write = lambda row: buffer.write(
+            json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) + '\n'
+        )
+
+    pending = 0
+    for row in rows:
+        write(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -1,7 +1,24 @@
+import hashlib
 import os
+import secrets
+import tempfile
+import time
+from urllib.parse import quote
+from sqlalchemy import delete, insert, select, update
+from flask import Request
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import Forbidden, RequestEntityTooLarge, UnsupportedMediaType
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import datetime, timedelta
 from config import Config
+from database import db
+from models.stored_file import StoredFile
+from models.upload_grant import UploadGrant
+from utils import metrics
+from utils.derivatives import SOURCE_FORMATS
+from utils.image_jobs import OPTIMIZABLE_EXTENSIONS, optimized_key, schedule_optimization
+from utils.images import open_image
+from utils.storage import UPLOAD_KEY, sign_file_path, storage
 from PIL import Image
 import io
 
@@ -10,102 +27,391 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+UPLOAD_CHUNK_SIZE = 64 * 1024  # bytes
+
+def upload_key(folder, sha256, ext):
+    """Storage key for an upload with the given content hash"""
+    return f"{folder}/{sha256[:2]}/{sha256}{ext}"
+
+# Leading bytes of each allowed file type, checked before the rest of an upload is read
+FILE_SIGNATURES = {
+    'jpg': (b'\xff\xd8\xff',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'pdf': (b'%PDF-',),
+}
+SNIFF_BYTES = max(len(signature) for signatures in FILE_SIGNATURES.values() for signature in signatures)
+
+class StagedUpload:
+    """
+    Upload file that is written straight to the staging folder
+
+    Each chunk is size-checked, hashed and written as it arrives, and the
+    file type is checked against the extension on the first bytes, so a bad
+    upload stops being read as soon as it is known to be bad and memory use
+    does not depend on the file size. Reads, seeks etc. go to the staging
+    file, so it can be used as a FileStorage stream.
+
+    Raises:
+        UnsupportedMediaType: Extension not allowed, or contents don't match it (415)
+        RequestEntityTooLarge: More than max_size bytes (413)
+    """
+
+    def __init__(self, filename, max_size=None, content_length=None):
+        self.max_size = max_size or Config.MAX_FILE_SIZE
+        if not allowed_file(filename or ''):
+            metrics.incr('uploads.rejected_type')
+            raise UnsupportedMediaType('File type not allowed')
+        if content_length is not None and content_length > self.max_size:
+            self._too_large()
+        
+        self.signatures = FILE_SIGNATURES[filename.rsplit('.', 1)[1].lower()]
+        self.size = 0
+        self.finished = False
+        self._head = b''
+        self._digest = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(dir=storage.staging_dir(), suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def _too_large(self):
+        metrics.incr('uploads.rejected_size')
+        raise RequestEntityTooLarge(f'File must be at most {self.max_size // (1024 * 1024)}MB')
+
+    def _check_type(self):
+        if not self._head.startswith(self.signatures):
+            metrics.incr('uploads.rejected_type')
+            raise UnsupportedMediaType('File contents do not match the file type')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            self._too_large()
+        if len(self._head) < SNIFF_BYTES:
+            self._head += bytes(data[:SNIFF_BYTES - len(self._head)])
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_type()
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def finish(self):
+        """
+        Complete the upload; the caller takes over the staging file
+
+        Returns:
+            (staging file path, sha256 hex digest, size in bytes)
+        """
+        if len(self._head) < SNIFF_BYTES:
+            self._check_type()  # Shorter than the sniff window
+        self._file.close()
+        self.finished = True
+        return self.path, self._digest.hexdigest(), self.size
+
+    def close(self):
+        """Close the file, discarding it unless finish() handed it on"""
+        self._file.close()
+        if not self.finished and os.path.exists(self.path):
+            os.remove(self.path)
+            self.finished = True
+
+class UploadRequest(Request):
+    """
+    Request class that parses multipart file parts into StagedUpload files
+    instead of Werkzeug's in-memory/temporary spool (set as app.request_class)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.staged_uploads = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not filename:
+            # Empty file input; the view reports it
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        staged = StagedUpload(filename, content_length=content_length)
+        self.staged_uploads.append(staged)
+        return staged
+
+    def close(self):
+        super().close()
+        # Includes parts from a body that was rejected halfway through parsing
+        for staged in self.staged_uploads:
+            staged.close()
+
+def stream_to_staging(stream, filename, max_size=None):
+    """
+    Copy an upload stream into a staging file, hashing and checking it on the way
+
+    Args:
+        stream: Readable binary stream (e.g., request.stream)
+        filename: Name or key whose extension the contents must match
+        max_size: Maximum size in bytes (default: Config.MAX_FILE_SIZE)
+
+    Returns:
+        (staging file path, sha256 hex digest, size in bytes)
+    """
+    staged = StagedUpload(filename, max_size)
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            staged.write(chunk)
+        return staged.finish()
+    finally:
+        staged.close()
+
+def _add_reference(file_path, sha256, size):
+    """
+    Count one more reference to a stored file
+
+    Returns:
+        True if this is the first reference (the blob still has to be written)
+    """
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(insert(StoredFile).values(
+                file_path=file_path, sha256=sha256, size=size, ref_count=1, created_at=datetime.utcnow()
+            ))
+        return True
+    except IntegrityError:
+        pass  # Already stored
+
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(StoredFile).where(StoredFile.file_path == file_path).values(ref_count=StoredFile.ref_count + 1)
+        )
+    return False
+
 def save_file(file, folder='general', compress=True, max_size=(1920, 1080)):
     """
-    Save uploaded file with optional compression
+    Save uploaded file under its content hash, optionally queueing images
+    for background compression
+    
+    Identical uploads (e.g., a driver retrying registration with the same
+    license photo) share one file; each call adds a reference that
+    delete_file() releases.
     
     Args:
         file: FileStorage object from request
         folder: Subfolder name (e.g., 'licenses', 'vehicles', 'goods')
-        compress: Whether to compress images
+        compress: Whether to compress images (see utils/image_jobs.py)
         max_size: Maximum dimensions for compressed images (width, height)
     
     Returns:
-        Relative file path or None if failed
+        Relative file path (folder/ab/<sha256>.ext) or None if failed
     """
     if not file or not allowed_file(file.filename):
         return None
     
     try:
-        # Secure the filename
-        filename = secure_filename(file.filename)
+        ext = os.path.splitext(secure_filename(file.filename))[1].lower()
         
-        # Add timestamp to make unique
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        name, ext = os.path.splitext(filename)
-        unique_filename = f"{name}_{timestamp}{ext}"
-        
-        # Create upload directory if not exists
-        upload_path = os.path.join(Config.UPLOAD_FOLDER, folder)
-        os.makedirs(upload_path, exist_ok=True)
-        
-        # Full file path
-        file_path = os.path.join(upload_path, unique_filename)
+        if isinstance(file.stream, StagedUpload):
+            # Already written to staging and hashed while the request was parsed
+            temp_path, sha256, size = file.stream.finish()
+        else:
+            temp_path, sha256, size = stream_to_staging(file.stream, file.filename)
+        relative_path = upload_key(folder, sha256, ext)
         
-        # Check if it's an image and compression is enabled
-        if compress and ext.lower() in ['.jpg', '.jpeg', '.png']:
-            # Open and compress image
-            image = Image.open(file)
-            
-            # Convert RGBA to RGB if necessary
-            if image.mode == 'RGBA':
-                image = image.convert('RGB')
-            
-            # Resize if larger than max_size
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        if _add_reference(relative_path, sha256, size) or storage.size(relative_path) is None:
+            storage.save(temp_path, relative_path)
             
-            # Save compressed image
-            if ext.lower() == '.png':
-                image.save(file_path, 'PNG', optimize=True)
-            else:
-                image.save(file_path, 'JPEG', quality=85, optimize=True)
+            # Resizing happens off the request; a duplicate reuses the earlier result
+            if compress and ext in OPTIMIZABLE_EXTENSIONS:
+                schedule_optimization(relative_path, max_size)
         else:
-            # Save file as-is
-            file.save(file_path)
+            os.remove(temp_path)
+            metrics.incr('uploads.deduplicated')
+            metrics.incr('uploads.deduplicated_bytes', size)
         
         # Return relative path
-        return os.path.join(folder, unique_filename)
+        return relative_path
     
     except Exception as e:
         print(f"Error saving file: {e}")
         return None
 
+def grant_direct_upload(user_id, file_path):
+    """
+    Let one user record one direct upload of file_path (see register_direct_upload)
+    
+    Args:
+        user_id: User the upload is presigned for
+        file_path: Content-addressed key the upload is presigned for
+    
+    Returns:
+        One-time token for /api/uploads/complete (only its hash is stored)
+    """
+    token = secrets.token_urlsafe(32)
+    db.session.add(UploadGrant(
+        token_hash=hashlib.sha256(token.encode('utf-8')).hexdigest(), user_id=user_id, file_path=file_path,
+        expires_at=datetime.utcnow() + timedelta(seconds=Config.UPLOAD_GRANT_EXPIRES)
+    ))
+    db.session.commit()
+    return token
+
+def _claim_upload_grant(user_id, token, file_path):
+    """Consume the caller's grant for file_path; raises Forbidden if there is none"""
+    token_hash = hashlib.sha256((token or '').encode('utf-8')).hexdigest()
+    with db.engine.begin() as connection:
+        grant = connection.execute(
+            select(UploadGrant.__table__).where(
+                UploadGrant.token_hash == token_hash, UploadGrant.user_id == user_id,
+                UploadGrant.file_path == file_path, UploadGrant.expires_at > datetime.utcnow()
+            )
+        ).first()
+        # Conditional delete, so two concurrent completes can't both use it
+        if grant is None or not connection.execute(
+            delete(UploadGrant.__table__).where(UploadGrant.id == grant.id)
+        ).rowcount:
+            metrics.incr('uploads.rejected_grant')
+            raise Forbidden('No upload was presigned for this file')
+    return grant
+
+def _restore_upload_grant(grant):
+    with db.engine.begin() as connection:
+        connection.execute(insert(UploadGrant.__table__).values(**grant._mapping))
+
+def register_direct_upload(file_path, user_id, token, compress=True, max_size=(1920, 1080)):
+    """
+    Record a file the client uploaded straight to storage (see presign_upload in
+    utils/storage.py)
+    
+    Only the user the upload was presigned for can record it, once per
+    presign, so a known key can't be turned into a signed URL or an extra
+    reference. The first bytes are checked against the file type, as
+    StagedUpload does for uploads through the app; object storage is asked
+    for just that range.
+    
+    Args:
+        file_path: Content-addressed key the upload was presigned for
+        user_id: Current user
+        token: Token from grant_direct_upload()
+        compress: Whether to compress images (see utils/image_jobs.py)
+        max_size: Maximum dimensions for compressed images (width, height)
+    
+    Returns:
+        True if recorded, False if the key is invalid or nothing was uploaded yet
+        (the grant stays usable, so the client can retry)
+    
+    Raises:
+        Forbidden: The user has no unused grant for this key (403)
+        UnsupportedMediaType: Contents don't match the file type (415)
+    """
+    match = UPLOAD_KEY.match(file_path or '')
+    if not match:
+        return False
+    
+    grant = _claim_upload_grant(user_id, token, file_path)
+    size = storage.size(file_path)
+    if size is None:
+        _restore_upload_grant(grant)
+        return False
+    
+    if not storage.read_head(file_path, SNIFF_BYTES).startswith(FILE_SIGNATURES[match.group(3)[1:]]):
+        metrics.incr('uploads.rejected_type')
+        tracked = db.session.execute(
+            select(StoredFile.id).where(StoredFile.file_path == file_path)
+        ).first()
+        if tracked is None:
+            storage.delete(file_path)
+        raise UnsupportedMediaType('File contents do not match the file type')
+    
+    if _add_reference(file_path, match.group(2), size):
+        if compress and match.group(3) in OPTIMIZABLE_EXTENSIONS:
+            schedule_optimization(file_path, max_size)
+    else:
+        metrics.incr('uploads.deduplicated')
+    return True
+
 def delete_file(file_path):
     """
-    Delete a file from the filesystem
+    Release one reference to an uploaded file, removing it from storage
+    once nothing references it
     
     Args:
         file_path: Relative path to the file
     
     Returns:
-        True if deleted, False otherwise
+        True if the file was removed, False otherwise
     """
     try:
-        full_path = os.path.join(Config.UPLOAD_FOLDER, file_path)
-        if os.path.exists(full_path):
-            os.remove(full_path)
-            return True
-        return False
+        with db.engine.begin() as connection:
+            tracked = connection.execute(
+                update(StoredFile).where(StoredFile.file_path == file_path)
+                .values(ref_count=StoredFile.ref_count - 1)
+            ).rowcount
+            
+            if tracked:
+                unreferenced = connection.execute(
+                    delete(StoredFile).where(StoredFile.file_path == file_path, StoredFile.ref_count <= 0)
+                ).rowcount
+                if not unreferenced:
+                    return False
+            
+            # Removed while the row is still locked, so a concurrent save of the
+            # same content waits and then writes the blob again
+            storage.delete(optimized_key(file_path))
+            return storage.delete(file_path)
     except Exception as e:
         print(f"Error deleting file: {e}")
         return False
 
-def get_file_url(file_path):
+def get_file_url(file_path, expires_in=None, size=None, fmt=None):
     """
-    Get full URL for a file
-    
+    Get a signed, short-lived URL for a file
+
+    Callers must have checked the user may see the file; the URL itself
+    is the authorization for its lifetime (including Range requests).
+    Expiry is rounded up to a whole lifetime window, so repeated calls
+    return the same URL for a while and browsers can reuse their cached copy.
+
     Args:
         file_path: Relative path to file
-    
+        expires_in: Lifetime in seconds (default: Config.UPLOAD_URL_EXPIRES)
+        size: Optional derivative size for images ('thumb', 'medium')
+        fmt: Optional derivative format for images ('webp', 'jpeg', 'png')
+
     Returns:
-        Full URL to access the file
+        URL to access the file
     """
     if not file_path:
         return None
+
+    lifetime = expires_in or Config.UPLOAD_URL_EXPIRES
+    expires = (int(time.time()) // lifetime + 2) * lifetime
+    optimizable = os.path.splitext(file_path)[1].lower() in OPTIMIZABLE_EXTENSIONS
+    if not size and not fmt and not optimizable:
+        # Local files are served by the app; object storage hands out its own presigned URL
+        return storage.download_url(file_path, expires)
     
-    # In production, this should return the full URL
-    # For now, return relative path
-    return f"/uploads/{file_path}"
+    # Derivatives are always rendered and cached by the app, and images go
+    # through it so it can pick their optimized copy (a redirect on object storage)
+    url = f"/uploads/{quote(file_path)}?expires={expires}&sig={sign_file_path(file_path, expires)}"
+    if size:
+        url += f"&size={size}"
+    if fmt:
+        url += f"&format={fmt}"
+    return url
+
+def get_image_urls(file_path):
+    """
+    Signed URLs for an upload and, for images, its thumb/medium WebP derivatives
+
+    Returns:
+        dict with 'url' (and 'thumb', 'medium' for images), or None
+    """
+    if not file_path:
+        return None
+
+    urls = {'url': get_file_url(file_path)}
+    if os.path.splitext(file_path)[1].lower() in SOURCE_FORMATS:
+        urls['thumb'] = get_file_url(file_path, size='thumb', fmt='webp')
+        urls['medium'] = get_file_url(file_path, size='medium', fmt='webp')
+    return urls
 
 def validate_file_size(file, max_size_mb=16):
     """
@@ -118,6 +424,10 @@ def validate_file_size(file, max_size_mb=16):
     Returns:
         True if valid, False otherwise
     """
+    if isinstance(file.stream, StagedUpload):
+        # Counted as the upload arrived (and already capped at Config.MAX_FILE_SIZE)
+        return file.stream.size <= max_size_mb * 1024 * 1024
+    
     try:
         # Seek to end to get file size
         file.seek(0, os.SEEK_END)
@@ -143,7 +453,7 @@ def process_image(file, output_format='JPEG', quality=85):
         BytesIO object with processed image
     """
     try:
-        image = Image.open(file)
+        image = open_image(file)
         
         # Convert to RGB if necessary
         if image.mode in ('RGBA', 'LA', 'P'):
@@ -187,13 +497,12 @@ def create_thumbnail(file_path, size=(300, 300)):
         Path to thumbnail or None
     """
     try:
-        full_path = os.path.join(Config.UPLOAD_FOLDER, file_path)
-        
-        if not os.path.exists(full_path):
+        if storage.size(file_path) is None:
             return None
         
-        # Open image
-        image = Image.open(full_path)
+        # Open image (decoded at reduced scale where possible)
+        with storage.local_copy(file_path) as source_path:
+            image = open_image(source_path, size)
         
         # Create thumbnail
         image.thumbnail(size, Image.Resampling.LANCZOS)
@@ -201,10 +510,11 @@ def create_thumbnail(file_path, size=(300, 300)):
         # Create thumbnail path
         name, ext = os.path.splitext(file_path)
         thumb_path = f"{name}_thumb{ext}"
-        thumb_full_path = os.path.join(Config.UPLOAD_FOLDER, thumb_path)
+        temp_path = os.path.join(storage.staging_dir(), os.path.basename(thumb_path))
         
         # Save thumbnail
-        image.save(thumb_full_path, optimize=True, quality=85)
+        image.save(temp_path, optimize=True, quality=85)
+        storage.save(temp_path, thumb_path)
         
         return thumb_path
     
@@ -0,0 +1,245 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import jwt
+import requests
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from config import Config
+from utils import metrics
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+TOKEN_ISSUER = 'https://securetoken.google.com/'
+
+DEFAULT_MAX_AGE = 3600  # seconds, if the certificate response has no max-age
+REFRESH_AT = 0.8  # Start a background refresh this far into the keys' lifetime
+RETRY_SECONDS = 60  # Wait after a failed background refresh
+UNKNOWN_KID_REFRESH_SECONDS = 60  # At most one inline refresh per this for an unrecognized key ID
+
+def fetch_google_keys():
+    """
+    Download Google's ID token signing certificates
+
+    Returns:
+        ({key ID: public key}, lifetime in seconds from Cache-Control)
+    """
+    response = requests.get(GOOGLE_CERTS_URL, timeout=10)
+    response.raise_for_status()
+    max_age = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    keys = {
+        kid: x509.load_pem_x509_certificate(pem.encode('utf-8')).public_key()
+        for kid, pem in response.json().items()
+    }
+    return keys, int(max_age.group(1)) if max_age else DEFAULT_MAX_AGE
+
+class KeyCache:
+    """
+    Token signing keys, parsed once and kept for their Cache-Control lifetime
+
+    Once REFRESH_AT of the lifetime has passed, a background thread fetches
+    the next set while requests keep using the current one. Requests only
+    wait for a fetch on the first load, after the keys expired without a
+    successful refresh, or for a key ID seen before the keys were rotated.
+    """
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self.keys = {}
+        self.expires_at = 0
+        self.refresh_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._unknown_kid_at = 0
+
+    def _refresh(self):
+        keys, max_age = self._fetch()
+        now = time.time()
+        self.keys = keys
+        self.expires_at = now + max_age
+        self.refresh_at = now + max_age * REFRESH_AT
+        metrics.incr('firebase.keys.fetched')
+
+    def _refresh_inline(self, force=False):
+        with self._lock:
+            if not force and time.time() < self.expires_at:
+                return  # Another request just refreshed
+            try:
+                self._refresh()
+            except Exception as e:
+                if not self.keys:
+                    raise
+                # Google keeps signing keys valid well past max-age; keep the old ones
+                print(f"Error fetching Firebase signing keys: {e}")
+                self.refresh_at = time.time() + RETRY_SECONDS
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"Error refreshing Firebase signing keys: {e}")
+                self.refresh_at = time.time() + RETRY_SECONDS
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get(self, kid):
+        """Public key for a key ID, or None if the signer doesn't have it"""
+        now = time.time()
+        if now >= self.expires_at:
+            self._refresh_inline()
+        elif now >= self.refresh_at:
+            self._refresh_in_background()
+
+        key = self.keys.get(kid)
+        if key is None and now - self._unknown_kid_at > UNKNOWN_KID_REFRESH_SECONDS:
+            # Keys rotated since the last fetch
+            self._unknown_kid_at = now
+            self._refresh_inline(force=True)
+            key = self.keys.get(kid)
+        return key
+
+class LocalSigner:
+    """
+    Stand-in for Firebase Auth: signs phone-login ID tokens with a local RSA
+    key, so login bursts can be load-tested with no network access (see
+    Config.FIREBASE_LOCAL_SIGNER_KEY and the mint-id-tokens command)
+    """
+
+    kid = 'local-signer'
+
+    def __init__(self, key_path):
+        if os.path.exists(key_path):
+            with open(key_path, 'rb') as f:
+                self.private_key = serialization.load_pem_private_key(f.read(), password=None)
+        else:
+            self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.private_key.private_bytes(
+                    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+                ))
+
+    def fetch_keys(self):
+        return {self.kid: self.private_key.public_key()}, DEFAULT_MAX_AGE
+
+    def sign(self, project_id, phone, uid=None, lifetime=3600):
+        """
+        Create an ID token shaped like Firebase's for a phone sign-in
+
+        Returns:
+            Encoded RS256 JWT
+        """
+        now = int(time.time())
+        claims = {
+            'iss': TOKEN_ISSUER + project_id,
+            'aud': project_id,
+            'auth_time': now,
+            'iat': now,
+            'exp': now + lifetime,
+            'sub': uid or uuid.uuid4().hex[:28],
+            'phone_number': phone,
+            'firebase': {'identities': {'phone': [phone]}, 'sign_in_provider': 'phone'},
+        }
+        return jwt.encode(claims, self.private_key, algorithm='RS256', headers={'kid': self.kid})
+
+class TokenVerifier:
+    """
+    Verifies Firebase ID tokens against cached signing keys and remembers
+    each verified token until it expires, so a retried login costs a hash
+    lookup instead of an RSA verification
+    """
+
+    def __init__(self, keys, project_id, cache_size):
+        self.keys = keys
+        self.project_id = project_id
+        self.cache_size = cache_size
+        self._verified = OrderedDict()  # sha256(token) -> claims, oldest first
+        self._lock = threading.Lock()
+
+    def verify(self, id_token):
+        """
+        Verify an ID token (signature, issuer, audience, expiry)
+
+        Args:
+            id_token: Encoded Firebase ID token
+
+        Returns:
+            Decoded claims with 'uid' set to the subject
+
+        Raises:
+            jwt.InvalidTokenError: If the token is invalid or expired
+        """
+        token_hash = hashlib.sha256(id_token.encode('utf-8')).digest()
+        with self._lock:
+            claims = self._verified.get(token_hash)
+        if claims is not None and claims['exp'] > time.time():
+            metrics.incr('firebase.tokens.cached')
+            return claims
+
+        key = self.keys.get(jwt.get_unverified_header(id_token).get('kid'))
+        if key is None:
+            raise jwt.InvalidTokenError('ID token was signed with an unknown key')
+        claims = jwt.decode(
+            id_token, key, algorithms=['RS256'], audience=self.project_id,
+            issuer=TOKEN_ISSUER + self.project_id,
+            options={'require': ['exp', 'iat', 'sub', 'aud', 'iss']}
+        )
+        if not claims['sub'] or len(claims['sub']) > 128:
+            raise jwt.InvalidTokenError('ID token has an invalid subject')
+        claims['uid'] = claims['sub']
+        metrics.incr('firebase.tokens.verified')
+
+        with self._lock:
+            self._verified[token_hash] = claims
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return claims
+
+_verifier = None
+_local_signer = None
+_verifier_lock = threading.Lock()
+
+def get_local_signer():
+    """The configured LocalSigner, or None when tokens come from Firebase"""
+    global _local_signer
+    if Config.FIREBASE_LOCAL_SIGNER_KEY and _local_signer is None:
+        _local_signer = LocalSigner(Config.FIREBASE_LOCAL_SIGNER_KEY)
+    return _local_signer
+
+def get_project_id():
+    if Config.FIREBASE_PROJECT_ID:
+        return Config.FIREBASE_PROJECT_ID
+    if get_local_signer():
+        return 'local-load-test'
+    import firebase_admin
+    return firebase_admin.get_app().project_id
+
+def verify_firebase_token(id_token):
+    """
+    Verify a Firebase ID token (drop-in for firebase_admin.auth.verify_id_token)
+
+    Returns:
+        Decoded claims ('uid', 'phone_number', ...)
+    """
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                signer = get_local_signer()
+                if signer:
+                    print("Verifying Firebase ID tokens with the local signer key (load testing only)")
+                keys = KeyCache(signer.fetch_keys if signer else fetch_google_keys)
+                _verifier = TokenVerifier(keys, get_project_id(), Config.FIREBASE_TOKEN_CACHE_SIZE)
+    return _verifier.verify(id_token)
@@ -1,23 +1,146 @@
-import random
-import string
-from datetime import datetime
+import atexit
+import socket
+import threading
+from datetime import datetime, timedelta
 import os
-from werkzeug.utils import secure_filename
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from config import Config
+from database import db
+from models.id_node import IdNode
+
+# Crockford base32: no I, L, O or U, so IDs are easy to read over the phone
+ID_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ID_NODE_BITS = 10
+ID_SEQUENCE_BITS = 12
+ID_LENGTH = 10  # 27 bits ms-of-day + node + sequence = 49 bits -> 10 base32 chars
+
+_id_lock = threading.Lock()
+_id_state = {'pid': None, 'node': 0, 'owner': None, 'renewed_at': None, 'engine': None,
+             'day': None, 'ms': -1, 'sequence': 0}
+
+def _claim_id_node(engine, owner, now):
+    """
+    Lease a node number no live process holds: the longest-expired lease,
+    else the next unused number
+
+    Returns:
+        Node number
+    """
+    expired = now - timedelta(seconds=Config.ID_NODE_LEASE_SECONDS)
+    with engine.begin() as connection:
+        candidates = connection.execute(
+            select(IdNode.node, IdNode.heartbeat_at)
+            .where(IdNode.heartbeat_at < expired).order_by(IdNode.heartbeat_at).limit(10)
+        ).all()
+        for node, heartbeat_at in candidates:
+            # Conditional, so two processes can't take over the same lease
+            if connection.execute(
+                update(IdNode).where(IdNode.node == node, IdNode.heartbeat_at == heartbeat_at)
+                .values(owner=owner, heartbeat_at=now)
+            ).rowcount:
+                return node
+
+    while True:
+        with engine.connect() as connection:
+            node = connection.execute(select(func.coalesce(func.max(IdNode.node) + 1, 0))).scalar()
+        if node >> ID_NODE_BITS:
+            raise RuntimeError('Every booking ID node is leased by a live process')
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(IdNode).values(node=node, owner=owner, heartbeat_at=now))
+            return node
+        except IntegrityError:
+            continue  # Another process took this number first
+
+def _renew_id_node(engine, node, owner, now):
+    """Extend this process's lease; False if it was lost (e.g., the process was suspended)"""
+    with engine.begin() as connection:
+        return bool(connection.execute(
+            update(IdNode).where(IdNode.node == node, IdNode.owner == owner).values(heartbeat_at=now)
+        ).rowcount)
+
+def _release_id_node():
+    """Expire this process's lease at exit, so the number is reused soon"""
+    state = _id_state
+    if state['pid'] != os.getpid() or state['engine'] is None:
+        return
+    try:
+        with state['engine'].begin() as connection:
+            connection.execute(
+                update(IdNode).where(IdNode.node == state['node'], IdNode.owner == state['owner'])
+                .values(heartbeat_at=datetime(1970, 1, 1))
+            )
+    except Exception as e:
+        print(f"Error releasing ID node: {e}")
+
+atexit.register(_release_id_node)
+
+def _ensure_id_node(state):
+    """Lease a node for this process on first use (and after a fork); keep renewing it"""
+    now = datetime.utcnow()
+    if state['pid'] != os.getpid():
+        # Forked workers must not share their parent's node or continue its sequence
+        engine = db.engine
+        owner = f"{socket.gethostname()}:{os.getpid()}"[:100]
+        state.update(pid=os.getpid(), node=_claim_id_node(engine, owner, now), owner=owner,
+                     renewed_at=now, engine=engine, day=None, ms=-1, sequence=0)
+    elif now - state['renewed_at'] > timedelta(seconds=Config.ID_NODE_LEASE_SECONDS / 2):
+        # Renewed well before expiry, so no other process can hold the node meanwhile
+        if not _renew_id_node(state['engine'], state['node'], state['owner'], now):
+            state['node'] = _claim_id_node(state['engine'], state['owner'], now)
+        state['renewed_at'] = now
+
+def _next_id(prefix):
+    """
+    Snowflake-style ID: PREFIX-YYYYMMDD-<ms of day | node | sequence in base32>
+    
+    Strictly increasing within a process, so new rows land at the right-hand
+    end of the unique index. Unique across processes because each one leases
+    its own node number from the id_nodes table (see _ensure_id_node), so no
+    database retry loop is needed.
+    """
+    with _id_lock:
+        state = _id_state
+        _ensure_id_node(state)
+        
+        now = datetime.now()
+        day = now.strftime('%Y%m%d')
+        ms = int((now - now.replace(hour=0, minute=0, second=0, microsecond=0)) / timedelta(milliseconds=1))
+        
+        if state['day'] is None or day > state['day']:
+            state['day'] = day
+            state['ms'] = -1
+        
+        if ms > state['ms']:
+            state['ms'] = ms
+            state['sequence'] = 0
+        else:
+            # Same millisecond or clock moved back: keep counting on the last timestamp
+            state['sequence'] += 1
+            if state['sequence'] >> ID_SEQUENCE_BITS:
+                state['ms'] += 1
+                state['sequence'] = 0
+        
+        value = (((state['ms'] << ID_NODE_BITS) | state['node']) << ID_SEQUENCE_BITS) | state['sequence']
+        day = state['day']
+    
+    encoded = []
+    for _ in range(ID_LENGTH):
+        value, digit = divmod(value, 32)
+        encoded.append(ID_ALPHABET[digit])
+    
+    return f"{prefix}-{day}-{''.join(reversed(encoded))}"
 
 def generate_booking_id():
-    """Generate unique booking ID"""
-    # Format: SRTA-YYYYMMDD-XXXXX
-    date_str = datetime.now().strftime('%Y%m%d')
-    random_str = ''.join(random.choices(string.digits, k=5))
-    return f"SRTA-{date_str}-{random_str}"
+    """Generate unique, time-sortable booking ID"""
+    # Format: SRTA-YYYYMMDD-XXXXXXXXXX
+    return _next_id('SRTA')
 
 def generate_invoice_number():
-    """Generate invoice number"""
-    # Format: INV-YYYYMMDD-XXXXX
-    date_str = datetime.now().strftime('%Y%m%d')
-    random_str = ''.join(random.choices(string.digits, k=5))
-    return f"INV-{date_str}-{random_str}"
+    """Generate unique, time-sortable invoice number"""
+    # Format: INV-YYYYMMDD-XXXXXXXXXX
+    return _next_id('INV')
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -33,28 +156,11 @@ def save_uploaded_file(file, folder='general'):
         folder: Subfolder within uploads (e.g., 'licenses', 'vehicles', 'goods')
     
     Returns:
-        Relative file path
+        Relative file path (storage key)
     """
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        
-        # Add timestamp to filename to make it unique
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        name, ext = os.path.splitext(filename)
-        unique_filename = f"{name}_{timestamp}{ext}"
-        
-        # Create upload folder if not exists
-        upload_path = os.path.join(Config.UPLOAD_FOLDER, folder)
-        os.makedirs(upload_path, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(upload_path, unique_filename)
-        file.save(file_path)
-        
-        # Return relative path
-        return os.path.join(folder, unique_filename)
-    
-    return None
+    # Same storage backend and deduplication as utils.file_upload, without image compression
+    from utils.file_upload import save_file
+    return save_file(file, folder=folder, compress=False)
 
 def format_phone(phone):
     """
@@ -92,19 +198,10 @@ def calculate_commission(fare, percentage=10, min_commission=100, max_commission
     
     return round(commission, 2)
 
-def get_time_slots(date=None):
-    """
-    Get available time slots for booking
-    
-    Args:
-        date: Date for which to get slots (default: today)
-    
-    Returns:
-        List of time slots
-    """
+def _build_time_slots():
+    """Booking time slots from 6 AM to 8 PM in 2-hour intervals"""
     slots = []
     
-    # Generate slots from 6 AM to 8 PM in 2-hour intervals
     start_hour = 6
     end_hour = 20
     interval = 2
@@ -116,64 +213,85 @@ def get_time_slots(date=None):
             'label': datetime.strptime(time_str, '%H:%M').strftime('%I:%M %p')
         })
     
-    return slots
+    return tuple(slots)
+
+# Reference data, built once at import
+TIME_SLOTS = _build_time_slots()
+
+GOODS_TYPES = (
+    {'value': 'cement', 'label_en': 'Cement', 'label_te': 'సిమెంట్'},
+    {'value': 'bricks', 'label_en': 'Bricks', 'label_te': 'ఇటుకలు'},
+    {'value': 'sand', 'label_en': 'Sand', 'label_te': 'ఇసుక'},
+    {'value': 'gravel', 'label_en': 'Gravel', 'label_te': 'గులకరాళ్ళు'},
+    {'value': 'furniture', 'label_en': 'Furniture', 'label_te': 'ఫర్నిచర్'},
+    {'value': 'electronics', 'label_en': 'Electronics', 'label_te': 'ఎలక్ట్రానిక్స్'},
+    {'value': 'household', 'label_en': 'Household Items', 'label_te': 'గృహ సామగ్రి'},
+    {'value': 'machinery', 'label_en': 'Machinery', 'label_te': 'యంత్రాలు'},
+    {'value': 'agricultural', 'label_en': 'Agricultural Goods', 'label_te': 'వ్యవసాయ సామాగ్రి'},
+    {'value': 'food_items', 'label_en': 'Food Items', 'label_te': 'ఆహార పదార్థాలు'},
+    {'value': 'textiles', 'label_en': 'Textiles', 'label_te': 'వస్త్రాలు'},
+    {'value': 'others', 'label_en': 'Others', 'label_te': 'ఇతరాలు'}
+)
+
+VEHICLE_TYPES = (
+    {
+        'value': 'mini_dcm',
+        'label_en': 'Mini DCM',
+        'label_te': 'మినీ DCM',
+        'capacity': '1-2 tons'
+    },
+    {
+        'value': 'standard_dcm',
+        'label_en': 'Standard DCM',
+        'label_te': 'స్టాండర్డ్ DCM',
+        'capacity': '2-4 tons'
+    },
+    {
+        'value': 'large_dcm',
+        'label_en': 'Large DCM',
+        'label_te': 'పెద్ద DCM',
+        'capacity': '4-6 tons'
+    }
+)
+
+TELANGANA_CITIES = (
+    {'value': 'hyderabad', 'label_en': 'Hyderabad', 'label_te': 'హైదరాబాద్'},
+    {'value': 'secunderabad', 'label_en': 'Secunderabad', 'label_te': 'సికింద్రాబాద్'},
+    {'value': 'warangal', 'label_en': 'Warangal', 'label_te': 'వరంగల్'},
+    {'value': 'nizamabad', 'label_en': 'Nizamabad', 'label_te': 'నిజామాబాద్'},
+    {'value': 'khammam', 'label_en': 'Khammam', 'label_te': 'ఖమ్మం'},
+    {'value': 'karimnagar', 'label_en': 'Karimnagar', 'label_te': 'కరీంనగర్'},
+    {'value': 'mahbubnagar', 'label_en': 'Mahbubnagar', 'label_te': 'మహబూబ్‌నగర్'},
+    {'value': 'nalgonda', 'label_en': 'Nalgonda', 'label_te': 'నల్గొండ'},
+    {'value': 'adilabad', 'label_en': 'Adilabad', 'label_te': 'ఆదిలాబాద్'},
+    {'value': 'medak', 'label_en': 'Medak', 'label_te': 'మేడక్'},
+    {'value': 'ranga_reddy', 'label_en': 'Ranga Reddy', 'label_te': 'రంగా రెడ్డి'},
+    {'value': 'sangareddy', 'label_en': 'Sangareddy', 'label_te': 'సంగారెడ్డి'}
+)
+
+def get_time_slots(date=None):
+    """
+    Get available time slots for booking
+    
+    Args:
+        date: Date for which to get slots (default: today)
+    
+    Returns:
+        List of time slots
+    """
+    return list(TIME_SLOTS)
 
 def get_goods_types():
     """Get list of available goods types"""
-    return [
-        {'value': 'cement', 'label_en': 'Cement', 'label_te': 'సిమెంట్'},
-        {'value': 'bricks', 'label_en': 'Bricks', 'label_te': 'ఇటుకలు'},
-        {'value': 'sand', 'label_en': 'Sand', 'label_te': 'ఇసుక'},
-        {'value': 'gravel', 'label_en': 'Gravel', 'label_te': 'గులకరాళ్ళు'},
-        {'value': 'furniture', 'label_en': 'Furniture', 'label_te': 'ఫర్నిచర్'},
-        {'value': 'electronics', 'label_en': 'Electronics', 'label_te': 'ఎలక్ట్రానిక్స్'},
-        {'value': 'household', 'label_en': 'Household Items', 'label_te': 'గృహ సామగ్రి'},
-        {'value': 'machinery', 'label_en': 'Machinery', 'label_te': 'యంత్రాలు'},
-        {'value': 'agricultural', 'label_en': 'Agricultural Goods', 'label_te': 'వ్యవసాయ సామాగ్రి'},
-        {'value': 'food_items', 'label_en': 'Food Items', 'label_te': 'ఆహార పదార్థాలు'},
-        {'value': 'textiles', 'label_en': 'Textiles', 'label_te': 'వస్త్రాలు'},
-        {'value': 'others', 'label_en': 'Others', 'label_te': 'ఇతరాలు'}
-    ]
+    return list(GOODS_TYPES)
 
 def get_vehicle_types():
     """Get list of vehicle types"""
-    return [
-        {
-            'value': 'mini_dcm',
-            'label_en': 'Mini DCM',
-            'label_te': 'మినీ DCM',
-            'capacity': '1-2 tons'
-        },
-        {
-            'value': 'standard_dcm',
-            'label_en': 'Standard DCM',
-            'label_te': 'స్టాండర్డ్ DCM',
-            'capacity': '2-4 tons'
-        },
-        {
-            'value': 'large_dcm',
-            'label_en': 'Large DCM',
-            'label_te': 'పెద్ద DCM',
-            'capacity': '4-6 tons'
-        }
-    ]
+    return list(VEHICLE_TYPES)
 
 def get_telangana_cities():
     """Get list of major cities in Telangana"""
-    return [
-        {'value': 'hyderabad', 'label_en': 'Hyderabad', 'label_te': 'హైదరాబాద్'},
-        {'value': 'secunderabad', 'label_en': 'Secunderabad', 'label_te': 'సికింద్రాబాద్'},
-        {'value': 'warangal', 'label_en': 'Warangal', 'label_te': 'వరంగల్'},
-        {'value': 'nizamabad', 'label_en': 'Nizamabad', 'label_te': 'నిజామాబాద్'},
-        {'value': 'khammam', 'label_en': 'Khammam', 'label_te': 'ఖమ్మం'},
-        {'value': 'karimnagar', 'label_en': 'Karimnagar', 'label_te': 'కరీంనగర్'},
-        {'value': 'mahbubnagar', 'label_en': 'Mahbubnagar', 'label_te': 'మహబూబ్‌నగర్'},
-        {'value': 'nalgonda', 'label_en': 'Nalgonda', 'label_te': 'నల్గొండ'},
-        {'value': 'adilabad', 'label_en': 'Adilabad', 'label_te': 'ఆదిలాబాద్'},
-        {'value': 'medak', 'label_en': 'Medak', 'label_te': 'మేడక్'},
-        {'value': 'ranga_reddy', 'label_en': 'Ranga Reddy', 'label_te': 'రంగా రెడ్డి'},
-        {'value': 'sangareddy', 'label_en': 'Sangareddy', 'label_te': 'సంగారెడ్డి'}
-    ]
+    return list(TELANGANA_CITIES)
 
 def translate_text(text, target_lang='te'):
     """
@@ -0,0 +1,188 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from PIL import Image
+from sqlalchemy import insert, select, update
+from config import Config
+from database import db
+from models.image_job import ImageJob
+from utils import metrics
+from utils.images import open_image
+from utils.storage import storage
+
+OPTIMIZABLE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_queue_slots = threading.BoundedSemaphore(Config.IMAGE_QUEUE_SIZE)
+_optimized_lookups = {}  # file_path -> (has optimized copy, checked at); object storage only
+
+def optimized_key(file_path):
+    """Storage key of an upload's optimized copy (next to the original, which keeps its hashed bytes)"""
+    name, ext = os.path.splitext(file_path)
+    return f"{name}.optimized{ext}"
+
+def served_key(file_path):
+    """
+    Storage key to serve for an upload: its optimized copy once that exists, else the original
+
+    Local storage checks the disk every time. Object storage would need a HEAD
+    request, so each worker remembers the answer for OPTIMIZED_LOOKUP_SECONDS.
+    """
+    if os.path.splitext(file_path)[1].lower() not in OPTIMIZABLE_EXTENSIONS:
+        return file_path
+    candidate = optimized_key(file_path)
+
+    if storage.is_local:
+        path = storage.path(candidate)
+        return candidate if path is not None and os.path.isfile(path) else file_path
+
+    now = time.time()
+    known = _optimized_lookups.get(file_path)
+    if known is None or now - known[1] > Config.OPTIMIZED_LOOKUP_SECONDS:
+        if len(_optimized_lookups) >= 10000:
+            _optimized_lookups.clear()
+        known = _optimized_lookups[file_path] = (storage.size(candidate) is not None, now)
+    return candidate if known[0] else file_path
+
+def optimize_image(file_path, max_size):
+    """
+    Write a resized, recompressed copy of a stored image (runs in a pool process)
+
+    The original stays untouched, so its bytes keep matching the SHA-256 in
+    its key. The copy is rendered to a unique temporary file and saved under
+    optimized_key(), so concurrent jobs for the same upload never share a
+    file and readers never see a partial one.
+
+    Args:
+        file_path: Storage key of the uploaded image
+        max_size: Maximum dimensions (width, height)
+
+    Returns:
+        (original_size, optimized_size) in bytes
+    """
+    with storage.local_copy(file_path) as source_path:
+        original_size = os.path.getsize(source_path)
+        ext = os.path.splitext(file_path)[1].lower()
+        fd, temp_path = tempfile.mkstemp(suffix=ext, dir=storage.staging_dir())
+        os.close(fd)
+
+        try:
+            with open_image(source_path, max_size) as image:
+                if image.mode == 'RGBA' or (ext != '.png' and image.mode not in ('RGB', 'L')):
+                    image = image.convert('RGB')
+                image.thumbnail(max_size, Image.Resampling.LANCZOS)
+                if ext == '.png':
+                    image.save(temp_path, 'PNG', optimize=True)
+                else:
+                    image.save(temp_path, 'JPEG', quality=85, optimize=True)
+
+            optimized_size = os.path.getsize(temp_path)
+            if optimized_size >= original_size:
+                # Already small enough; the original is served as-is
+                os.remove(temp_path)
+                return original_size, original_size
+
+            storage.save(temp_path, optimized_key(file_path))
+            return original_size, optimized_size
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+def _get_executor():
+    """Process pool for this worker, created on first use (and again after a fork)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=Config.IMAGE_WORKERS)
+            _executor_pid = os.getpid()
+        return _executor
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+def _record(engine, job_id, **values):
+    try:
+        with engine.begin() as connection:
+            connection.execute(update(ImageJob).where(ImageJob.id == job_id).values(**values))
+    except Exception as e:
+        print(f"Error recording image job {job_id}: {e}")
+
+def _finish(engine, job_id, future):
+    """Pool callback: store the outcome of an optimization job"""
+    _queue_slots.release()
+    try:
+        original_size, optimized_size = future.result()
+    except Exception as e:
+        metrics.incr('image_jobs.failed')
+        _record(engine, job_id, status='failed', error=str(e)[:255], completed_at=datetime.utcnow())
+        return
+
+    metrics.incr('image_jobs.ready')
+    metrics.incr('image_jobs.bytes_saved', original_size - optimized_size)
+    _record(engine, job_id, status='ready', original_size=original_size,
+            optimized_size=optimized_size, completed_at=datetime.utcnow())
+
+def schedule_optimization(file_path, max_size=(1920, 1080)):
+    """
+    Queue an uploaded image for background resizing and recompression
+
+    The upload is acknowledged right away with the original file; once the
+    optimized copy is ready, served_key() hands it out in place of the
+    original. The job reads and writes through storage.local_copy() and
+    storage.save(), so it runs the same way on local disk and on object
+    storage. If the queue is full the original is kept as-is.
+
+    Args:
+        file_path: Storage key of the uploaded image
+        max_size: Maximum dimensions (width, height)
+
+    Returns:
+        Job status ('pending', 'skipped' or 'failed')
+    """
+    engine = db.engine
+    queued = _queue_slots.acquire(blocking=False)
+    status = 'pending' if queued else 'skipped'
+
+    # Recorded on its own connection so the caller's transaction is left alone
+    with engine.begin() as connection:
+        job_id = connection.execute(
+            insert(ImageJob).values(file_path=file_path, status=status, created_at=datetime.utcnow())
+        ).inserted_primary_key[0]
+
+    if not queued:
+        metrics.incr('image_jobs.skipped')
+        return status
+
+    try:
+        future = _get_executor().submit(optimize_image, file_path, tuple(max_size))
+    except Exception as e:
+        # Broken pool (e.g., a worker was killed); start a fresh one next time
+        _reset_executor()
+        _queue_slots.release()
+        metrics.incr('image_jobs.failed')
+        _record(engine, job_id, status='failed', error=str(e)[:255], completed_at=datetime.utcnow())
+        return 'failed'
+
+    metrics.incr('image_jobs.queued')
+    future.add_done_callback(lambda done: _finish(engine, job_id, done))
+    return status
+
+def get_image_status(file_path):
+    """
+    Latest optimization job for an uploaded file
+
+    Returns:
+        ImageJob dict, or None if the file was never queued
+    """
+    job = db.session.execute(
+        select(ImageJob).where(ImageJob.file_path == file_path).order_by(ImageJob.id.desc()).limit(1)
+    ).scalar_one_or_none()
+    return job.to_dict() if job else None
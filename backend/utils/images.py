@@ -0,0 +1,57 @@
+import math
+from PIL import Image, ImageOps
+from config import Config
+
+# Pillow warns above this and refuses twice it; open_image() refuses anything over it
+Image.MAX_IMAGE_PIXELS = Config.MAX_IMAGE_PIXELS
+
+EXIF_ORIENTATION = 0x0112
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}  # Stored sideways: width and height are swapped
+
+def open_image(source, max_size=None):
+    """
+    Open and decode an image without decoding more pixels than needed
+
+    The size is checked from the header before any pixel is decoded. JPEGs
+    are decoded at the smallest 1/2, 1/4 or 1/8 scale that still covers
+    the size they will be resized to within max_size (draft mode); see
+    benchmarks/bench_image_memory.py for peak RSS on phone photos. EXIF orientation is applied once, on the
+    reduced image, and the orientation tag is dropped.
+
+    Args:
+        source: File path or file object
+        max_size: Bounding box (width, height) the caller will resize to,
+                  or None to decode at full size
+
+    Returns:
+        Decoded, upright PIL Image (caller closes it)
+
+    Raises:
+        ValueError: If the image has more than Config.MAX_IMAGE_PIXELS pixels
+    """
+    image = Image.open(source)
+    try:
+        width, height = image.size
+        if width * height > Config.MAX_IMAGE_PIXELS:
+            raise ValueError(f'Image is {width}x{height}; at most {Config.MAX_IMAGE_PIXELS} pixels allowed')
+
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        if max_size is not None:
+            # The box applies to the upright image; the stored one may be sideways
+            box_width, box_height = (max_size[1], max_size[0]) if orientation in ROTATED_ORIENTATIONS else max_size
+            scale = min(box_width / width, box_height / height)
+            if scale < 1:
+                # Decode just large enough for the size the image will be resized to
+                # (no-op for formats other than JPEG)
+                image.draft(None, (math.ceil(width * scale), math.ceil(height * scale)))
+        image.load()
+
+        if orientation != 1:
+            upright = ImageOps.exif_transpose(image)
+            image.close()
+            image = upright
+    except Exception:
+        image.close()
+        raise
+
+    return image
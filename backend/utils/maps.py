@@ -30,6 +30,30 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     distance = R * c
     return round(distance, 2)
 
+def calculate_distances(routes):
+    """
+    Haversine distances for many coordinate pairs in one pass
+    
+    Args:
+        routes: List of (lat1, lon1, lat2, lon2) tuples
+    
+    Returns:
+        List of distances in kilometers, rounded like calculate_distance
+    """
+    R = 6371.0
+    radians, sin, cos, atan2, sqrt = math.radians, math.sin, math.cos, math.atan2, math.sqrt
+    
+    distances = []
+    for lat1, lon1, lat2, lon2 in routes:
+        lat1_rad = radians(lat1)
+        lat2_rad = radians(lat2)
+        dlat = lat2_rad - lat1_rad
+        dlon = radians(lon2) - radians(lon1)
+        a = sin(dlat / 2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2)**2
+        distances.append(round(R * 2 * atan2(sqrt(a), sqrt(1 - a)), 2))
+    
+    return distances
+
 def get_distance_matrix(origins, destinations):
     """
     Get distance and duration using Google Maps Distance Matrix API
@@ -173,6 +197,38 @@ def get_nearby_drivers(pickup_lat, pickup_lon, radius_km=50):
     
     return nearby_drivers
 
+def count_nearby_drivers(pickups, radius_km=50):
+    """
+    Count available drivers near each pickup with a single driver query
+    
+    Args:
+        pickups: List of (lat, lon) tuples
+        radius_km: Search radius in kilometers
+    
+    Returns:
+        List of driver counts, one per pickup
+    """
+    from models.driver import Driver
+    
+    driver_locations = Driver.query.with_entities(
+        Driver.current_latitude, Driver.current_longitude
+    ).filter_by(
+        status='available',
+        is_verified=True
+    ).filter(
+        Driver.current_latitude.isnot(None),
+        Driver.current_longitude.isnot(None)
+    ).all()
+    
+    counts = []
+    for lat, lon in pickups:
+        distances = calculate_distances(
+            [(lat, lon, driver_lat, driver_lon) for driver_lat, driver_lon in driver_locations]
+        )
+        counts.append(sum(1 for distance in distances if distance <= radius_km))
+    
+    return counts
+
 def get_route_polyline(origin, destination):
     """
     Get route polyline for map display
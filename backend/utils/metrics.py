@@ -0,0 +1,55 @@
+import threading
+import time
+
+# Process-local metric registry. Values are per worker; scrape each worker or
+# aggregate upstream if you need fleet-wide numbers.
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_started_at = time.time()
+
+def incr(name, value=1):
+    """
+    Increment a counter
+
+    Args:
+        name: Metric name (e.g., 'cache.dashboard.hit')
+        value: Amount to add
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def observe(name, value):
+    """
+    Record an observation for a gauge (keeps last, max, sum and count)
+
+    Args:
+        name: Metric name (e.g., 'cache.dashboard.age_seconds')
+        value: Observed value
+    """
+    with _lock:
+        gauge = _gauges.get(name)
+        if gauge is None:
+            gauge = _gauges[name] = {'last': 0, 'max': 0, 'sum': 0, 'count': 0}
+        gauge['last'] = value
+        gauge['max'] = max(gauge['max'], value)
+        gauge['sum'] += value
+        gauge['count'] += 1
+
+def snapshot():
+    """
+    Get a copy of all metrics
+
+    Returns:
+        dict with counters and gauges
+    """
+    with _lock:
+        gauges = {}
+        for name, gauge in _gauges.items():
+            gauges[name] = dict(gauge)
+            gauges[name]['avg'] = round(gauge['sum'] / gauge['count'], 3) if gauge['count'] else 0
+        return {
+            'uptime_seconds': round(time.time() - _started_at, 1),
+            'counters': dict(_counters),
+            'gauges': gauges
+        }
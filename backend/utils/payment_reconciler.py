@@ -0,0 +1,328 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import razorpay
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from config import Config
+from database import db
+from models.booking import Booking
+from models.payment_check import PaymentCheck
+from models.webhook_event import WebhookEvent
+from utils import metrics
+
+# Initialize Razorpay client
+razorpay_client = razorpay.Client(auth=(Config.RAZORPAY_KEY_ID, Config.RAZORPAY_KEY_SECRET))
+
+CLAIM_SECONDS = 120  # Other workers skip a check or event for this long once a pass has picked it up
+MAX_RETRY_SECONDS = 3600
+WEBHOOK_EVENTS = ('payment.captured', 'payment.failed')  # Others are stored and marked processed
+
+_thread_pid = None
+_thread_lock = threading.Lock()
+_wake = threading.Event()  # Set when a webhook arrives, so this worker's thread handles it right away
+
+def schedule_payment_check(booking_id, payment_id):
+    """
+    Queue a payment for confirmation with Razorpay (committed with the caller's session)
+
+    Args:
+        booking_id: Booking the payment is for
+        payment_id: Razorpay payment ID from checkout
+    """
+    check = PaymentCheck.query.filter_by(razorpay_payment_id=payment_id).first()
+    if check is None:
+        db.session.add(PaymentCheck(booking_id=booking_id, razorpay_payment_id=payment_id))
+        return
+    # Verified again after the check finished or gave up: confirm it afresh
+    check.booking_id = booking_id
+    if check.status != 'pending':
+        check.status = 'pending'
+        check.attempts = 0
+        check.error = None
+        check.completed_at = None
+    check.next_attempt_at = datetime.utcnow()
+
+def record_webhook_event(event_id, event, order_id, payload):
+    """
+    Store a verified webhook delivery for the background worker
+
+    Args:
+        event_id: Razorpay event ID (the same for every retry of a delivery)
+        event: Event name (e.g., 'payment.captured')
+        order_id: Razorpay order ID the event is about, if any
+        payload: Request body as received
+
+    Returns:
+        True if stored, False if the event was already received
+    """
+    db.session.add(WebhookEvent(event_id=event_id, event=event, razorpay_order_id=order_id, payload=payload))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        metrics.incr('webhooks.duplicate')
+        return False
+    metrics.incr('webhooks.received')
+    _wake.set()
+    return True
+
+def apply_payment(booking, payment):
+    """
+    Set a booking's payment fields from a Razorpay payment entity
+
+    Returns:
+        True if the payment reached a final state, False if it is not captured yet
+    """
+    if payment['status'] == 'captured':
+        amount_paid = payment['amount'] / 100  # Convert paise to rupees
+        if amount_paid >= booking.estimated_fare:
+            booking.payment_status = 'paid'
+            booking.payment_method = 'online'
+        else:
+            booking.payment_status = 'partial'
+            booking.payment_method = 'partial'
+        return True
+    if payment['status'] in ('failed', 'refunded'):
+        booking.payment_status = payment['status']
+        return True
+    return False  # created/authorized: capture still to come
+
+def _fetch_payments(payment_ids, since):
+    """
+    Razorpay payment entities by ID: one list call for the period the payments
+    were made in, then single fetches for any not on that page
+
+    Returns:
+        ({payment ID: payment}, {payment ID: error message})
+    """
+    wanted = set(payment_ids)
+    payments = {}
+    try:
+        listing = razorpay_client.payment.all({
+            'from': int(since.replace(tzinfo=timezone.utc).timestamp()) - 60,
+            'count': 100
+        })
+        payments = {item['id']: item for item in listing.get('items', []) if item['id'] in wanted}
+    except Exception as e:
+        print(f"Error listing Razorpay payments: {e}")
+
+    errors = {}
+    for payment_id in wanted - payments.keys():
+        try:
+            payments[payment_id] = razorpay_client.payment.fetch(payment_id)
+        except Exception as e:
+            errors[payment_id] = str(e)
+    metrics.incr('payments.fetched', len(wanted))
+    return payments, errors
+
+def _finish(check, status, now):
+    check.status = status
+    check.completed_at = now
+
+def _retry(check, booking, error, now):
+    """Back off exponentially; give up (for manual review) after PAYMENT_CHECK_MAX_ATTEMPTS"""
+    check.attempts += 1
+    check.error = (error or '')[:255]
+    if check.attempts >= Config.PAYMENT_CHECK_MAX_ATTEMPTS:
+        _finish(check, 'failed', now)
+        # Unconfirmed, so let the customer pay again (and drivers not pick up an unpaid
+        # booking); a late capture webhook still settles it. Counted on the admin dashboard.
+        booking.payment_status = 'unpaid'
+        if booking.status == 'confirmed':
+            booking.status = 'pending'
+        metrics.incr('payments.check_failed')
+        return
+    delay = min(Config.PAYMENT_RETRY_BASE_SECONDS * 2 ** (check.attempts - 1), MAX_RETRY_SECONDS)
+    check.next_attempt_at = now + timedelta(seconds=delay)
+    metrics.incr('payments.check_retried')
+
+def _claim(model, condition, batch_size, now):
+    """
+    Claim up to batch_size due rows of a queue table, so a pass in another
+    worker leaves them alone until CLAIM_SECONDS have passed
+
+    Returns:
+        IDs of the claimed rows
+    """
+    due = db.session.execute(
+        select(model.id, model.next_attempt_at)
+        .where(condition, model.next_attempt_at <= now)
+        .order_by(model.next_attempt_at).limit(batch_size)
+    ).all()
+    claimed_ids = [
+        row_id for row_id, next_attempt_at in due
+        if db.session.execute(
+            update(model)
+            .where(model.id == row_id, model.next_attempt_at == next_attempt_at)
+            .values(next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+        ).rowcount
+    ]
+    db.session.commit()
+    return claimed_ids
+
+def reconcile_payments(batch_size=None):
+    """
+    Confirm one batch of due payments with Razorpay and update their bookings
+
+    Args:
+        batch_size: Checks per pass (default Config.PAYMENT_RECONCILE_BATCH)
+
+    Returns:
+        Number of checks processed
+    """
+    batch_size = batch_size or Config.PAYMENT_RECONCILE_BATCH
+    now = datetime.utcnow()
+    claimed_ids = _claim(PaymentCheck, PaymentCheck.status == 'pending', batch_size, now)
+    if not claimed_ids:
+        return 0
+
+    checks = PaymentCheck.query.filter(PaymentCheck.id.in_(claimed_ids)).all()
+    bookings = {
+        booking.id: booking
+        for booking in Booking.query.filter(Booking.id.in_([check.booking_id for check in checks]))
+    }
+
+    open_checks = []
+    for check in checks:
+        booking = bookings.get(check.booking_id)
+        if (booking is None or booking.payment_status != 'pending_capture'
+                or booking.razorpay_payment_id != check.razorpay_payment_id):
+            # Settled elsewhere (webhook, admin) or replaced by a newer payment
+            _finish(check, 'done', now)
+        else:
+            open_checks.append(check)
+
+    if open_checks:
+        payments, errors = _fetch_payments(
+            [check.razorpay_payment_id for check in open_checks],
+            min(check.created_at for check in open_checks)
+        )
+        for check in open_checks:
+            payment = payments.get(check.razorpay_payment_id)
+            booking = bookings[check.booking_id]
+            if payment is None:
+                _retry(check, booking, errors.get(check.razorpay_payment_id), now)
+                continue
+            check.payment_state = payment['status']
+            if apply_payment(booking, payment):
+                _finish(check, 'done', now)
+                metrics.incr(f"payments.reconciled.{payment['status']}")
+            else:
+                _retry(check, booking, f"Payment is {payment['status']}", now)
+
+    db.session.commit()
+    return len(checks)
+
+def _apply_webhook_event(booking, event):
+    payment = json.loads(event.payload)['payload']['payment']['entity']
+    if event.event == 'payment.captured':
+        booking.razorpay_payment_id = payment['id']
+        apply_payment(booking, payment)
+        if booking.status == 'pending':
+            booking.status = 'confirmed'
+    elif (event.event == 'payment.failed' and booking.payment_status == 'pending_capture'
+            and booking.razorpay_payment_id == payment['id']):
+        apply_payment(booking, payment)
+    # Otherwise a failed attempt the customer has since retried; nothing to change
+
+def process_webhook_events(batch_size=None):
+    """
+    Apply one batch of received webhook events to their bookings, loading
+    each order's booking once however many events it has in the batch
+
+    Args:
+        batch_size: Events per pass (default Config.WEBHOOK_PROCESS_BATCH)
+
+    Returns:
+        Number of events processed
+    """
+    batch_size = batch_size or Config.WEBHOOK_PROCESS_BATCH
+    now = datetime.utcnow()
+    claimed_ids = _claim(WebhookEvent, WebhookEvent.processed_at.is_(None), batch_size, now)
+    if not claimed_ids:
+        return 0
+
+    events = WebhookEvent.query.filter(WebhookEvent.id.in_(claimed_ids)).order_by(WebhookEvent.id).all()
+    events_by_order = defaultdict(list)
+    for event in events:
+        if event.razorpay_order_id and event.event in WEBHOOK_EVENTS:
+            events_by_order[event.razorpay_order_id].append(event)
+
+    bookings = {
+        booking.razorpay_order_id: booking
+        for booking in Booking.query.filter(Booking.razorpay_order_id.in_(list(events_by_order)))
+    } if events_by_order else {}
+
+    failed_ids = set()
+    for order_id, order_events in events_by_order.items():
+        booking = bookings.get(order_id)
+        if booking is None:
+            continue
+        # In arrival order, so a capture after a failed attempt settles the booking as paid
+        for event in order_events:
+            try:
+                # A savepoint per event: a bad one is undone alone and the batch goes on
+                with db.session.begin_nested():
+                    _apply_webhook_event(booking, event)
+            except Exception as e:
+                failed_ids.add(event.id)
+                _retry_event(event, f'{type(e).__name__}: {e}', now)
+
+    for event in events:
+        if event.id in failed_ids:
+            continue
+        event.status = 'done'
+        event.processed_at = now
+        metrics.incr(f'webhooks.processed.{event.event}')
+    db.session.commit()
+    return len(events)
+
+def _retry_event(event, error, now):
+    """Back off a webhook event that failed to apply; give up after PAYMENT_CHECK_MAX_ATTEMPTS"""
+    event.attempts += 1
+    event.error = error[:255]
+    if event.attempts >= Config.PAYMENT_CHECK_MAX_ATTEMPTS:
+        event.status = 'failed'
+        event.processed_at = now
+        metrics.incr('webhooks.failed')
+        return
+    delay = min(Config.PAYMENT_RETRY_BASE_SECONDS * 2 ** (event.attempts - 1), MAX_RETRY_SECONDS)
+    event.next_attempt_at = now + timedelta(seconds=delay)
+    metrics.incr('webhooks.retried')
+
+def _run(app):
+    while True:
+        _wake.wait(Config.PAYMENT_RECONCILE_INTERVAL)
+        _wake.clear()
+        with app.app_context():
+            # A full batch means there may be more due right now. Each queue has its own
+            # error handling, so a failing pass of one doesn't hold up the other.
+            for process, batch_size, name in (
+                (process_webhook_events, Config.WEBHOOK_PROCESS_BATCH, 'webhook events'),
+                (reconcile_payments, Config.PAYMENT_RECONCILE_BATCH, 'payments'),
+            ):
+                try:
+                    while process() >= batch_size:
+                        pass
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error processing {name}: {e}")
+
+def start_payment_reconciler(app):
+    """Run process_webhook_events() and reconcile_payments() in a background thread of this process (once per process)"""
+    global _thread_pid
+    with _thread_lock:
+        if _thread_pid == os.getpid():
+            return
+        threading.Thread(target=_run, args=(app,), name='payment-reconciler', daemon=True).start()
+        _thread_pid = os.getpid()
+
+def register_payment_reconciler(app):
+    """Start the payment worker thread in each worker on its first request (threads don't survive a fork)"""
+    @app.before_request
+    def ensure_payment_reconciler():
+        if _thread_pid != os.getpid():
+            start_payment_reconciler(app)
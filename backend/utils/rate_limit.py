@@ -0,0 +1,156 @@
+import math
+import threading
+import time
+from functools import wraps
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from config import Config
+from utils import metrics
+from utils.helpers import format_phone
+
+# Optional shared store (Redis), so every worker draws from the same buckets.
+try:
+    import redis
+except ImportError:
+    redis = None
+
+MAX_LOCAL_BUCKETS = 100000  # Full buckets are dropped beyond this (a full bucket equals a new one)
+
+class LocalBuckets:
+    """Per-process token buckets"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated_at, full_at)
+
+    def take(self, key, rate, burst):
+        """
+        Take one token from a bucket
+
+        Args:
+            key: Bucket key
+            rate: Refill rate in tokens per second
+            burst: Bucket capacity
+
+        Returns:
+            Seconds to wait before a token is available (0 if one was taken)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            wait = 0
+            if tokens < 1:
+                wait = (1 - tokens) / rate
+            else:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self._buckets) > MAX_LOCAL_BUCKETS:
+                # A refilled bucket is the same as a missing one
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+            return wait
+
+# Refill, take one token and return the wait in seconds, atomically on the server
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated_at, 0) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+else
+    tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisBuckets:
+    """Token buckets on a Redis server, shared by every worker"""
+
+    def __init__(self, url, prefix='srta:ratelimit:'):
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(TAKE_SCRIPT)
+        self._prefix = prefix
+
+    def take(self, key, rate, burst):
+        return float(self._take(keys=[self._prefix + key], args=[rate, burst, time.time()]))
+
+def _create_backend():
+    if Config.RATE_LIMIT_REDIS_URL:
+        if redis is None:
+            print("redis package not installed. Using per-process rate limits.")
+        else:
+            return RedisBuckets(Config.RATE_LIMIT_REDIS_URL)
+    return LocalBuckets()
+
+buckets = _create_backend()
+_local_buckets = buckets if isinstance(buckets, LocalBuckets) else LocalBuckets()
+
+def _take(key, rate, burst):
+    try:
+        return buckets.take(key, rate, burst)
+    except Exception as e:
+        # Shared store unavailable: keep limiting within this worker
+        print(f"Rate limit store failed: {e}")
+        return _local_buckets.take(key, rate, burst)
+
+def client_ip():
+    """Client address, skipping Config.TRUSTED_PROXY_COUNT proxies in X-Forwarded-For"""
+    if Config.TRUSTED_PROXY_COUNT:
+        route = request.access_route
+        return route[max(len(route) - Config.TRUSTED_PROXY_COUNT, 0)]
+    return request.remote_addr
+
+def json_phone():
+    """Phone number from the JSON body (login, registration)"""
+    data = request.get_json(silent=True)
+    return data.get('phone') if isinstance(data, dict) else None
+
+def identity_phone():
+    """Phone number of the signed-in user (place the limit below @jwt_required())"""
+    return get_jwt_identity().get('phone')
+
+def rate_limited(endpoint, phone=None):
+    """
+    Decorator to reject requests over the per-phone, per-IP or endpoint-wide
+    rate with 429 and Retry-After, before the view touches the database
+
+    Args:
+        endpoint: Name for the global bucket and metrics (e.g., 'auth.login')
+        phone: Function returning the phone number the request acts for, or
+               None to skip the per-phone limit
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # The caller's address first, so one noisy address doesn't use up the
+            # global bucket; the phone (which anyone can name) only once the
+            # address and global checks pass, so a flood from elsewhere can't
+            # lock its owner out
+            limits = [
+                ('ip', client_ip(), Config.RATE_LIMIT_PER_IP / 60, Config.RATE_LIMIT_PER_IP),
+                ('global', '', Config.RATE_LIMIT_GLOBAL, Config.RATE_LIMIT_GLOBAL * 2),
+            ]
+            # One bucket per number however it is written (+91 98..., 98...)
+            phone_number = format_phone(str(phone() or '')) if phone else None
+            if phone_number:
+                limits.append(('phone', phone_number, Config.RATE_LIMIT_PER_PHONE / 60, Config.RATE_LIMIT_PER_PHONE))
+
+            for scope, value, rate, burst in limits:
+                wait = _take(f'{endpoint}:{scope}:{value}', rate, burst)
+                if wait > 0:
+                    metrics.incr(f'rate_limit.{endpoint}.rejected.{scope}')
+                    response = jsonify({'error': 'Too many requests. Please try again later.'})
+                    response.headers['Retry-After'] = str(math.ceil(wait))
+                    return response, 429
+
+            metrics.incr(f'rate_limit.{endpoint}.allowed')
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
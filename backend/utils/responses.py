@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+from flask import Response, make_response, request
+from config import Config
+from utils import metrics
+
+# Optional brotli support. Falls back to gzip only.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/html',
+                          'text/plain', 'text/css', 'application/javascript'}
+
+def conditional(version, build, last_modified=None):
+    """
+    Answer with 304 Not Modified when the client already has this version,
+    otherwise build and return the full response
+
+    Args:
+        version: Tuple of values that change whenever the response would
+                 (row counts, updated_at maxima, user id, ...)
+        build: Zero-argument function returning the full response
+        last_modified: Optional datetime for Last-Modified / If-Modified-Since
+
+    Returns:
+        Flask Response carrying a weak ETag (weak, so it survives compression)
+    """
+    etag = hashlib.sha1(repr((request.full_path, version)).encode('utf-8')).hexdigest()
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = (last_modified is not None and request.if_modified_since is not None
+                        and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None))
+
+    if not_modified:
+        metrics.incr('http.not_modified')
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _choose_encoding(accept_encoding):
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+def compress_response(response):
+    """after_request hook: brotli/gzip-compress large text responses"""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    body = response.get_data()
+    if len(body) < Config.COMPRESS_MIN_SIZE:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=Config.BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=Config.GZIP_LEVEL)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    metrics.incr(f'http.compressed.{encoding}')
+    metrics.incr('http.compressed.bytes_saved', len(body) - len(compressed))
+    return response
@@ -0,0 +1,125 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, or_, select
+from config import Config
+from database import db
+from models.revocation import Revocation
+from models.user import User
+from utils import metrics
+
+# Log rows are re-read for this long after a refresh, so a row whose transaction
+# committed after a higher ID was already seen is not skipped
+COMMIT_GRACE = timedelta(seconds=60)
+
+class RevocationList:
+    """
+    Process-local set of deactivated user IDs and revoked token JTIs
+
+    Loaded once from users.is_active and the unexpired token revocations,
+    then kept current by reading only the revocation log rows added since
+    the last refresh, at most every refresh_interval seconds. Checking a
+    token is two set lookups, so requests pay no query.
+    """
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self.users = set()
+        self.tokens = {}  # jti -> expiry; dropped once the token is expired anyway
+        self.last_id = None  # None until the first load
+        self.read_since = None
+        self.checked_at = 0
+        self._lock = threading.Lock()
+
+    def _load(self, connection):
+        last_id = connection.execute(select(func.max(Revocation.id))).scalar() or 0
+        users = set(connection.execute(select(User.id).where(User.is_active.is_(False))).scalars())
+        tokens = dict(connection.execute(
+            select(Revocation.jti, Revocation.expires_at)
+            .where(Revocation.jti.isnot(None), Revocation.expires_at > datetime.utcnow())
+        ).all())
+        self.users, self.tokens, self.last_id = users, tokens, last_id
+
+    def _apply_new(self, connection):
+        rows = connection.execute(
+            select(Revocation.id, Revocation.user_id, Revocation.jti, Revocation.action, Revocation.expires_at)
+            .where(or_(Revocation.id > self.last_id, Revocation.created_at >= self.read_since))
+            .order_by(Revocation.id)
+        ).all()
+        # Replayed in ID order, so each user ends up in the state of their latest row
+        for row in rows:
+            if row.jti:
+                self.tokens[row.jti] = row.expires_at
+            elif row.action == 'restore':
+                self.users.discard(row.user_id)
+            else:
+                self.users.add(row.user_id)
+            self.last_id = max(self.last_id, row.id)
+
+    def refresh(self, force=False):
+        """
+        Pick up revocations from other workers if the copy is stale
+
+        Args:
+            force: Refresh now regardless of the interval (after a local change)
+        """
+        if not force and time.monotonic() - self.checked_at < self.refresh_interval:
+            return
+        # Other threads keep checking against the current sets meanwhile (except before the first load)
+        if not self._lock.acquire(blocking=force or self.last_id is None):
+            return
+        try:
+            started = datetime.utcnow()
+            with db.engine.connect() as connection:
+                if self.last_id is None:
+                    self._load(connection)
+                else:
+                    self._apply_new(connection)
+            self.read_since = started - COMMIT_GRACE
+            self.tokens = {jti: expires for jti, expires in self.tokens.items() if expires > started}
+            self.checked_at = time.monotonic()
+            metrics.incr('revocation.refreshes')
+        except Exception as e:
+            # Keep checking against the last copy; retried on the next request
+            print(f"Error refreshing revocation list: {e}")
+        finally:
+            self._lock.release()
+
+    def is_revoked(self, user_id, jti):
+        return user_id in self.users or jti in self.tokens
+
+revocation_list = RevocationList(Config.REVOCATION_REFRESH_SECONDS)
+
+def log_user_status(user_id, is_active):
+    """
+    Record a user's deactivation or reactivation (committed with the caller's session)
+
+    Args:
+        user_id: User whose tokens are revoked or restored
+        is_active: New account status
+    """
+    db.session.add(Revocation(user_id=user_id, action='restore' if is_active else 'revoke'))
+
+def revoke_token(jti, expires):
+    """
+    Record a single revoked access token (committed with the caller's session)
+
+    Args:
+        jti: Token ID ('jti' claim)
+        expires: Token expiry as a Unix timestamp ('exp' claim)
+    """
+    db.session.add(Revocation(jti=jti, expires_at=datetime.utcfromtimestamp(expires)))
+
+def is_token_revoked(jwt_header, jwt_payload):
+    """flask_jwt_extended blocklist callback, run for every protected request"""
+    revocation_list.refresh()
+    identity = jwt_payload.get(current_app.config['JWT_IDENTITY_CLAIM']) or {}
+    revoked = revocation_list.is_revoked(identity.get('id'), jwt_payload.get('jti'))
+    if revoked:
+        metrics.incr('revocation.rejected')
+    return revoked
+
+def register_revocation_check(jwt):
+    """Reject tokens of deactivated users and revoked tokens (call once with the JWTManager)"""
+    jwt.token_in_blocklist_loader(is_token_revoked)
@@ -0,0 +1,267 @@
+import json
+import threading
+from datetime import date, datetime
+from flask import Response
+from sqlalchemy import select
+from models.driver import Driver
+
+# Optional fast JSON encoder. Falls back to the standard library.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Output shapes mirror the models' to_dict(). A value is either a column name,
+# a nested shape, or a (function, column names) pair for computed fields.
+# Datetimes are left as-is; the JSON encoder writes them in ISO 8601.
+BOOKING_SHAPE = {
+    'id': 'id',
+    'booking_id': 'booking_id',
+    'customer_id': 'customer_id',
+    'driver_id': 'driver_id',
+    'pickup': {
+        'address': 'pickup_address',
+        'latitude': 'pickup_latitude',
+        'longitude': 'pickup_longitude',
+        'city': 'pickup_city'
+    },
+    'drop': {
+        'address': 'drop_address',
+        'latitude': 'drop_latitude',
+        'longitude': 'drop_longitude',
+        'city': 'drop_city'
+    },
+    'goods': {
+        'type': 'goods_type',
+        'weight_kg': 'weight_kg',
+        'volume_cubic_ft': 'volume_cubic_ft',
+        'image': 'goods_image',
+        'special_instructions': 'special_instructions'
+    },
+    'distance_km': 'distance_km',
+    'estimated_fare': 'estimated_fare',
+    'final_fare': 'final_fare',
+    'admin_commission': 'admin_commission',
+    'driver_earning': 'driver_earning',
+    'scheduled_date': 'scheduled_date',
+    'pickup_time': 'pickup_time',
+    'drop_time': 'drop_time',
+    'status': 'status',
+    'payment_status': 'payment_status',
+    'payment_method': 'payment_method',
+    'customer_rating': 'customer_rating',
+    'customer_feedback': 'customer_feedback',
+    'created_at': 'created_at'
+}
+
+DRIVER_SHAPE = {
+    'id': 'id',
+    'user_id': 'user_id',
+    'license_number': 'license_number',
+    'license_expiry': 'license_expiry',
+    'id_proof_type': 'id_proof_type',
+    'service_area': 'service_area',
+    'status': 'status',
+    'location': {
+        'latitude': 'current_latitude',
+        'longitude': 'current_longitude',
+        'last_update': 'last_location_update'
+    },
+    'stats': {
+        'total_trips': 'total_trips',
+        'total_earnings': 'total_earnings',
+        'wallet_balance': 'wallet_balance',
+        'rating': (Driver.average_rating, ('rating_sum', 'rating_count')),
+        'rating_count': 'rating_count'
+    },
+    'is_verified': 'is_verified',
+    'verified_at': 'verified_at',
+    'created_at': 'created_at'
+}
+
+USER_SHAPE = {
+    'id': 'id',
+    'phone': 'phone',
+    'name': 'name',
+    'email': 'email',
+    'role': 'role',
+    'language': 'language',
+    'is_verified': 'is_verified',
+    'is_active': 'is_active',
+    'created_at': 'created_at'
+}
+
+# Compiled sparse fieldsets (?fields=) are cached per combination, up to this many
+MAX_CACHED_FIELDSETS = 256
+
+_serializers = {}
+_serializers_lock = threading.Lock()
+_fieldsets = {}
+
+def shape_columns(shape):
+    """
+    Column names a shape reads, in a stable order
+
+    Args:
+        shape: Output shape (see BOOKING_SHAPE)
+
+    Returns:
+        List of column names without duplicates
+    """
+    names = []
+
+    def visit(node):
+        if isinstance(node, str):
+            names.append(node)
+        elif isinstance(node, tuple):
+            names.extend(node[1])
+        else:
+            for value in node.values():
+                visit(value)
+
+    visit(shape)
+    return list(dict.fromkeys(names))
+
+def _compile(shape):
+    """Generate a function turning a row tuple into the shape's nested dict"""
+    index = {name: position for position, name in enumerate(shape_columns(shape))}
+    namespace = {}
+
+    def emit(node):
+        if isinstance(node, str):
+            return f'row[{index[node]}]'
+        if isinstance(node, tuple):
+            function, arguments = node
+            function_name = f'_f{len(namespace)}'
+            namespace[function_name] = function
+            return f"{function_name}({', '.join(f'row[{index[name]}]' for name in arguments)})"
+        return '{' + ', '.join(f'{key!r}: {emit(value)}' for key, value in node.items()) + '}'
+
+    return eval(f'lambda row: {emit(shape)}', namespace)
+
+def get_serializer(key, shape):
+    """
+    Get the compiled serializer for a shape, compiling it once per key
+
+    Args:
+        key: Hashable cache key identifying the shape
+        shape: Output shape
+
+    Returns:
+        Function mapping a row tuple (ordered as shape_columns) to a dict
+    """
+    serializer = _serializers.get(key)
+    if serializer is None:
+        with _serializers_lock:
+            serializer = _serializers.get(key)
+            if serializer is None:
+                serializer = _serializers[key] = _compile(shape)
+    return serializer
+
+def parse_fields(value):
+    """
+    Parse a ?fields= value
+
+    Args:
+        value: Comma-separated field names; nested fields use dots (e.g., 'pickup.city')
+
+    Returns:
+        frozenset of field paths, or None for all fields
+    """
+    if not value:
+        return None
+    return frozenset(field.strip() for field in value.split(',') if field.strip()) or None
+
+def _select_fields(shape, paths):
+    """Sub-shape containing only the given field paths (raises ValueError on unknown fields)"""
+    selected = {}
+    
+    # Sorted so that a whole block ('pickup') is seen before its members ('pickup.city')
+    for path in sorted(paths):
+        node, target = shape, selected
+        parts = path.split('.')
+        for depth, part in enumerate(parts):
+            if not isinstance(node, dict) or part not in node:
+                raise ValueError(f'Unknown field: {path}')
+            node = node[part]
+            if depth == len(parts) - 1:
+                target[part] = node
+            elif target.get(part) is node:
+                break  # Whole block already selected
+            else:
+                target = target.setdefault(part, {})
+    
+    return selected
+
+def get_fieldset(key, shape, fields, required=()):
+    """
+    Resolve a sparse fieldset to a sub-shape and its compiled serializer
+
+    Args:
+        key: Cache key identifying the full shape
+        shape: Full output shape
+        fields: Field paths from parse_fields(), or None for all fields
+        required: Top-level fields the caller needs for post-processing
+
+    Returns:
+        (shape, serializer, strip) where strip lists required fields the
+        client did not ask for; remove them before responding
+
+    Raises:
+        ValueError: If a field is not part of the shape
+    """
+    if fields is None:
+        return shape, get_serializer(key, shape), ()
+    
+    cache_key = (key, fields)
+    fieldset = _fieldsets.get(cache_key)
+    if fieldset is None:
+        requested = {path.split('.')[0] for path in fields}
+        strip = tuple(name for name in required if name not in requested)
+        selected = _select_fields(shape, fields | set(strip))
+        fieldset = (selected, _compile(selected), strip)
+        if len(_fieldsets) < MAX_CACHED_FIELDSETS:
+            _fieldsets[cache_key] = fieldset
+    
+    return fieldset
+
+def prefix_shape(shape, prefix):
+    """Rename every column a shape reads (for embedding a joined model's shape)"""
+    if isinstance(shape, str):
+        return prefix + shape
+    if isinstance(shape, tuple):
+        function, arguments = shape
+        return (function, tuple(prefix + name for name in arguments))
+    return {key: prefix_shape(value, prefix) for key, value in shape.items()}
+
+def model_columns(model, prefix=''):
+    """Map (prefixed) column name -> column for a model or aliased model"""
+    return {prefix + column.key: getattr(model, column.key) for column in model.__table__.columns}
+
+def select_shape(shape, columns):
+    """
+    Build a SELECT of just the columns a shape needs
+
+    Args:
+        shape: Output shape
+        columns: Map of column name -> column expression (see model_columns)
+
+    Returns:
+        SQLAlchemy Select, ready for joins and filters
+    """
+    return select(*[columns[name].label(name) for name in shape_columns(shape)])
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def dumps(payload):
+    """Encode a payload as JSON bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def json_response(payload, status=200):
+    """Fast replacement for jsonify() on large list payloads"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
@@ -0,0 +1,130 @@
+import gzip
+import mimetypes
+import os
+import re
+import sys
+from flask import abort, request, send_file
+
+# Optional brotli support for precompressed variants
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PRECOMPRESS_EXTENSIONS = {'.html', '.js', '.css', '.json', '.svg', '.txt', '.xml', '.map', '.ico'}
+PRECOMPRESS_MIN_SIZE = 1024  # bytes
+
+# Next.js puts content-hashed build output under _next/static/; other files
+# with a hash in the name (app.3f9a1c2e.js) are equally safe to cache forever
+HASHED_NAME = re.compile(r'[.\-_][0-9a-f]{8,}\.', re.IGNORECASE)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+def _is_immutable(relative_path):
+    return relative_path.startswith('_next/static/') or bool(HASHED_NAME.search(os.path.basename(relative_path)))
+
+def build_manifest(root):
+    """
+    Index an exported frontend folder once, at startup
+
+    Args:
+        root: Folder with the static export (frontend/out)
+
+    Returns:
+        dict mapping URL path -> file entry (path, mimetype, cache control,
+        available precompressed variants)
+    """
+    manifest = {}
+    if not os.path.isdir(root):
+        return manifest
+
+    for folder, _, filenames in os.walk(root):
+        names = set(filenames)
+        for filename in filenames:
+            if filename.endswith(('.br', '.gz')) and filename[:-3] in names:
+                continue  # Precompressed variant of another file
+
+            full_path = os.path.join(folder, filename)
+            relative_path = os.path.relpath(full_path, root).replace(os.sep, '/')
+            variants = {}
+            if filename + '.br' in names:
+                variants['br'] = full_path + '.br'
+            if filename + '.gz' in names:
+                variants['gzip'] = full_path + '.gz'
+
+            manifest[relative_path] = {
+                'path': full_path,
+                'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                'cache_control': IMMUTABLE_CACHE_CONTROL if _is_immutable(relative_path) else REVALIDATE_CACHE_CONTROL,
+                'variants': variants
+            }
+
+    # Next.js static export: /about -> about.html, /driver/ -> driver/index.html
+    for relative_path in list(manifest):
+        if relative_path.endswith('/index.html'):
+            manifest.setdefault(relative_path[:-len('/index.html')], manifest[relative_path])
+        elif relative_path.endswith('.html'):
+            manifest.setdefault(relative_path[:-len('.html')], manifest[relative_path])
+
+    return manifest
+
+def serve_from_manifest(manifest, path, fallback='index.html'):
+    """
+    Serve an exported file, preferring a precompressed variant the client accepts.
+    Unknown paths get the fallback page (client-side routing).
+    """
+    entry = manifest.get(path.strip('/')) if path else None
+    if entry is None:
+        entry = manifest.get(fallback)
+        if entry is None:
+            abort(404)
+
+    file_path = entry['path']
+    encoding = None
+    encodings = request.accept_encodings
+    if 'br' in entry['variants'] and encodings['br']:
+        file_path, encoding = entry['variants']['br'], 'br'
+    elif 'gzip' in entry['variants'] and encodings['gzip']:
+        file_path, encoding = entry['variants']['gzip'], 'gzip'
+
+    # send_file streams through wsgi.file_wrapper (sendfile under gunicorn)
+    # and handles ETag, If-None-Match and Range requests
+    response = send_file(file_path, mimetype=entry['mimetype'], conditional=True, etag=True, max_age=None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if entry['variants']:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = entry['cache_control']
+    return response
+
+def precompress(root):
+    """
+    Write .br and .gz variants next to compressible files (run after the frontend build)
+
+    Returns:
+        Number of files compressed
+    """
+    count = 0
+    for folder, _, filenames in os.walk(root):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() not in PRECOMPRESS_EXTENSIONS:
+                continue
+            full_path = os.path.join(folder, filename)
+            with open(full_path, 'rb') as source:
+                body = source.read()
+            if len(body) < PRECOMPRESS_MIN_SIZE:
+                continue
+
+            with open(full_path + '.gz', 'wb') as target:
+                target.write(gzip.compress(body, compresslevel=9))
+            if brotli is not None:
+                with open(full_path + '.br', 'wb') as target:
+                    target.write(brotli.compress(body, quality=11))
+            count += 1
+    return count
+
+if __name__ == '__main__':
+    # Usage (from the backend folder): python -m utils.static_files ../frontend/out
+    export_root = sys.argv[1] if len(sys.argv) > 1 else os.path.join('..', 'frontend', 'out')
+    print(f"Precompressed {precompress(export_root)} files in {export_root}")
@@ -0,0 +1,219 @@
+import base64
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+from werkzeug.security import safe_join
+from config import Config
+
+# Optional S3-compatible object storage (AWS S3, MinIO). Only needed with STORAGE_BACKEND=s3.
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+# Content-addressed storage keys: folder/ab/<sha256>.ext
+UPLOAD_KEY = re.compile(r'^[\w\-]+/([0-9a-f]{2})/(\1[0-9a-f]{62})(\.[a-z0-9]+)$')
+
+def sign_file_path(file_path, expires, method='GET'):
+    """
+    Signature for an app-served upload URL, valid until the given time
+
+    Args:
+        file_path: Storage key (path relative to UPLOAD_FOLDER)
+        expires: Unix timestamp after which the signature is rejected
+        method: 'GET' to download, 'PUT' to upload
+
+    Returns:
+        Hex signature string
+    """
+    message = f"{method}\n{file_path}\n{expires}".encode('utf-8')
+    return hmac.new(Config.SECRET_KEY.encode('utf-8'), message, hashlib.sha256).hexdigest()[:32]
+
+def verify_file_signature(file_path, expires, signature, method='GET'):
+    """
+    Check a signed upload URL without touching the database
+
+    Returns:
+        True if the signature matches and has not expired
+    """
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time() or not signature:
+        return False
+    return hmac.compare_digest(sign_file_path(file_path, expires, method), signature)
+
+class LocalStorage:
+    """Uploads on this instance's disk, served by routes/uploads.py"""
+
+    is_local = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        """Full path for a key, or None if the key escapes the upload folder"""
+        return safe_join(os.path.abspath(self.root), key)
+
+    def staging_dir(self):
+        """Where uploads are written before save() (same filesystem, so save() is a rename)"""
+        folder = os.path.join(self.root, '.incoming')
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def save(self, source_path, key):
+        """Move a finished local file into storage under key (replacing any existing file)"""
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source_path, target)
+
+    def size(self, key):
+        """Stored size in bytes, or None if there is no such file"""
+        path = self.path(key)
+        if path is None or not os.path.isfile(path):
+            return None
+        return os.path.getsize(path)
+
+    def version(self, key):
+        """Token that changes whenever the stored bytes are replaced, or None if missing"""
+        path = self.path(key)
+        if path is None or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def read_head(self, key, length):
+        """First length bytes of a stored file"""
+        with open(self.path(key), 'rb') as source:
+            return source.read(length)
+
+    def delete(self, key):
+        path = self.path(key)
+        if path is None or not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
+
+    @contextmanager
+    def local_copy(self, key):
+        """Local path holding the stored bytes (the stored file itself)"""
+        yield self.path(key)
+
+    def download_url(self, key, expires):
+        return f"/uploads/{quote(key)}?expires={expires}&sig={sign_file_path(key, expires)}"
+
+    def presign_upload(self, key, content_type, size, sha256, expires):
+        """Upload instructions for the client; the app receives the PUT and checks the hash"""
+        return {
+            'method': 'PUT',
+            'url': f"/uploads/{quote(key)}?expires={expires}&sig={sign_file_path(key, expires, 'PUT')}",
+            'headers': {'Content-Type': content_type}
+        }
+
+class S3Storage:
+    """Uploads in an S3-compatible bucket; clients download and upload with presigned URLs"""
+
+    is_local = False
+
+    def __init__(self, bucket, endpoint_url=None, region=None):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self._clients = {}  # pid -> client; boto3 clients must not be shared across a fork
+
+    @property
+    def client(self):
+        client = self._clients.get(os.getpid())
+        if client is None:
+            client = self._clients[os.getpid()] = boto3.client(
+                's3', endpoint_url=self.endpoint_url, region_name=self.region,
+                config=BotoConfig(signature_version='s3v4')
+            )
+        return client
+
+    def _head(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def staging_dir(self):
+        return tempfile.gettempdir()
+
+    def save(self, source_path, key):
+        """Upload a finished local file under key and remove the local copy"""
+        content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        self.client.upload_file(source_path, self.bucket, key, ExtraArgs={'ContentType': content_type})
+        os.remove(source_path)
+
+    def size(self, key):
+        head = self._head(key)
+        return head['ContentLength'] if head else None
+
+    def version(self, key):
+        head = self._head(key)
+        return head['ETag'].strip('"') if head else None
+
+    def read_head(self, key, length):
+        """First length bytes of a stored object (a ranged GET, not a download)"""
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f'bytes=0-{length - 1}')
+        return response['Body'].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        return True
+
+    @contextmanager
+    def local_copy(self, key):
+        """Download to a temporary file for the duration of the block"""
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        try:
+            with os.fdopen(fd, 'wb') as target:
+                self.client.download_fileobj(self.bucket, key, target)
+            yield path
+        finally:
+            os.remove(path)
+
+    def download_url(self, key, expires):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key},
+            ExpiresIn=max(int(expires - time.time()), 1)
+        )
+
+    def presign_upload(self, key, content_type, size, sha256, expires):
+        """Presigned PUT; the bucket rejects bodies whose SHA-256 differs from the key's"""
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode('ascii')
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket, 'Key': key, 'ContentType': content_type,
+                    'ContentLength': size, 'ChecksumSHA256': checksum},
+            ExpiresIn=max(int(expires - time.time()), 1)
+        )
+        return {
+            'method': 'PUT',
+            'url': url,
+            'headers': {'Content-Type': content_type, 'x-amz-checksum-sha256': checksum}
+        }
+
+def _create_storage():
+    if Config.STORAGE_BACKEND == 's3':
+        # Unlike the cache, falling back to local disk here would scatter files across instances
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires the boto3 package")
+        if not Config.S3_BUCKET:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        return S3Storage(Config.S3_BUCKET, Config.S3_ENDPOINT_URL, Config.S3_REGION)
+    return LocalStorage(Config.UPLOAD_FOLDER)
+
+storage = _create_storage()
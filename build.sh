@@ -23,4 +23,8 @@ cd ..
 echo "🐍 Installing Python dependencies..."
 pip install -r requirements.txt
 
+# Precompress the static export (.br/.gz served by the backend)
+echo "🗜️  Precompressing static files..."
+(cd backend && python -m utils.static_files ../frontend/out)
+
 echo "✅ Build complete!"
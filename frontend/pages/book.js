@@ -43,20 +43,14 @@ export default function BookPage() {
     }
   }, []);
 
-  const goodsTypes = [
-    { value: 'cement', labelEn: 'Cement', labelTe: 'సిమెంట్' },
-    { value: 'bricks', labelEn: 'Bricks', labelTe: 'ఇటుకలు' },
-    { value: 'sand', labelEn: 'Sand', labelTe: 'ఇసుక' },
-    { value: 'gravel', labelEn: 'Gravel', labelTe: 'గులకరాళ్ళు' },
-    { value: 'furniture', labelEn: 'Furniture', labelTe: 'ఫర్నిచర్' },
-    { value: 'electronics', labelEn: 'Electronics', labelTe: 'ఎలక్ట్రానిక్స్' },
-    { value: 'household', labelEn: 'Household Items', labelTe: 'గృహ సామగ్రి' },
-    { value: 'machinery', labelEn: 'Machinery', labelTe: 'యంత్రాలు' },
-    { value: 'agricultural', labelEn: 'Agricultural Goods', labelTe: 'వ్యవసాయ సామాగ్రి' },
-    { value: 'food_items', labelEn: 'Food Items', labelTe: 'ఆహార పదార్థాలు' },
-    { value: 'textiles', labelEn: 'Textiles', labelTe: 'వస్త్రాలు' },
-    { value: 'others', labelEn: 'Others', labelTe: 'ఇతరాలు' }
-  ];
+  const [goodsTypes, setGoodsTypes] = useState([]);
+
+  // Goods types come from the cached /api/meta reference data
+  useEffect(() => {
+    api.getMeta(language)
+      .then((meta) => setGoodsTypes(meta.goods_types))
+      .catch(() => setGoodsTypes([]));
+  }, [language]);
 
   const handleInputChange = (e) => {
     setFormData({
@@ -179,7 +173,7 @@ export default function BookPage() {
                   <option value="">{t('selectGoods')}</option>
                   {goodsTypes.map((type) => (
                     <option key={type.value} value={type.value}>
-                      {language === 'en' ? type.labelEn : type.labelTe}
+                      {type.label}
                     </option>
                   ))}
                 </select>
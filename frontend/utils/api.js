@@ -194,6 +194,47 @@ class ApiService {
     return response.json();
   }
 
+  // Upload straight to storage: presign, PUT the bytes, then record the upload.
+  // Files the server already has (same SHA-256) are not sent again.
+  async uploadFile(file, folder = 'general') {
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    const sha256 = Array.from(new Uint8Array(digest))
+      .map((byte) => byte.toString(16).padStart(2, '0'))
+      .join('');
+
+    const presigned = await this.request('/uploads/presign', {
+      method: 'POST',
+      body: JSON.stringify({
+        folder,
+        filename: file.name,
+        content_type: file.type,
+        size: file.size,
+        sha256,
+      }),
+    });
+
+    if (!presigned.exists) {
+      const { url, method, headers } = presigned.upload;
+      const response = await fetch(new URL(url, this.baseUrl).toString(), {
+        method,
+        headers,
+        body: file,
+      });
+
+      if (!response.ok) {
+        throw new Error('Failed to upload file');
+      }
+    }
+
+    return this.request('/uploads/complete', {
+      method: 'POST',
+      body: JSON.stringify({
+        file_path: presigned.file_path,
+        upload_token: presigned.upload_token,
+      }),
+    });
+  }
+
   // Driver endpoints
   async registerDriver(driverData) {
     return this.request('/driver/register', {
@@ -294,6 +335,12 @@ class ApiService {
     return this.request(`/admin/reports/revenue?${query}`);
   }
 
+  // Reference data (goods types, vehicle types, cities, time slots).
+  // Served with long-lived cache headers, so the browser cache revalidates it cheaply.
+  async getMeta(language = 'en') {
+    return this.request(`/meta?lang=${language}`);
+  }
+
   // Payment endpoints
   async createPaymentOrder(bookingId, paymentType = 'full') {
     return this.request('/payment/create-order', {